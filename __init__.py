@@ -13,9 +13,12 @@
 
 import bpy
 from bpy.props import PointerProperty, FloatVectorProperty
-from .source.operators import RYWRANGLER_OT_AutoLinkNodes, RYWRANGLER_OT_IsolateNode, RYWRANGLER_OT_AddUVLayer, RYWRANGLER_OT_AddPaintLayer, RYWRANGLER_OT_AddDecalLayer, RYWRANGLER_OT_AddPaintLayer, RYWRANGLER_OT_AddTriplanarLayer, RYWRANGLER_OT_AddGrunge, RYWRANGLER_OT_AddEdgeWear, RYWRANGLER_OT_edit_image_externally, RYWRANGLER_OT_import_texture_set
+from .source.operators import RYWRANGLER_OT_AutoLinkNodes, RYWRANGLER_OT_IsolateNode, RYWRANGLER_OT_AddUVLayer, RYWRANGLER_OT_AddPaintLayer, RYWRANGLER_OT_AddDecalLayer, RYWRANGLER_OT_AddPaintLayer, RYWRANGLER_OT_AddTriplanarLayer, RYWRANGLER_OT_AddGrunge, RYWRANGLER_OT_AddEdgeWear, RYWRANGLER_OT_edit_image_externally, RYWRANGLER_OT_import_texture_set, RYWRANGLER_OT_scan_texture_library, RYWRANGLER_OT_import_library_texture_set, RYWRANGLER_OT_localize_assets, RYWRANGLER_OT_relink_assets, RYWRANGLER_OT_make_layer_unique, RYWRANGLER_OT_edit_group, RYWRANGLER_OT_rebuild_layer_stack, RYWRANGLER_OT_optimize_material, RYWRANGLER_OT_deduplicate_node_groups, RYWRANGLER_OT_bake_masks, RYWRANGLER_OT_bake_triplanar_layers, RYWRANGLER_OT_export_textures, RYWRANGLER_OT_toggle_profiling_trace, RYWRANGLER_OT_save_profiling_trace, RYWRANGLER_OT_clear_profiling_statistics
 from .source.texture_settings import RYWRANGLER_texture_settings, RYWRANGLER_OT_set_raw_texture_folder, RYWRANGLER_OT_open_raw_texture_folder
-from .source.ui import RYWRANGLER_MT_pie_menu, RYWRANGLER_OT_open_pie_menu, RYWRANGLER_PT_side_panel
+from .source.ui import RYWRANGLER_MT_pie_menu, RYWRANGLER_OT_open_pie_menu, RYWRANGLER_PT_side_panel, RYWRANGLER_PT_shader_cost, RYWRANGLER_PT_performance
+from .source import shader_analysis
+from .source import node_index
+from .source import profiling
 
 bl_info = {
     "name": "RyWrangler",
@@ -36,10 +39,25 @@ classes = (
     RYWRANGLER_OT_AddPaintLayer,
     RYWRANGLER_OT_AddDecalLayer,
     RYWRANGLER_OT_AddTriplanarLayer,
+    RYWRANGLER_OT_bake_triplanar_layers,
     RYWRANGLER_OT_AddGrunge,
     RYWRANGLER_OT_AddEdgeWear,
+    RYWRANGLER_OT_bake_masks,
     RYWRANGLER_OT_edit_image_externally,
     RYWRANGLER_OT_import_texture_set,
+    RYWRANGLER_OT_export_textures,
+    RYWRANGLER_OT_scan_texture_library,
+    RYWRANGLER_OT_import_library_texture_set,
+    RYWRANGLER_OT_localize_assets,
+    RYWRANGLER_OT_relink_assets,
+    RYWRANGLER_OT_make_layer_unique,
+    RYWRANGLER_OT_edit_group,
+    RYWRANGLER_OT_rebuild_layer_stack,
+    RYWRANGLER_OT_optimize_material,
+    RYWRANGLER_OT_deduplicate_node_groups,
+    RYWRANGLER_OT_toggle_profiling_trace,
+    RYWRANGLER_OT_save_profiling_trace,
+    RYWRANGLER_OT_clear_profiling_statistics,
 
     # Texture Settings
     RYWRANGLER_texture_settings,
@@ -49,7 +67,9 @@ classes = (
     # User Interface
     RYWRANGLER_MT_pie_menu,
     RYWRANGLER_OT_open_pie_menu,
-    RYWRANGLER_PT_side_panel
+    RYWRANGLER_PT_side_panel,
+    RYWRANGLER_PT_shader_cost,
+    RYWRANGLER_PT_performance
 )
 
 addon_keymaps = []
@@ -57,6 +77,9 @@ addon_keymaps = []
 # Register classes with Blender.
 def register():
     for cls in classes:
+        # Time operator calls for the performance section of the side panel.
+        if issubclass(cls, bpy.types.Operator):
+            profiling.instrument_operator(cls)
         bpy.utils.register_class(cls)
 
     bpy.types.Scene.rywrangler_shader_node = PointerProperty(type=bpy.types.NodeTree)
@@ -68,6 +91,12 @@ def register():
         default=(0.0, 0.0)
     )
 
+    # Clear cached shader cost estimates when node trees change or blend data is reloaded.
+    shader_analysis.register_handlers()
+
+    # Keep cached node indexes (used for node lookups by operators) up to date.
+    node_index.register_handlers()
+
     # Keymap: Shift + Q in Shader Editor
     wm = bpy.context.window_manager
     kc = wm.keyconfigs.addon
@@ -76,6 +105,10 @@ def register():
         kmi = km.keymap_items.new("wm.call_custom_pie", type='Q', value='PRESS', shift=True)
         addon_keymaps.append((km, kmi))
 
+        # Keymap: Tab copies shared layer node groups before the default edit group operator enters them.
+        kmi = km.keymap_items.new("rywrangler.edit_group", type='TAB', value='PRESS')
+        addon_keymaps.append((km, kmi))
+
 # Unregister classes and properties.
 def unregister():
     for km, kmi in addon_keymaps:
@@ -84,6 +117,9 @@ def unregister():
 
     for cls in classes:
         bpy.utils.unregister_class(cls)
+
+    shader_analysis.unregister_handlers()
+    node_index.unregister_handlers()
     
     # Remove keymapping when the add-on is disabled.
     wm = bpy.context.window_manager
@@ -0,0 +1,191 @@
+# This file contains functions to append (or link) node groups from this add-ons asset blend file.
+# A manifest of all node groups in the asset blend file (and the node groups they depend on) is cached, keyed by the asset files modification time,
+# so everything an operation needs can be appended with a single library load instead of opening the asset file once per node group.
+
+import os
+import re
+import json
+import hashlib
+import bpy
+from pathlib import Path
+from bpy.utils import resource_path
+from ..source import debug_logging
+from ..package import ADDON_PACKAGE
+
+# Pattern matching the numeric suffix Blender adds to data block names that already exist (i.e 'Mask_Grunge.001').
+DUPLICATE_NAME_PATTERN = re.compile(r'^(.*)\.\d{3,}$')
+
+# Loaded asset manifests keyed by asset blend file path, and asset blend files that had all node groups preloaded this session.
+_asset_manifests = {}
+_preloaded_asset_files = set()
+
+def get_blend_assets_path():
+    '''Returns the path to the blend file where assets are stored for this add-on, or the central asset library if one is set in the texture settings.'''
+    asset_library_path = bpy.context.scene.rywrangler_texture_settings.asset_library_path
+    if asset_library_path:
+        return bpy.path.abspath(asset_library_path)
+    blend_assets_path = str(Path(resource_path('USER')) / "scripts/addons" / ADDON_PACKAGE / "assets" / "Assets.blend")
+    return blend_assets_path
+
+def get_asset_manifest_path(blend_assets_path):
+    '''Returns the path the manifest for the provided asset blend file is cached to, in Blender's user config folder.'''
+    path_hash = hashlib.sha1(os.path.normcase(os.path.abspath(blend_assets_path)).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(bpy.utils.user_resource('CONFIG', path="rywrangler"), "asset_manifest_{0}.json".format(path_hash))
+
+def get_asset_file_key(blend_assets_path):
+    '''Returns a key identifying the current version of the asset blend file (modification time and size).'''
+    stat = os.stat(blend_assets_path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+def build_asset_manifest(blend_assets_path):
+    '''Reads all node groups in the asset blend file into temporary blend data and returns a dictionary of node group names to the names of node groups they use.'''
+    manifest = {}
+    with bpy.data.temp_data(filepath=blend_assets_path) as temp_data:
+        with temp_data.libraries.load(blend_assets_path) as (data_from, data_to):
+            data_to.node_groups = data_from.node_groups
+
+        for node_group in temp_data.node_groups:
+            manifest[node_group.name] = sorted({node.node_tree.name for node in node_group.nodes if node.type == 'GROUP' and node.node_tree})
+    return manifest
+
+def get_asset_manifest(blend_assets_path=None):
+    '''Returns the manifest of node groups in the asset blend file, rebuilding the cached manifest only if the asset blend file changed.'''
+    blend_assets_path = blend_assets_path or get_blend_assets_path()
+    asset_file_key = get_asset_file_key(blend_assets_path)
+    asset_manifest = _asset_manifests.get(blend_assets_path)
+    if asset_manifest and asset_manifest['key'] == asset_file_key:
+        return asset_manifest['node_groups']
+
+    # Load the manifest cached from a previous session.
+    manifest_path = get_asset_manifest_path(blend_assets_path)
+    if os.path.isfile(manifest_path):
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as manifest_file:
+                cached_manifest = json.load(manifest_file)
+            if cached_manifest.get('key') == asset_file_key:
+                _asset_manifests[blend_assets_path] = cached_manifest
+                return cached_manifest['node_groups']
+        except (OSError, ValueError):
+            debug_logging.log("Failed to read the cached asset manifest, it will be rebuilt.", message_type='WARNING')
+
+    asset_manifest = {'key': asset_file_key, 'node_groups': build_asset_manifest(blend_assets_path)}
+    _asset_manifests[blend_assets_path] = asset_manifest
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    with open(manifest_path, 'w', encoding='utf-8') as manifest_file:
+        json.dump(asset_manifest, manifest_file)
+    return asset_manifest['node_groups']
+
+def get_node_group_dependencies(node_group_names):
+    '''Returns the names of all node groups used (directly or nested) by the provided asset node groups.'''
+    manifest = get_asset_manifest()
+    dependencies = set()
+    node_group_names = list(node_group_names)
+    while node_group_names:
+        for dependency in manifest.get(node_group_names.pop(), []):
+            if dependency not in dependencies:
+                dependencies.add(dependency)
+                node_group_names.append(dependency)
+    return dependencies
+
+def append_node_groups(node_group_names, link=False, use_fake_user=True):
+    '''Appends all of the provided node groups that don't exist in blend data from the asset blend file with a single library load.
+    Returns a dictionary of the provided names to their node groups (None for node groups that failed to append).'''
+    missing_node_group_names = [name for name in node_group_names if not bpy.data.node_groups.get(name)]
+    appended_node_groups = {}
+    if missing_node_group_names:
+        manifest = get_asset_manifest()
+        for name in missing_node_group_names:
+            if name not in manifest:
+                debug_logging.log("{0} does not exist in the blend asset file.".format(name), message_type='ERROR')
+        missing_node_group_names = [name for name in missing_node_group_names if name in manifest]
+
+    if missing_node_group_names:
+        existing_node_group_names = {node_group.name for node_group in bpy.data.node_groups}
+        with bpy.data.libraries.load(get_blend_assets_path(), link=link) as (data_from, data_to):
+            data_to.node_groups = missing_node_group_names
+        appended_node_groups = dict(zip(missing_node_group_names, data_to.node_groups))
+
+        # Mark appended node trees with a 'fake user' to stop them from being
+        # auto deleted from the blend file if they are not actively used.
+        for node_group in data_to.node_groups:
+            if node_group and not link:
+                node_group.use_fake_user = use_fake_user
+
+        # Appending a node group also appends the node groups it uses, which creates duplicates (i.e 'Mask_Grunge.001') of ones that already existed.
+        # Remap users of duplicated dependencies to the existing node groups and remove the duplicates.
+        dependencies = get_node_group_dependencies(missing_node_group_names)
+        for node_group in list(bpy.data.node_groups):
+            if node_group.name in existing_node_group_names or node_group.library:
+                continue
+            match = DUPLICATE_NAME_PATTERN.match(node_group.name)
+            if match and match.group(1) in dependencies and match.group(1) in existing_node_group_names:
+                node_group.user_remap(bpy.data.node_groups[match.group(1)])
+                bpy.data.node_groups.remove(node_group)
+
+    return {name: appended_node_groups.get(name) or bpy.data.node_groups.get(name) for name in node_group_names}
+
+def preload_assets():
+    '''Appends all node groups from the asset blend file once per session, so later operations don't need to load the asset blend file.'''
+    blend_assets_path = get_blend_assets_path()
+    if blend_assets_path in _preloaded_asset_files:
+        return
+    append_node_groups(list(get_asset_manifest(blend_assets_path)))
+    _preloaded_asset_files.add(blend_assets_path)
+
+def get_inner_node_group_names(blend_assets_path=None):
+    '''Returns the names of asset node groups that are used inside other asset node groups. These are never edited per layer, so they can be linked read-only.'''
+    manifest = get_asset_manifest(blend_assets_path)
+    return {dependency for dependencies in manifest.values() for dependency in dependencies}
+
+def link_node_group(node_group_name, use_fake_user=True):
+    '''Links the node group from the asset library and makes only the (editable) node group itself local, its inner node groups stay linked to the asset library.
+    This keeps blend files small, because they only store a reference to shared inner node groups rather than full copies.'''
+    linked_node_group = append_node_groups([node_group_name], link=True)[node_group_name]
+    if not linked_node_group or not linked_node_group.library:
+        return linked_node_group
+
+    node_group = linked_node_group.make_local()
+    node_group.use_fake_user = use_fake_user
+    return node_group
+
+def get_asset_library(blend_assets_path=None):
+    '''Returns the library data block for the asset blend file if any node groups are linked from it.'''
+    blend_assets_path = os.path.normcase(os.path.normpath(blend_assets_path or get_blend_assets_path()))
+    for library in bpy.data.libraries:
+        if os.path.normcase(os.path.normpath(bpy.path.abspath(library.filepath))) == blend_assets_path:
+            return library
+    return None
+
+def localize_linked_node_groups():
+    '''Makes all node groups linked from the asset library local, so the blend file no longer depends on the asset library. Returns the number of localized node groups.'''
+    library = get_asset_library()
+    if not library:
+        return 0
+
+    linked_node_groups = [node_group for node_group in bpy.data.node_groups if node_group.library == library]
+    for node_group in linked_node_groups:
+        node_group.make_local()
+
+    # Remove the library once nothing references it.
+    if not any(node_group.library == library for node_group in bpy.data.node_groups):
+        bpy.data.libraries.remove(library)
+    return len(linked_node_groups)
+
+def relink_inner_node_groups():
+    '''Replaces local copies of inner asset node groups with node groups linked from the asset library, with a single library load. Returns the number of relinked node groups.'''
+    inner_node_group_names = get_inner_node_group_names()
+    local_node_groups = [node_group for node_group in bpy.data.node_groups if not node_group.library and node_group.name in inner_node_group_names]
+    if not local_node_groups:
+        return 0
+
+    with bpy.data.libraries.load(get_blend_assets_path(), link=True) as (data_from, data_to):
+        data_to.node_groups = [node_group.name for node_group in local_node_groups]
+
+    relinked_count = 0
+    for local_node_group, linked_node_group in zip(local_node_groups, data_to.node_groups):
+        if not linked_node_group:
+            continue
+        local_node_group.user_remap(linked_node_group)
+        bpy.data.node_groups.remove(local_node_group)
+        relinked_count += 1
+    return relinked_count
@@ -0,0 +1,217 @@
+# This file contains functions to bake node outputs into UV space images with Cycles, and cache baked images on disk.
+# Any output socket of a node in a material can be baked by temporarily routing it through an emission shader into the material output.
+# Cached bakes are keyed by a hash of everything that affects the result (node structure, input values, mesh, UVs and resolution),
+# so baking something that hasn't changed only loads the previously baked image. Baked images are packed into the blend file, the cache is only used for lookups.
+
+import os
+import hashlib
+import numpy
+import bpy
+from ..source import node_dedupe
+from ..source import image_utils
+from ..source import texture_settings
+from ..source import debug_logging
+
+# Number of render samples used for bakes. Emission bakes evaluate the shader at each texel, so more samples only anti-alias procedural detail.
+BAKE_SAMPLES = 4
+
+# Margin (in pixels) baked texels are extended past UV island borders, so texture filtering doesn't bleed in the background.
+BAKE_MARGIN = 16
+
+def get_bake_cache_folder():
+    '''Returns the folder baked images are cached in, in Blender's user data files folder.'''
+    bake_cache_folder = bpy.utils.user_resource('DATAFILES', path="rywrangler/bake_cache")
+    os.makedirs(bake_cache_folder, exist_ok=True)
+    return bake_cache_folder
+
+def get_mesh_hash(obj, uv_map_name=""):
+    '''Returns a hash of the evaluated mesh vertex positions, faces and UV coordinates of the object, which identifies the mesh for cached bakes.
+    Bakes use the evaluated mesh, so modifiers (i.e subdivision or displacement) are included in the hash.'''
+    evaluated_object = obj.evaluated_get(bpy.context.evaluated_depsgraph_get())
+    mesh = evaluated_object.to_mesh()
+    mesh_hash = hashlib.sha1()
+    try:
+        vertex_positions = numpy.empty(len(mesh.vertices) * 3, dtype=numpy.float32)
+        mesh.vertices.foreach_get("co", vertex_positions)
+        mesh_hash.update(vertex_positions.tobytes())
+
+        loop_vertices = numpy.empty(len(mesh.loops), dtype=numpy.int32)
+        mesh.loops.foreach_get("vertex_index", loop_vertices)
+        mesh_hash.update(loop_vertices.tobytes())
+
+        uv_layer = mesh.uv_layers.get(uv_map_name) if uv_map_name else mesh.uv_layers.active
+        if uv_layer:
+            uv_coordinates = numpy.empty(len(mesh.loops) * 2, dtype=numpy.float32)
+            uv_layer.data.foreach_get("uv", uv_coordinates)
+            mesh_hash.update(uv_layer.name.encode('utf-8'))
+            mesh_hash.update(uv_coordinates.tobytes())
+    finally:
+        evaluated_object.to_mesh_clear()
+    return mesh_hash.hexdigest()
+
+def get_input_keys(node, node_tree_hashes, upstream_keys):
+    '''Returns hashable representations of the node inputs. Linked inputs are represented by the key of the whole upstream subtree linked into them,
+    so changing any node feeding into the input (i.e the values of a mapping node) changes the key. Upstream keys are memoized by node name.'''
+    input_keys = []
+    for socket in node.inputs:
+        if socket.is_linked:
+            link = socket.links[0]
+            input_keys.append((socket.identifier, 'LINK', get_upstream_key(link.from_node, node_tree_hashes, upstream_keys), link.from_socket.identifier))
+        elif hasattr(socket, "default_value"):
+            input_keys.append((socket.identifier, node_dedupe.get_value_key(socket.default_value)))
+    return tuple(input_keys)
+
+def get_object_keys(node, node_group_names=None):
+    '''Returns (object name, world matrix) keys for objects the node references (i.e the object of a texture coordinate node used to place decals),
+    including objects referenced inside nested node groups. Moving a referenced object changes the bake, but not the node settings.'''
+    node_group_names = node_group_names if node_group_names != None else set()
+    object_keys = []
+    referenced_object = getattr(node, "object", None)
+    if isinstance(referenced_object, bpy.types.Object):
+        object_keys.append((referenced_object.name, tuple(tuple(row) for row in referenced_object.matrix_world)))
+    if node.type == 'GROUP' and node.node_tree and node.node_tree.name not in node_group_names:
+        node_group_names.add(node.node_tree.name)
+        for group_node in node.node_tree.nodes:
+            object_keys.extend(get_object_keys(group_node, node_group_names))
+    return tuple(object_keys)
+
+def get_upstream_key(node, node_tree_hashes, upstream_keys):
+    '''Returns a hashable representation of the node and (recursively) every node linked into its inputs.'''
+    upstream_key = upstream_keys.get(node.name)
+    if upstream_key == None:
+        # Mark the node before walking its inputs, so link cycles (which Blender flags as invalid, but allows) don't recurse forever.
+        upstream_keys[node.name] = ('CYCLE', node.name)
+        upstream_key = (node_dedupe.get_node_key(node, node_tree_hashes), get_object_keys(node), get_input_keys(node, node_tree_hashes, upstream_keys))
+        upstream_keys[node.name] = upstream_key
+    return upstream_key
+
+def get_node_bake_key(node, obj, width, height, thirty_two_bit, node_tree_hashes=None, mesh_hash=None):
+    '''Returns the key a bake of the node on the object is cached with. It covers the nodes structure (including nested node groups),
+    unlinked input values, the whole subtree of nodes linked into its inputs (and the transforms of objects they reference), the evaluated mesh, UVs, resolution and bit depth.
+    The mesh hash can be provided when baking many nodes on the same object.'''
+    node_tree_hashes = node_tree_hashes if node_tree_hashes != None else {}
+    bake_key = (get_upstream_key(node, node_tree_hashes, {}), mesh_hash or get_mesh_hash(obj), width, height, thirty_two_bit)
+    return hashlib.sha1(repr(bake_key).encode('utf-8')).hexdigest()
+
+def get_bake_path(bake_key, thirty_two_bit):
+    '''Returns the path the bake with the provided key is cached to.'''
+    extension = ".exr" if thirty_two_bit else ".png"
+    return os.path.join(get_bake_cache_folder(), bake_key + extension)
+
+def bake_socket(obj, material, socket, image, bake_type='EMIT'):
+    '''Bakes the output socket (of a node in the materials node tree) into the provided image, using the objects active UV map.
+    The material output is temporarily connected to an emission shader displaying the socket, and restored after baking.
+    Normals are baked with the 'NORMAL' bake type, through the normal input of a diffuse shader, so they're converted into a tangent space normal map.'''
+    node_tree = material.node_tree
+    nodes = node_tree.nodes
+    links = node_tree.links
+    scene = bpy.context.scene
+
+    output_node = next((node for node in nodes if node.type == 'OUTPUT_MATERIAL' and node.is_active_output), None)
+    if not output_node:
+        debug_logging.log("Can't bake {0}, the material has no active material output.".format(socket.name), message_type='ERROR')
+        return False
+
+    # Remember everything that's changed for the bake, so it can be restored afterwards.
+    surface_input = output_node.inputs['Surface']
+    original_surface_socket = surface_input.links[0].from_socket if surface_input.is_linked else None
+    original_active_node = nodes.active
+    original_engine = scene.render.engine
+    original_samples = scene.cycles.samples
+    original_active_object = bpy.context.view_layer.objects.active
+    original_selected_objects = [selected_object for selected_object in bpy.context.view_layer.objects if selected_object.select_get()]
+
+    # Cycles bakes into the active image texture node of every material on the object, so each one gets a temporary target.
+    temporary_nodes = []
+    for material_slot in obj.material_slots:
+        slot_material = material_slot.material
+        if not slot_material or not slot_material.use_nodes or slot_material == material:
+            continue
+        slot_active_node = slot_material.node_tree.nodes.active
+        bake_target_node = slot_material.node_tree.nodes.new('ShaderNodeTexImage')
+        bake_target_node.image = image
+        slot_material.node_tree.nodes.active = bake_target_node
+        temporary_nodes.append((slot_material.node_tree, bake_target_node, slot_active_node))
+
+    if bake_type == 'NORMAL':
+        bake_shader_node = nodes.new('ShaderNodeBsdfDiffuse')
+        links.new(socket, bake_shader_node.inputs['Normal'])
+    else:
+        bake_shader_node = nodes.new('ShaderNodeEmission')
+        links.new(socket, bake_shader_node.inputs['Color'])
+    links.new(bake_shader_node.outputs[0], surface_input)
+    bake_target_node = nodes.new('ShaderNodeTexImage')
+    bake_target_node.image = image
+    nodes.active = bake_target_node
+
+    try:
+        scene.render.engine = 'CYCLES'
+        scene.cycles.samples = BAKE_SAMPLES
+        for selected_object in original_selected_objects:
+            selected_object.select_set(False)
+        obj.select_set(True)
+        bpy.context.view_layer.objects.active = obj
+        with bpy.context.temp_override(object=obj, active_object=obj, selected_objects=[obj], selected_editable_objects=[obj]):
+            bpy.ops.object.bake(type=bake_type, margin=BAKE_MARGIN, use_clear=True)
+        baked = True
+    except RuntimeError as error:
+        debug_logging.log("Failed to bake {0}: {1}".format(socket.name, error), message_type='ERROR')
+        baked = False
+
+    finally:
+        nodes.remove(bake_shader_node)
+        nodes.remove(bake_target_node)
+        if original_surface_socket:
+            links.new(original_surface_socket, surface_input)
+        if original_active_node:
+            nodes.active = original_active_node
+        for temporary_node_tree, temporary_node, temporary_active_node in temporary_nodes:
+            temporary_node_tree.nodes.remove(temporary_node)
+            if temporary_active_node:
+                temporary_node_tree.nodes.active = temporary_active_node
+
+        scene.render.engine = original_engine
+        scene.cycles.samples = original_samples
+        obj.select_set(False)
+        for selected_object in original_selected_objects:
+            selected_object.select_set(True)
+        bpy.context.view_layer.objects.active = original_active_object
+
+    return baked
+
+def bake_socket_cached(obj, material, socket, bake_key, image_name, width=-1, height=-1, thirty_two_bit=None, non_color=True, bake_type='EMIT'):
+    '''Returns an image of the socket baked onto the object, loading it from the bake cache if a bake with the same key exists, otherwise baking and caching it.'''
+    if width == -1:
+        width = texture_settings.get_texture_width()
+    if height == -1:
+        height = texture_settings.get_texture_height()
+    if thirty_two_bit == None:
+        thirty_two_bit = bpy.context.scene.rywrangler_texture_settings.thirty_two_bit
+
+    bake_path = get_bake_path(bake_key, thirty_two_bit)
+    if os.path.isfile(bake_path):
+        debug_logging.log("Loading cached bake for {0}.".format(image_name))
+        image = image_utils.load_images([bake_path])[bake_path]
+        if image:
+            image.colorspace_settings.name = 'Non-Color' if non_color else 'sRGB'
+            pack_baked_image(image)
+            return image
+
+    image = image_utils.create_image(image_name, width, height, alpha_channel=False, thirty_two_bit=thirty_two_bit, add_unique_id=True)
+    image.colorspace_settings.name = 'Non-Color' if non_color else 'sRGB'
+    if not bake_socket(obj, material, socket, image, bake_type):
+        bpy.data.images.remove(image)
+        return None
+
+    # Write the baked pixels to the bake cache, so the same bake is loaded rather than baked again.
+    image.filepath_raw = bake_path
+    image.file_format = 'OPEN_EXR' if thirty_two_bit else 'PNG'
+    image.save()
+    pack_baked_image(image)
+    return image
+
+def pack_baked_image(image):
+    '''Packs the baked image into the blend file. The bake cache is only used to look up bakes, it's in the user data files folder of this machine,
+    so blend files referencing it would be missing their bakes on other machines (i.e render farms) or once the cache is cleared.'''
+    if not image.packed_file:
+        image.pack()
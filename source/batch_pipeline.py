@@ -0,0 +1,270 @@
+# This file contains a headless pipeline to import texture sets into many materials, for generating materials on build machines.
+# Nothing here requires a context or user interface, so it runs in background Blender instances (blender -b). Large manifests can be sharded
+# across a pool of background Blender processes, where each process imports a share of the texture sets and saves its own blend files.
+#
+# Manifests are JSON files with a list of jobs, each importing the texture set in a folder into a material and saving it to an output blend file:
+# {"jobs": [{"folder": "//scans/rock_01", "material": "Rock_01", "output": "//materials/rocks.blend"}]}
+# Only the folder is required. The material defaults to the folder name, and the output to a blend file named after the material next to the manifest.
+#
+# Run a manifest from the command line with:
+# blender -b --python-expr "import importlib; importlib.import_module('<add-on package>.source.batch_pipeline').main()" -- manifest.json --workers 8
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+import bpy
+from .texture_channels import classify
+from .layer_stack import CHANNEL_SOCKET_NAMES
+from .texture_library import IMAGE_EXTENSIONS
+from ..source import image_utils
+from ..source import debug_logging
+
+# Material channels with color data, all other channels are imported as non-color data.
+COLOR_CHANNELS = {'BASE_COLOR', 'EMISSION'}
+
+# Horizontal spacing between imported texture nodes and the shader.
+NODE_SPACING = 300
+
+def get_job_error(job):
+    '''Returns why the manifest job is invalid, or an empty string if the job is valid.'''
+    if not isinstance(job, dict):
+        return "Jobs must be objects, not {0}.".format(type(job).__name__)
+    if not isinstance(job.get('folder'), str) or not job['folder']:
+        return "The job has no texture set folder."
+    for key in ('material', 'output'):
+        if key in job and not isinstance(job[key], str):
+            return "The job {0} must be a string.".format(key)
+    return ""
+
+def load_manifest(manifest_path):
+    '''Reads the jobs from a manifest file. Relative paths ('//') in jobs are resolved relative to the manifest file.
+    Jobs without an output blend file are saved to a blend file named after their material next to the manifest. Invalid jobs are kept with the reason in 'error',
+    so they're reported as failures rather than aborting the batch.'''
+    with open(manifest_path, 'r', encoding='utf-8') as manifest_file:
+        manifest = json.load(manifest_file)
+
+    manifest_folder = os.path.dirname(os.path.abspath(manifest_path))
+    jobs = []
+    for job_index, job in enumerate(manifest.get('jobs', [])):
+        error = get_job_error(job)
+        if error:
+            jobs.append({'material': "Job {0}".format(job_index), 'error': error})
+            continue
+
+        resolved_job = dict(job)
+        for key in ('folder', 'output'):
+            path = job.get(key, "")
+            if path.startswith("//"):
+                resolved_job[key] = os.path.normpath(os.path.join(manifest_folder, path[2:]))
+        resolved_job.setdefault('material', os.path.basename(os.path.normpath(resolved_job['folder'])))
+        if not resolved_job.get('output'):
+            resolved_job['output'] = os.path.join(manifest_folder, bpy.path.clean_name(resolved_job['material']) + ".blend")
+        jobs.append(resolved_job)
+    return jobs
+
+def get_texture_set_paths(folder):
+    '''Returns the paths of all image files in the folder (not including sub folders), sorted by name.'''
+    with os.scandir(folder) as entries:
+        return sorted(entry.path for entry in entries if entry.is_file() and os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS)
+
+def get_principled_shader(material):
+    '''Returns the Principled BSDF connected to the material output, creating the shader (and output) if the material doesn't have them.'''
+    material.use_nodes = True
+    nodes = material.node_tree.nodes
+    output_node = next((node for node in nodes if node.type == 'OUTPUT_MATERIAL' and node.is_active_output), None)
+    if not output_node:
+        output_node = nodes.new('ShaderNodeOutputMaterial')
+
+    surface_input = output_node.inputs['Surface']
+    if surface_input.is_linked and surface_input.links[0].from_node.type == 'BSDF_PRINCIPLED':
+        return surface_input.links[0].from_node
+
+    principled_shader = nodes.new('ShaderNodeBsdfPrincipled')
+    principled_shader.location = (output_node.location.x - NODE_SPACING, output_node.location.y)
+    material.node_tree.links.new(principled_shader.outputs[0], surface_input)
+    return principled_shader
+
+def add_texture_node(node_tree, image, location):
+    '''Adds an image texture node using the image.'''
+    texture_node = node_tree.nodes.new('ShaderNodeTexImage')
+    texture_node.image = image
+    texture_node.location = location
+    return texture_node
+
+def wire_texture_set(material, image_paths):
+    '''Imports the texture set images into image texture nodes wired into the materials Principled BSDF, using the same classification rules as the import operators.
+    Doesn't require a context. Returns the number of wired material channels.'''
+    principled_shader = get_principled_shader(material)
+    node_tree = material.node_tree
+    nodes = node_tree.nodes
+    links = node_tree.links
+
+    classified_files = classify([os.path.basename(image_path) for image_path in image_paths])
+    images = image_utils.load_images([image_path for image_path, (material_channel, packed_layout) in zip(image_paths, classified_files) if material_channel != 'NONE'])
+
+    wired_channel_count = 0
+    normal_socket = None
+    height_socket = None
+    texture_x = principled_shader.location.x - NODE_SPACING * 3
+    texture_y = principled_shader.location.y
+    for image_path, (material_channel, packed_layout) in zip(image_paths, classified_files):
+        image = images.get(image_path)
+        if material_channel == 'NONE' or not image:
+            continue
+
+        image.colorspace_settings.name = 'sRGB' if material_channel in COLOR_CHANNELS else 'Non-Color'
+        texture_node = add_texture_node(node_tree, image, (texture_x, texture_y))
+        texture_y -= NODE_SPACING
+
+        # Packed channels are separated, packed smoothness is inverted into roughness.
+        if material_channel == 'CHANNEL_PACKED':
+            separate_node = nodes.new('ShaderNodeSeparateColor')
+            separate_node.location = (texture_node.location.x + NODE_SPACING, texture_node.location.y)
+            links.new(texture_node.outputs['Color'], separate_node.inputs[0])
+            for packed_channel, rgba_channel, invert in packed_layout:
+                shader_input = principled_shader.inputs.get(CHANNEL_SOCKET_NAMES.get(packed_channel, ""))
+                if not shader_input:
+                    debug_logging.log("The {0} channel packed into {1} has no shader input, it won't be used.".format(packed_channel, os.path.basename(image_path)))
+                    continue
+                channel_socket = texture_node.outputs['Alpha'] if rgba_channel == 'ALPHA' else separate_node.outputs[rgba_channel.title()]
+                if invert:
+                    invert_node = nodes.new('ShaderNodeMath')
+                    invert_node.operation = 'SUBTRACT'
+                    invert_node.inputs[0].default_value = 1.0
+                    invert_node.location = (separate_node.location.x + NODE_SPACING / 2, separate_node.location.y)
+                    links.new(channel_socket, invert_node.inputs[1])
+                    channel_socket = invert_node.outputs[0]
+                links.new(channel_socket, shader_input)
+                wired_channel_count += 1
+            continue
+
+        match material_channel:
+            case 'NORMAL':
+                normal_map_node = nodes.new('ShaderNodeNormalMap')
+                normal_map_node.location = (texture_node.location.x + NODE_SPACING, texture_node.location.y)
+                links.new(texture_node.outputs['Color'], normal_map_node.inputs['Color'])
+                normal_socket = normal_map_node.outputs[0]
+            case 'HEIGHT':
+                height_socket = texture_node.outputs['Color']
+            case _:
+                shader_input = principled_shader.inputs.get(CHANNEL_SOCKET_NAMES.get(material_channel, ""))
+                if not shader_input:
+                    debug_logging.log("The {0} channel ({1}) has no shader input, it won't be used.".format(material_channel, os.path.basename(image_path)))
+                    nodes.remove(texture_node)
+                    continue
+                links.new(texture_node.outputs['Color'], shader_input)
+        wired_channel_count += 1
+
+    # Height is applied with a bump node, on top of the normal map if there is one.
+    if height_socket:
+        bump_node = nodes.new('ShaderNodeBump')
+        bump_node.location = (principled_shader.location.x - NODE_SPACING, principled_shader.location.y - NODE_SPACING * 2)
+        links.new(height_socket, bump_node.inputs['Height'])
+        if normal_socket:
+            links.new(normal_socket, bump_node.inputs['Normal'])
+        normal_socket = bump_node.outputs[0]
+    if normal_socket:
+        links.new(normal_socket, principled_shader.inputs['Normal'])
+
+    return wired_channel_count
+
+def run_jobs(jobs):
+    '''Imports the texture set of each job into its material, then saves the materials of each output blend file.
+    Doesn't require a context. Errors are caught per job (and per output blend file), so one failed job doesn't abort the batch.
+    Returns a report of (material name or output path, wired channel count or error) for each job and each output blend file that failed to save.'''
+    report = []
+    materials_by_output = {}
+    for job in jobs:
+        job_name = job.get('material', "")
+        if job.get('error'):
+            debug_logging.log("Skipped invalid batch job {0}: {1}".format(job_name, job['error']), message_type='ERROR')
+            report.append((job_name, job['error']))
+            continue
+
+        try:
+            image_paths = get_texture_set_paths(job['folder'])
+            material = bpy.data.materials.get(job_name) or bpy.data.materials.new(job_name)
+            wired_channel_count = wire_texture_set(material, image_paths)
+        except Exception as error:
+            debug_logging.log("Failed to import the texture set {0} into {1}: {2}".format(job['folder'], job_name, error), message_type='ERROR')
+            report.append((job_name, str(error)))
+            continue
+
+        report.append((material.name, wired_channel_count))
+        debug_logging.log("Imported {0} channels into {1}.".format(wired_channel_count, material.name))
+        materials_by_output.setdefault(job['output'], set()).add(material)
+
+    # Writing only the materials (and the images they use) to each output blend file doesn't need a context, unlike saving the open blend file.
+    for output_path, materials in materials_by_output.items():
+        try:
+            os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+            bpy.data.libraries.write(output_path, materials, fake_user=True, path_remap='ABSOLUTE')
+        except Exception as error:
+            debug_logging.log("Failed to save {0} materials to {1}: {2}".format(len(materials), output_path, error), message_type='ERROR')
+            report.append((output_path, str(error)))
+            continue
+        debug_logging.log("Saved {0} materials to {1}.".format(len(materials), output_path))
+    return report
+
+def shard_jobs(jobs, shard_count):
+    '''Splits the jobs into the provided number of shards with similar job counts. Jobs saving to the same output blend file stay in the same shard,
+    since a blend file can only be written by one process. Jobs without an output blend file are spread individually.'''
+    jobs_by_output = {}
+    for job_index, job in enumerate(jobs):
+        jobs_by_output.setdefault(job.get('output') or job_index, []).append(job)
+
+    # Assign the largest groups of jobs first, each to the shard with the fewest jobs.
+    shards = [[] for i in range(0, max(shard_count, 1))]
+    for output_jobs in sorted(jobs_by_output.values(), key=len, reverse=True):
+        min(shards, key=len).extend(output_jobs)
+    return [shard for shard in shards if shard]
+
+def run_manifest(manifest_path, workers=1, blender_path=""):
+    '''Runs all jobs in the manifest. With more than one worker, jobs are sharded across background Blender processes running in parallel.
+    Returns true if all jobs (and worker processes) succeeded.'''
+    jobs = load_manifest(manifest_path)
+    if workers <= 1:
+        report = run_jobs(jobs)
+        return all(isinstance(result, int) for material_name, result in report)
+
+    # Invalid jobs are reported here rather than sent to workers.
+    invalid_jobs = [job for job in jobs if job.get('error')]
+    for job in invalid_jobs:
+        debug_logging.log("Skipped invalid batch job {0}: {1}".format(job['material'], job['error']), message_type='ERROR')
+
+    blender_path = blender_path or bpy.app.binary_path
+    module_name = __name__
+    processes = []
+    with tempfile.TemporaryDirectory(prefix="rywrangler_batch_") as shard_folder:
+        for shard_index, shard in enumerate(shard_jobs([job for job in jobs if not job.get('error')], workers)):
+            shard_path = os.path.join(shard_folder, "shard_{0}.json".format(shard_index))
+            with open(shard_path, 'w', encoding='utf-8') as shard_file:
+                json.dump({'jobs': shard}, shard_file)
+
+            # Each worker is a background Blender instance importing this module and running its shard.
+            python_expression = "import importlib; importlib.import_module('{0}').main()".format(module_name)
+            command = [blender_path, "-b", "--python-exit-code", "1", "--python-expr", python_expression, "--", shard_path]
+            processes.append(subprocess.Popen(command))
+            debug_logging.log("Started batch worker {0} with {1} jobs.".format(shard_index, len(shard)))
+
+        return_codes = [process.wait() for process in processes]
+
+    failed_worker_count = sum(1 for return_code in return_codes if return_code != 0)
+    if failed_worker_count:
+        debug_logging.log("{0} of {1} batch workers failed.".format(failed_worker_count, len(processes)), message_type='ERROR')
+    return failed_worker_count == 0 and not invalid_jobs
+
+def main():
+    '''Command line entry point, reading arguments after '--' (i.e blender -b --python-expr "..." -- manifest.json --workers 8).'''
+    arguments = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    parser = argparse.ArgumentParser(description="Imports texture sets into materials from a manifest.")
+    parser.add_argument("manifest", help="Path to the manifest (json) file.")
+    parser.add_argument("--workers", type=int, default=1, help="Number of background Blender processes to shard jobs across.")
+    parser.add_argument("--blender", default="", help="Path to the Blender executable used for workers (defaults to the running Blender).")
+    parsed_arguments = parser.parse_args(arguments)
+
+    if not run_manifest(parsed_arguments.manifest, parsed_arguments.workers, parsed_arguments.blender):
+        sys.exit(1)
@@ -1,27 +1,138 @@
 # This file contains functions to log status, errors and warnings for debugging purposes.
+# Messages below the logging level are ignored before they're formatted. Logged messages are kept in a buffer and written to the console in batches,
+# since printing each message separately is slow on Windows consoles and log collectors for render farms. Warnings and errors are written right away.
+# Messages can also be written to a JSON lines file (one json object per message) for log collectors.
+# The level and JSON lines file can be set with the RYWRANGLER_LOG_LEVEL and RYWRANGLER_LOG_FILE environment variables (i.e for background workers).
 
+import os
+import sys
+import json
+import time
+import atexit
 import datetime
+import threading
+from collections import deque
 
-def log(message, message_type='INFO', sub_process=False):
-    '''Prints the given message to Blender's console window. This function helps log functions called by this add-on for debugging purposes.'''
-    match message_type:
+# Logging doesn't require Blender, so modules that don't use bpy (i.e pixel_ops) can be used and tested outside of Blender.
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+# Logging levels, messages below the logging level are ignored.
+LOG_LEVELS = {
+    'DEBUG': 10,
+    'INFO': 20,
+    'WARNING': 30,
+    'ERROR': 40
+}
+
+# Number of waiting messages that are written together, waiting messages are written as soon as the buffer fills.
+LOG_BUFFER_SIZE = 2048
+
+# Seconds waiting messages are written after, if there aren't enough to fill the buffer.
+LOG_FLUSH_INTERVAL = 0.5
+
+# Messages waiting to be written, as (time, level, message, sub process) records.
+_log_buffer = deque(maxlen=LOG_BUFFER_SIZE)
+_log_lock = threading.RLock()
+_last_flush_time = time.time()
+
+_log_level = LOG_LEVELS.get(os.environ.get('RYWRANGLER_LOG_LEVEL', 'INFO').upper(), LOG_LEVELS['INFO'])
+_json_lines_path = os.environ.get('RYWRANGLER_LOG_FILE', "")
+
+def set_log_level(level):
+    '''Sets the logging level ('DEBUG', 'INFO', 'WARNING' or 'ERROR'), messages below it are ignored.'''
+    global _log_level
+    _log_level = LOG_LEVELS[level]
+
+def get_log_level():
+    '''Returns the name of the logging level.'''
+    return next(level for level, value in LOG_LEVELS.items() if value == _log_level)
+
+def set_json_lines_file(file_path):
+    '''Sets the file logged messages are also written to as JSON lines, or stops writing them to a file if the path is empty.'''
+    global _json_lines_path
+    flush()
+    _json_lines_path = file_path
+
+def format_message(record):
+    '''Returns the console line for a logged message record.'''
+    logged_time, level, message, sub_process = record
+    match level:
         case 'ERROR':
             error_prefix = "ERROR: "
         case 'WARNING':
             error_prefix = "WARNING: "
         case _:
             error_prefix = ""
-    
-    logged_message = "[{0}]: {1}{2}".format(datetime.datetime.now(), error_prefix, message)
-    
-    if sub_process:
-        print(logged_message)
-    else:
-        print(logged_message)
+    process_prefix = "[{0}]".format(os.getpid()) if sub_process else ""
+    return "[{0}]{1}: {2}{3}".format(datetime.datetime.fromtimestamp(logged_time), process_prefix, error_prefix, message)
+
+def format_json_line(record):
+    '''Returns the JSON line for a logged message record.'''
+    logged_time, level, message, sub_process = record
+    return json.dumps({
+        'time': datetime.datetime.fromtimestamp(logged_time).isoformat(),
+        'level': level,
+        'message': str(message),
+        'pid': os.getpid(),
+        'sub_process': sub_process
+    })
+
+def flush():
+    '''Writes all waiting messages to the console (and the JSON lines file) in one write.
+    Messages are written while holding the lock, so lines written by concurrent flushes never interleave.'''
+    global _last_flush_time
+    with _log_lock:
+        _last_flush_time = time.time()
+        if not _log_buffer:
+            return
+        records = list(_log_buffer)
+        _log_buffer.clear()
+
+        sys.stdout.write("\n".join(format_message(record) for record in records) + "\n")
+        sys.stdout.flush()
+
+        if _json_lines_path:
+            try:
+                with open(_json_lines_path, 'a', encoding='utf-8') as json_lines_file:
+                    json_lines_file.write("\n".join(format_json_line(record) for record in records) + "\n")
+            except OSError as error:
+                sys.stdout.write("ERROR: Failed to write to the log file {0}: {1}\n".format(_json_lines_path, error))
+
+def flush_timer():
+    '''Writes waiting messages from a Blender timer, so messages that don't fill the buffer are still written shortly after they're logged.'''
+    flush()
+    return None
+
+def log(message, message_type='INFO', sub_process=False):
+    '''Logs the given message to Blender's console window. This function helps log functions called by this add-on for debugging purposes.
+    Messages from sub processes (i.e background workers) are written right away, prefixed with their process id.'''
+    level = message_type if message_type in LOG_LEVELS else 'INFO'
+    if LOG_LEVELS[level] < _log_level:
+        return
+
+    with _log_lock:
+        _log_buffer.append((time.time(), level, message, sub_process))
+        buffer_full = len(_log_buffer) == LOG_BUFFER_SIZE
+        flush_due = time.time() - _last_flush_time >= LOG_FLUSH_INTERVAL
+
+    # Messages are also written once the flush interval has passed, since timers aren't available in background Blender (i.e render farm workers) or on other threads.
+    if sub_process or LOG_LEVELS[level] >= LOG_LEVELS['WARNING'] or buffer_full or flush_due:
+        flush()
+
+    # Blender timers can only be registered from the main thread, messages logged on other threads are written with the next flush.
+    elif bpy and threading.current_thread() is threading.main_thread() and not bpy.app.background:
+        if not bpy.app.timers.is_registered(flush_timer):
+            bpy.app.timers.register(flush_timer, first_interval=LOG_FLUSH_INTERVAL)
 
 def log_status(message, self, type='ERROR'):
-    '''Prints the given message to Blender's console window and displays the message in Blender's status bar.'''
+    '''Logs the given message to Blender's console window and displays the message in Blender's status bar.'''
     if type == 'ERROR':
         message = "{0}".format(message)
-    log(message)
-    self.report({type}, message)
\ No newline at end of file
+    log(message, message_type=type)
+    self.report({type}, message)
+
+# Write waiting messages before Blender (or a background worker) exits.
+atexit.register(flush)
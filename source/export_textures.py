@@ -0,0 +1,435 @@
+# This file contains a pipeline to bake and export the final material channels (color, roughness, normal...) of layered materials.
+# Export jobs (one per channel of each material) are sharded across a pool of background Blender worker processes, each baking with an equal share of the
+# processor threads, so exports scale with the number of cores rather than baking every channel one after another in the open blend file.
+# Workers append the objects to export from a temporary copy of them, bake their jobs, and write a result line for each job so progress can be reported.
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import subprocess
+import numpy
+import bpy
+from .layer_stack import CHANNEL_SOCKET_NAMES, get_stack_shader
+from .texture_channels import get_channel_packed_layout
+from ..source import baking
+from ..source import image_utils
+from ..source import pixel_ops
+from ..source import debug_logging
+
+# Channels exported even when they aren't linked in the shader (filled with the shaders constant value), since most texture sets are expected to have them.
+DEFAULT_EXPORT_CHANNELS = ('BASE_COLOR', 'METALLIC', 'ROUGHNESS')
+
+# Material channels with color data, all other channels are exported as non-color data.
+COLOR_CHANNELS = {'BASE_COLOR', 'EMISSION'}
+
+# Bit depths supported by each export file format, bit depths that aren't supported are clamped into this range.
+FILE_FORMAT_BIT_DEPTHS = {
+    'PNG': ('8', '16'),
+    'OPEN_EXR': ('16', '32')
+}
+
+# Values used for packed channels that weren't exported (i.e a material without ambient occlusion is unoccluded).
+PACKED_CHANNEL_DEFAULT_VALUES = {
+    'AMBIENT_OCCLUSION': 1.0,
+    'ROUGHNESS': 0.5,
+    'ALPHA': 1.0
+}
+
+# Folder the add-on is installed in, and the name workers import this module by. Workers don't enable the add-on, so they import it from this folder directly,
+# rather than through the package name Blender registered it under (i.e 'bl_ext.user_default.rywrangler' for extensions).
+ADDON_PARENT_FOLDER = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+WORKER_MODULE_NAME = "{0}.source.{1}".format(os.path.basename(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), __name__.rsplit(".", 1)[-1])
+
+# File extensions for each export file format.
+FILE_FORMAT_EXTENSIONS = {
+    'PNG': ".png",
+    'OPEN_EXR': ".exr"
+}
+
+class TextureExport:
+    '''A running texture export, with a background Blender worker process for each shard of export jobs.'''
+    def __init__(self, processes, result_paths, temporary_folder, job_count):
+        self.processes = processes
+        self.result_paths = result_paths
+        self.temporary_folder = temporary_folder
+        self.job_count = job_count
+
+    def is_finished(self):
+        '''Returns true when all worker processes have exited.'''
+        return all(process.poll() != None for process in self.processes)
+
+    def get_finished_job_count(self):
+        '''Returns the number of jobs workers have finished so far.'''
+        return len(self.read_results())
+
+    def read_results(self):
+        '''Returns the results written by workers so far, one dictionary (material, channel, path, error) per finished job.'''
+        results = []
+        for result_path in self.result_paths:
+            if not os.path.isfile(result_path):
+                continue
+            with open(result_path, 'r', encoding='utf-8') as result_file:
+                for line in result_file:
+                    if line.endswith("\n"):
+                        results.append(json.loads(line))
+        return results
+
+    def wait(self):
+        '''Blocks until all worker processes have exited.'''
+        for process in self.processes:
+            process.wait()
+
+    def finish(self):
+        '''Returns the results of all jobs and removes the temporary files used by workers. Jobs a crashed worker didn't finish are reported as errors.'''
+        results = self.read_results()
+        failed_worker_count = sum(1 for process in self.processes if process.returncode != 0)
+        if failed_worker_count or len(results) < self.job_count:
+            debug_logging.log("{0} export workers failed, {1} of {2} textures were exported.".format(failed_worker_count, len(results), self.job_count), message_type='ERROR')
+        shutil.rmtree(self.temporary_folder, ignore_errors=True)
+        return results
+
+    def cancel(self):
+        '''Stops all worker processes and removes the temporary files used by workers. Textures workers already exported are kept.'''
+        for process in self.processes:
+            if process.poll() == None:
+                process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+        shutil.rmtree(self.temporary_folder, ignore_errors=True)
+        debug_logging.log("Texture export cancelled.", message_type='WARNING')
+
+def get_export_shader(material):
+    '''Returns the Principled BSDF material channels are exported from (the layer stack shader, or the Principled BSDF connected to the material output).'''
+    node_tree = material.node_tree
+    stack_shader = get_stack_shader(node_tree)
+    if stack_shader:
+        return stack_shader
+
+    output_node = next((node for node in node_tree.nodes if node.type == 'OUTPUT_MATERIAL' and node.is_active_output), None)
+    if output_node and output_node.inputs['Surface'].is_linked:
+        surface_node = output_node.inputs['Surface'].links[0].from_node
+        if surface_node.type == 'BSDF_PRINCIPLED':
+            return surface_node
+    return None
+
+def get_export_channels(material, packed_format=""):
+    '''Returns the material channels of the material to export: all channels linked in its shader, the default export channels,
+    and all channels packed into the packed format (i.e 'orm') if one is provided.'''
+    shader = get_export_shader(material)
+    if not shader:
+        return []
+
+    packed_channels = {packed_channel for packed_channel, rgba_channel, invert in get_channel_packed_layout(packed_format)}
+    export_channels = []
+    for channel, socket_name in CHANNEL_SOCKET_NAMES.items():
+        shader_input = shader.inputs.get(socket_name)
+        if shader_input and (shader_input.is_linked or channel in DEFAULT_EXPORT_CHANNELS or channel in packed_channels):
+            export_channels.append(channel)
+
+    # Ambient occlusion isn't a shader input, it's baked from the mesh when a packed format needs it.
+    if 'AMBIENT_OCCLUSION' in packed_channels:
+        export_channels.append('AMBIENT_OCCLUSION')
+    return export_channels
+
+def get_color_depth(file_format, bit_depth):
+    '''Returns the closest bit depth to the provided one that the file format supports.'''
+    supported_bit_depths = FILE_FORMAT_BIT_DEPTHS[file_format]
+    if bit_depth in supported_bit_depths:
+        return bit_depth
+    return supported_bit_depths[0] if int(bit_depth) < int(supported_bit_depths[0]) else supported_bit_depths[-1]
+
+def get_export_path(output_folder, material_name, channel, file_format):
+    '''Returns the path the material channel is exported to (i.e 'Rock_Roughness.png').'''
+    channel_name = channel.title().replace("_", "")
+    return os.path.join(output_folder, "{0}_{1}{2}".format(bpy.path.clean_name(material_name), channel_name, FILE_FORMAT_EXTENSIONS[file_format]))
+
+def bake_channel(obj, material, channel, width, height):
+    '''Bakes the material channel of the material on the object into a new float image. Channels that aren't linked in the shader are filled with the shaders constant value.
+    Returns the image, or None if the channel failed to bake.'''
+    image_name = "{0}_{1}".format(material.name, channel)
+    if channel == 'AMBIENT_OCCLUSION':
+        return bake_ambient_occlusion(obj, material, image_name, width, height)
+
+    shader = get_export_shader(material)
+    shader_input = shader.inputs.get(CHANNEL_SOCKET_NAMES[channel]) if shader else None
+    if not shader_input:
+        debug_logging.log("Can't bake {0}, the material has no shader input for the channel.".format(channel), message_type='ERROR')
+        return None
+
+    if not shader_input.is_linked:
+        value = shader_input.default_value
+        base_color = tuple(value) if shader_input.type == 'RGBA' else (value, value, value, 1.0)
+        image = image_utils.create_image(image_name, width, height, base_color=base_color, thirty_two_bit=True, add_unique_id=True, fill_pixels=True)
+    else:
+        image = image_utils.create_image(image_name, width, height, thirty_two_bit=True, add_unique_id=True)
+        if not baking.bake_socket(obj, material, shader_input.links[0].from_socket, image, 'NORMAL' if channel == 'NORMAL' else 'EMIT'):
+            bpy.data.images.remove(image)
+            return None
+
+    # Float images store linear color, data channels are marked as non-color so they're saved without color management.
+    if channel not in COLOR_CHANNELS:
+        image.colorspace_settings.name = 'Non-Color'
+    return image
+
+def bake_ambient_occlusion(obj, material, image_name, width, height):
+    '''Bakes ambient occlusion of the object into a new float image, through a temporary ambient occlusion node in the material. Returns the image, or None if it failed to bake.'''
+    ambient_occlusion_node = material.node_tree.nodes.new('ShaderNodeAmbientOcclusion')
+    image = image_utils.create_image(image_name, width, height, thirty_two_bit=True, add_unique_id=True)
+    try:
+        baked = baking.bake_socket(obj, material, ambient_occlusion_node.outputs['AO'], image)
+    finally:
+        material.node_tree.nodes.remove(ambient_occlusion_node)
+
+    if not baked:
+        bpy.data.images.remove(image)
+        return None
+    image.colorspace_settings.name = 'Non-Color'
+    return image
+
+def save_image(image, file_path, file_format, bit_depth, color_mode='RGB'):
+    '''Saves the image to the file path with the provided file format and bit depth. The scenes view transform is temporarily set to standard,
+    so exported colors aren't tone mapped.'''
+    scene = bpy.context.scene
+    image_settings = scene.render.image_settings
+    original_settings = (image_settings.file_format, image_settings.color_mode, image_settings.color_depth, scene.view_settings.view_transform, scene.view_settings.look)
+    try:
+        image_settings.file_format = file_format
+        image_settings.color_mode = color_mode
+        image_settings.color_depth = get_color_depth(file_format, bit_depth)
+        scene.view_settings.view_transform = 'Standard'
+        scene.view_settings.look = 'None'
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        image.save_render(file_path, scene=scene)
+    finally:
+        image_settings.file_format, image_settings.color_mode, image_settings.color_depth = original_settings[:3]
+        scene.view_settings.view_transform, scene.view_settings.look = original_settings[3:]
+
+def create_export_jobs(obj, materials, output_folder, width, height, file_format='PNG', bit_depth='8', packed_format=""):
+    '''Returns an export job for each material channel to export from each of the provided materials on the object.'''
+    material_indices = {material_slot.material: i for i, material_slot in reversed(list(enumerate(obj.material_slots))) if material_slot.material}
+    jobs = []
+    for material in materials:
+        if not material or not material.use_nodes or material not in material_indices:
+            continue
+        for channel in get_export_channels(material, packed_format):
+            jobs.append({
+                'object': obj.name,
+                'material': material.name,
+                'material_index': material_indices[material],
+                'channel': channel,
+                'width': width,
+                'height': height,
+                'file_format': file_format,
+                'bit_depth': bit_depth,
+                'path': get_export_path(output_folder, material.name, channel, file_format)
+            })
+    return jobs
+
+def get_job_material(obj, job):
+    '''Returns the material of the export job, through the material slot of the object it's assigned to, so materials renamed when they were appended are still found.'''
+    material_index = job.get('material_index', -1)
+    if obj and 0 <= material_index < len(obj.material_slots):
+        return obj.material_slots[material_index].material
+    return bpy.data.materials.get(job['material'])
+
+def run_export_jobs(jobs, result_path="", objects=None):
+    '''Bakes and saves the export jobs in this Blender instance, writing a result line for each finished job to the result file if one is provided.
+    Objects can be provided as a dictionary of job object names to objects, for objects that were renamed when they were appended.
+    Returns the results (material, channel, path, error) of all jobs.'''
+    results = []
+    result_file = open(result_path, 'a', encoding='utf-8') if result_path else None
+    try:
+        for job in jobs:
+            obj = objects.get(job['object']) if objects != None else bpy.data.objects.get(job['object'])
+            material = get_job_material(obj, job)
+            result = {'material': job['material'], 'channel': job['channel'], 'path': job['path'], 'error': ""}
+            image = bake_channel(obj, material, job['channel'], job['width'], job['height']) if obj and material else None
+            if image:
+                save_image(image, job['path'], job['file_format'], job['bit_depth'])
+                bpy.data.images.remove(image)
+                debug_logging.log("Exported {0}.".format(job['path']))
+            else:
+                result['error'] = "Failed to bake the {0} channel of {1}.".format(job['channel'], job['material'])
+            results.append(result)
+
+            # Results are flushed per job so the export can report progress while workers are running.
+            if result_file:
+                result_file.write(json.dumps(result) + "\n")
+                result_file.flush()
+    finally:
+        if result_file:
+            result_file.close()
+    return results
+
+def shard_export_jobs(jobs, shard_count):
+    '''Splits the export jobs into the provided number of shards, assigning the largest jobs first to the shard with the fewest pixels to bake.'''
+    shards = [[] for i in range(0, max(shard_count, 1))]
+    shard_pixels = [0] * len(shards)
+    for job in sorted(jobs, key=lambda job: job['width'] * job['height'], reverse=True):
+        shard_index = shard_pixels.index(min(shard_pixels))
+        shards[shard_index].append(job)
+        shard_pixels[shard_index] += job['width'] * job['height']
+    return [shard for shard in shards if shard]
+
+def get_worker_count(workers, job_count):
+    '''Returns the number of worker processes used for the provided number of export jobs. With 0 workers, one worker is used per processor core.
+    Jobs are baked per material channel, so there's never more than one worker per job.'''
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return max(1, min(workers, job_count))
+
+def start_export(obj, materials, output_folder, width, height, file_format='PNG', bit_depth='8', workers=0, packed_format="", blender_path=""):
+    '''Starts exporting all material channels of the materials on the object in a pool of background Blender worker processes.
+    Returns a texture export to track the workers, or None if there's nothing to export.'''
+    jobs = create_export_jobs(obj, materials, output_folder, width, height, file_format, bit_depth, packed_format)
+    if not jobs:
+        return None
+
+    for material in materials:
+        for node in material.node_tree.nodes if material and material.node_tree else []:
+            if node.type == 'TEX_IMAGE' and node.image and node.image.is_dirty:
+                debug_logging.log("{0} has unsaved changes, save it before exporting or the changes won't be exported.".format(node.image.name), message_type='WARNING')
+
+    # Workers read the object (with its mesh, materials and images) from a temporary copy, written without requiring a context.
+    temporary_folder = tempfile.mkdtemp(prefix="rywrangler_export_")
+    blend_path = os.path.join(temporary_folder, "export.blend")
+    bpy.data.libraries.write(blend_path, {obj}, path_remap='ABSOLUTE')
+
+    # Each worker bakes with an equal share of the processor threads, so workers don't compete for cores.
+    shards = shard_export_jobs(jobs, get_worker_count(workers, len(jobs)))
+    threads = max(1, (os.cpu_count() or 1) // len(shards))
+    blender_path = blender_path or bpy.app.binary_path
+    processes = []
+    result_paths = []
+    for shard_index, shard in enumerate(shards):
+        shard_path = os.path.join(temporary_folder, "shard_{0}.json".format(shard_index))
+        result_path = os.path.join(temporary_folder, "results_{0}.jsonl".format(shard_index))
+        with open(shard_path, 'w', encoding='utf-8') as shard_file:
+            json.dump({'blend_path': blend_path, 'threads': threads, 'result_path': result_path, 'jobs': shard}, shard_file)
+
+        # Workers start with factory settings, so user preferences and add-ons (including this one) aren't loaded or changed by workers.
+        python_expression = "import sys, importlib; sys.path.insert(0, {0!r}); importlib.import_module({1!r}).worker_main()".format(ADDON_PARENT_FOLDER, WORKER_MODULE_NAME)
+        command = [blender_path, "-b", "--factory-startup", "--python-exit-code", "1", "--python-expr", python_expression, "--", shard_path]
+        processes.append(subprocess.Popen(command, stdout=subprocess.DEVNULL))
+        result_paths.append(result_path)
+
+    debug_logging.log("Started {0} export workers for {1} textures.".format(len(processes), len(jobs)))
+    return TextureExport(processes, result_paths, temporary_folder, len(jobs))
+
+def export_material_textures(obj, materials, output_folder, width, height, file_format='PNG', bit_depth='8', workers=0, packed_format=""):
+    '''Exports all material channels of the materials on the object and waits for the export to finish. Doesn't require a context,
+    so it can be used from background Blender instances. With a single worker, channels are baked in this Blender instance, with 0 workers one worker is used per core.
+    If a packed format (i.e 'orm') is provided, the channels it contains are packed into a single texture per material. Returns the results of all jobs.'''
+    if workers == 1:
+        results = run_export_jobs(create_export_jobs(obj, materials, output_folder, width, height, file_format, bit_depth, packed_format))
+    else:
+        texture_export = start_export(obj, materials, output_folder, width, height, file_format, bit_depth, workers, packed_format)
+        if not texture_export:
+            return []
+        texture_export.wait()
+        results = texture_export.finish()
+
+    if packed_format:
+        pack_export_results(results, packed_format, output_folder, file_format, bit_depth)
+    return results
+
+def read_channel(image_path, rgba_channel='RED'):
+    '''Reads a single channel of the image file as a (height, width) buffer of raw (non-color) values, without keeping the image in blend data.'''
+    image = bpy.data.images.load(image_path, check_existing=False)
+    image.colorspace_settings.name = 'Non-Color'
+    try:
+        return pixel_ops.unpack_channel(pixel_ops.get_image_pixels(image), rgba_channel)
+    finally:
+        bpy.data.images.remove(image)
+
+def pack_material_textures(material_name, channel_paths, packed_format, output_folder, file_format='PNG', bit_depth='8'):
+    '''Packs the exported single channel textures of the material (a dictionary of material channels to their exported image paths) into one RGBA texture
+    using the packed format (i.e 'orm' = R: Occlusion, G: Roughness, B: Metallic). Channels are resampled to the largest resolution,
+    channels that weren't exported are filled with default values. Returns the path of the packed texture, or an empty string if no channels were exported.'''
+    packed_layout = get_channel_packed_layout(packed_format)
+    channels = [None, None, None, None]
+    default_values = [0.0, 0.0, 0.0, 1.0]
+    for packed_channel, rgba_channel, invert in packed_layout:
+        channel_index = pixel_ops.get_channel_index(rgba_channel)
+        default_value = PACKED_CHANNEL_DEFAULT_VALUES.get(packed_channel, 0.0)
+        default_values[channel_index] = 1.0 - default_value if invert else default_value
+        channel_path = channel_paths.get(packed_channel)
+        if not channel_path:
+            continue
+
+        # Roughness packed as smoothness is inverted.
+        channel = read_channel(channel_path)
+        if invert:
+            numpy.subtract(1.0, channel, out=channel)
+        channels[channel_index] = channel
+
+    exported_channels = [channel for channel in channels if channel is not None]
+    if not exported_channels:
+        return ""
+
+    height = max(channel.shape[0] for channel in exported_channels)
+    width = max(channel.shape[1] for channel in exported_channels)
+    channels = [pixel_ops.resample_channel(channel, height, width) if channel is not None else None for channel in channels]
+    packed_pixels = pixel_ops.pack_channels(channels, default_values)
+
+    packed_image = image_utils.create_image("{0}_{1}".format(material_name, packed_format.upper()), width, height, alpha_channel=True, thirty_two_bit=True, add_unique_id=True)
+    packed_image.colorspace_settings.name = 'Non-Color'
+    pixel_ops.set_image_pixels(packed_image, packed_pixels)
+    packed_path = os.path.join(output_folder, "{0}_{1}{2}".format(bpy.path.clean_name(material_name), packed_format.upper(), FILE_FORMAT_EXTENSIONS[file_format]))
+    save_image(packed_image, packed_path, file_format, bit_depth, color_mode='RGBA' if len(packed_format) > 3 else 'RGB')
+    bpy.data.images.remove(packed_image)
+    return packed_path
+
+def pack_export_results(results, packed_format, output_folder, file_format='PNG', bit_depth='8', remove_packed_sources=True):
+    '''Packs the exported textures of each material in the export results using the packed format. Single channel textures that were packed
+    are removed unless specified otherwise. Returns the paths of all packed textures.'''
+    packed_channels = {packed_channel for packed_channel, rgba_channel, invert in get_channel_packed_layout(packed_format)}
+    channel_paths_by_material = {}
+    for result in results:
+        if not result['error'] and os.path.isfile(result['path']):
+            channel_paths_by_material.setdefault(result['material'], {})[result['channel']] = result['path']
+
+    packed_paths = []
+    for material_name, channel_paths in channel_paths_by_material.items():
+        packed_path = pack_material_textures(material_name, channel_paths, packed_format, output_folder, file_format, bit_depth)
+        if not packed_path:
+            continue
+        packed_paths.append(packed_path)
+        debug_logging.log("Packed {0}.".format(packed_path))
+        if remove_packed_sources:
+            for channel, channel_path in channel_paths.items():
+                if channel in packed_channels:
+                    os.remove(channel_path)
+    return packed_paths
+
+def worker_main():
+    '''Entry point for background Blender worker processes, running the shard of export jobs in the shard file passed after '--'.'''
+    shard_path = sys.argv[sys.argv.index("--") + 1]
+    with open(shard_path, 'r', encoding='utf-8') as shard_file:
+        shard = json.load(shard_file)
+
+    # Workers start with the factory startup file, its datablocks (i.e 'Cube', 'Material') are removed so appended datablocks keep their names.
+    startup_collections = (bpy.data.objects, bpy.data.meshes, bpy.data.materials, bpy.data.cameras, bpy.data.lights)
+    bpy.data.batch_remove([datablock for collection in startup_collections for datablock in collection])
+    scene = bpy.context.scene
+    scene.render.threads_mode = 'FIXED'
+    scene.render.threads = shard['threads']
+
+    # Append the objects to export and link them into the scene, since only objects in the view layer can be baked.
+    # Jobs are resolved against the appended objects, rather than by name, in case appending renamed them.
+    object_names = sorted({job['object'] for job in shard['jobs']})
+    with bpy.data.libraries.load(shard['blend_path']) as (data_from, data_to):
+        data_to.objects = [name for name in data_from.objects if name in object_names]
+    appended_objects = {}
+    for object_name, obj in zip([name for name in data_from.objects if name in object_names], data_to.objects):
+        if obj:
+            scene.collection.objects.link(obj)
+            appended_objects[object_name] = obj
+
+    run_export_jobs(shard['jobs'], shard['result_path'], appended_objects)
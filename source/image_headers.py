@@ -0,0 +1,214 @@
+# This file contains functions to read image dimensions, channel counts and bit depths from image file headers without loading pixel data.
+# Headers are small, so probing many images in a thread pool is much faster than opening them in Blender to find out they can't be used.
+
+import os
+import struct
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+ImageHeader = namedtuple('ImageHeader', ['path', 'width', 'height', 'channels', 'bit_depth'])
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+EXR_MAGIC_NUMBER = b'\x76\x2f\x31\x01'
+
+# Number of channels for each PNG color type (greyscale, RGB, palette, greyscale + alpha, RGBA).
+PNG_COLOR_TYPE_CHANNELS = {0: 1, 2: 3, 3: 3, 4: 2, 6: 4}
+
+# Bit depth of each OpenEXR pixel type (uint, half, float).
+EXR_PIXEL_TYPE_BIT_DEPTHS = {0: 32, 1: 16, 2: 32}
+
+# JPEG start of frame markers contain the image dimensions (0xC4, 0xC8 and 0xCC use the same range but aren't frames).
+JPEG_START_OF_FRAME_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+def read_png_header(image_file):
+    '''Reads the image header from the IHDR chunk of a PNG file.'''
+    data = image_file.read(29)
+    if len(data) < 29 or data[:8] != PNG_SIGNATURE or data[12:16] != b'IHDR':
+        return None
+    width, height, bit_depth, color_type = struct.unpack('>IIBB', data[16:26])
+    return width, height, PNG_COLOR_TYPE_CHANNELS.get(color_type, 0), bit_depth
+
+def read_jpeg_header(image_file):
+    '''Reads the image header from the start of frame segment of a JPEG file, skipping over all other segments.'''
+    if image_file.read(2) != b'\xff\xd8':
+        return None
+
+    while True:
+        marker = image_file.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+
+        # Skip fill bytes and markers without segment data.
+        if marker[1] == 0xFF:
+            image_file.seek(-1, os.SEEK_CUR)
+            continue
+        if marker[1] == 0x01 or 0xD0 <= marker[1] <= 0xD9:
+            continue
+
+        segment_length_data = image_file.read(2)
+        if len(segment_length_data) < 2:
+            return None
+        segment_length = struct.unpack('>H', segment_length_data)[0]
+
+        if marker[1] in JPEG_START_OF_FRAME_MARKERS:
+            data = image_file.read(6)
+            if len(data) < 6:
+                return None
+            bit_depth, height, width, channels = struct.unpack('>BHHB', data)
+            return width, height, channels, bit_depth
+
+        image_file.seek(segment_length - 2, os.SEEK_CUR)
+
+def read_tiff_header(image_file):
+    '''Reads the image header from the first image file directory of a TIFF file.'''
+    data = image_file.read(8)
+    if len(data) < 8:
+        return None
+    if data[:4] == b'II*\x00':
+        byte_order = '<'
+    elif data[:4] == b'MM\x00*':
+        byte_order = '>'
+    else:
+        return None
+
+    image_file.seek(struct.unpack(byte_order + 'I', data[4:8])[0])
+    entry_count_data = image_file.read(2)
+    if len(entry_count_data) < 2:
+        return None
+    entry_count = struct.unpack(byte_order + 'H', entry_count_data)[0]
+    entries = image_file.read(entry_count * 12)
+
+    width = height = 0
+    channels = 1
+    bits_per_sample = 1
+    bits_per_sample_offset = None
+    for i in range(0, len(entries) - 11, 12):
+        tag, field_type, count = struct.unpack(byte_order + 'HHI', entries[i:i + 8])
+        value_data = entries[i + 8:i + 12]
+
+        # Short values are stored in the first two bytes of the value field, long values use all four.
+        if field_type == 3:
+            value = struct.unpack(byte_order + 'H', value_data[:2])[0]
+        else:
+            value = struct.unpack(byte_order + 'I', value_data)[0]
+
+        match tag:
+            case 256:
+                width = value
+            case 257:
+                height = value
+            case 258:
+                # Bits per sample are stored for each channel, but are almost always equal. Only the first channel is read.
+                if count * 2 <= 4:
+                    bits_per_sample = value
+                else:
+                    bits_per_sample_offset = struct.unpack(byte_order + 'I', value_data)[0]
+            case 277:
+                channels = value
+
+    # Read bits per sample that didn't fit into the image file directory entry.
+    if bits_per_sample_offset != None:
+        image_file.seek(bits_per_sample_offset)
+        bits_per_sample = struct.unpack(byte_order + 'H', image_file.read(2))[0]
+
+    if width == 0 or height == 0:
+        return None
+    return width, height, channels, bits_per_sample
+
+def read_exr_header(image_file):
+    '''Reads the image header from the data window and channel list attributes of an OpenEXR file.'''
+    if image_file.read(4) != EXR_MAGIC_NUMBER:
+        return None
+    image_file.seek(4, os.SEEK_CUR)
+
+    def read_null_terminated_string():
+        characters = bytearray()
+        while True:
+            character = image_file.read(1)
+            if not character:
+                return None
+            if character == b'\x00':
+                return characters.decode('latin-1')
+            characters += character
+
+    width = height = 0
+    channel_bit_depths = []
+    while True:
+        attribute_name = read_null_terminated_string()
+        if not attribute_name:
+            break
+        attribute_type = read_null_terminated_string()
+        attribute_size_data = image_file.read(4)
+        if attribute_type == None or len(attribute_size_data) < 4:
+            return None
+        attribute_size = struct.unpack('<i', attribute_size_data)[0]
+        attribute_data = image_file.read(attribute_size)
+
+        if attribute_name == 'dataWindow' and attribute_type == 'box2i':
+            x_min, y_min, x_max, y_max = struct.unpack('<iiii', attribute_data[:16])
+            width = x_max - x_min + 1
+            height = y_max - y_min + 1
+
+        elif attribute_name == 'channels' and attribute_type == 'chlist':
+            # Each channel is a null terminated name followed by pixel type, linear flag, reserved bytes and x / y sampling.
+            offset = 0
+            while offset < len(attribute_data) and attribute_data[offset] != 0:
+                offset = attribute_data.index(b'\x00', offset) + 1
+                pixel_type = struct.unpack('<i', attribute_data[offset:offset + 4])[0]
+                channel_bit_depths.append(EXR_PIXEL_TYPE_BIT_DEPTHS.get(pixel_type, 32))
+                offset += 16
+
+    if width <= 0 or height <= 0:
+        return None
+    return width, height, len(channel_bit_depths), max(channel_bit_depths, default=16)
+
+def read_bmp_header(image_file):
+    '''Reads the image header from the bitmap info header of a BMP file.'''
+    data = image_file.read(30)
+    if len(data) < 30 or data[:2] != b'BM':
+        return None
+    width, height, planes, bits_per_pixel = struct.unpack('<iiHH', data[18:30])
+    match bits_per_pixel:
+        case 32:
+            return abs(width), abs(height), 4, 8
+        case 24 | 16:
+            return abs(width), abs(height), 3, 8
+        case _:
+            return abs(width), abs(height), 1, bits_per_pixel
+
+# Header readers for each supported image file extension.
+HEADER_READERS = {
+    '.png': read_png_header,
+    '.jpg': read_jpeg_header,
+    '.jpeg': read_jpeg_header,
+    '.tif': read_tiff_header,
+    '.tiff': read_tiff_header,
+    '.exr': read_exr_header,
+    '.bmp': read_bmp_header
+}
+
+def read_image_header(image_path):
+    '''Returns the image header (width, height, channels, bit depth) for the provided image file, or None if the file can't be read.'''
+    read_header = HEADER_READERS.get(os.path.splitext(image_path)[1].lower())
+    if not read_header:
+        return None
+
+    try:
+        with open(image_path, 'rb') as image_file:
+            header = read_header(image_file)
+    except (OSError, struct.error, ValueError):
+        return None
+
+    if not header:
+        return None
+    return ImageHeader(image_path, *header)
+
+def probe_image_headers(image_paths, max_workers=8):
+    '''Reads the image headers for all provided image files in a thread pool. Returns a list of image headers, with None for files that can't be read.'''
+    image_paths = list(image_paths)
+    if len(image_paths) <= 1:
+        return [read_image_header(image_path) for image_path in image_paths]
+
+    # Reading headers is bound by file access (especially on network drives), so threads aren't limited by the GIL.
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(image_paths))) as executor:
+        return list(executor.map(read_image_header, image_paths))
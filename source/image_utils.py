@@ -1,24 +1,57 @@
 # This file contains functions to help creating, saving, and editing of image files within Blender.
 
 import bpy
-import debug_logging
-import texture_settings
-import random
+from ..source import debug_logging
+from ..source import texture_settings
+import numpy
 import os
+import sys
+import queue
+import stat
+import shutil
+import hashlib
 import platform
+import threading
 import subprocess
 
-def create_image(new_image_name, image_width=-1, image_height=-1, base_color=(0.0, 0.0, 0.0, 1.0), generate_type='BLANK', alpha_channel=False, thirty_two_bit=False, add_unique_id=False, delete_existing=False):
-    '''Creates a new image in blend data.'''
+# Size of the chunks image files are read in while hashing, so large images are never fully loaded into memory.
+HASH_CHUNK_BYTES = 1024 * 1024
+
+# Linux ioctl request for cloning a file (reflink) on copy-on-write file systems (Btrfs, XFS).
+FICLONE = 0x40049409
+
+# Queue of raw image copies (source path, raw image path, file size) processed by a background thread, and the progress of queued copies.
+_raw_image_copy_queue = queue.Queue()
+_raw_image_copy_lock = threading.Lock()
+_raw_image_copy_progress = {'total_bytes': 0, 'copied_bytes': 0, 'total_files': 0, 'copied_files': 0}
+_raw_image_copy_thread = None
+
+# Hashes of files keyed by (path, size, modification time), so unchanged files aren't hashed again.
+_file_hashes = {}
+
+# Counters used to generate unique image names, stored per image name so finding an unused name doesn't require guessing.
+_unique_image_name_counters = {}
+
+def get_unique_image_name(image_name):
+    '''Returns a unique image name by appending an incrementing ID to the provided image name (i.e 'Paint_1', 'Paint_2').'''
+    counter = _unique_image_name_counters.get(image_name, 0)
+    while True:
+        counter += 1
+        unique_image_name = "{0}_{1}".format(image_name, counter)
+        if bpy.data.images.get(unique_image_name) == None:
+            _unique_image_name_counters[image_name] = counter
+            return unique_image_name
+
+def create_image(new_image_name, image_width=-1, image_height=-1, base_color=(0.0, 0.0, 0.0, 1.0), generate_type='BLANK', alpha_channel=False, thirty_two_bit=False, add_unique_id=False, delete_existing=False, fill_pixels=False):
+    '''Creates a new image in blend data. This doesn't use operators, so it doesn't require a valid context.
+    If fill pixels is on, the image pixels are filled with the base color (rather than generated) so they can be edited directly.'''
     if delete_existing:
         existing_image = bpy.data.images.get(new_image_name)
         if existing_image:
             bpy.data.images.remove(existing_image)
 
     if add_unique_id:
-        new_image_name = "{0}_{1}".format(new_image_name, str(random.randrange(10000,99999)))
-        while bpy.data.images.get(new_image_name) != None:
-            new_image_name = "{0}_{1}".format(new_image_name, str(random.randrange(10000,99999)))
+        new_image_name = get_unique_image_name(new_image_name)
 
     # If -1 is passed, use the image resolution defined in the texture set settings.
     if image_width == -1:
@@ -31,17 +64,63 @@ def create_image(new_image_name, image_width=-1, image_height=-1, base_color=(0.
     else:
         h = image_height
 
-    bpy.ops.image.new(name=new_image_name, 
-                      width=w, 
-                      height=h,
-                      color=base_color, 
-                      alpha=alpha_channel, 
-                      generated_type=generate_type,
-                      float=thirty_two_bit,
-                      use_stereo_3d=False, 
-                      tiled=False)
+    image = bpy.data.images.new(
+        name=new_image_name,
+        width=w,
+        height=h,
+        alpha=alpha_channel,
+        float_buffer=thirty_two_bit,
+        stereo3d=False,
+        tiled=False
+    )
+
+    if fill_pixels:
+        pixels = numpy.empty((w * h, image.channels), dtype=numpy.float32)
+        pixels[:] = base_color[:image.channels]
+        image.pixels.foreach_set(pixels.ravel())
+        image.update()
+    else:
+        image.generated_type = generate_type
+        image.generated_color = base_color
+
+    return image
 
-    return bpy.data.images.get(new_image_name)
+def create_images(new_image_names, image_width=-1, image_height=-1, **create_image_settings):
+    '''Creates a new image in blend data for each of the provided names (i.e all material channels for a paint layer) using the same settings.
+    Returns a dictionary of the provided names to their created images.'''
+
+    # Resolve the texture set resolution once for all images.
+    if image_width == -1:
+        image_width = texture_settings.get_texture_width()
+    if image_height == -1:
+        image_height = texture_settings.get_texture_height()
+
+    created_images = {}
+    for new_image_name in new_image_names:
+        created_images[new_image_name] = create_image(new_image_name, image_width, image_height, **create_image_settings)
+    return created_images
+
+def load_images(image_paths):
+    '''Loads the provided image files directly into blend data, reusing images already loaded from the same absolute path.
+    Returns a dictionary of image paths to their loaded images (None for images that failed to load).'''
+    loaded_images = {}
+    for image_path in image_paths:
+        absolute_image_path = os.path.normpath(bpy.path.abspath(image_path))
+        if absolute_image_path in loaded_images:
+            loaded_images[image_path] = loaded_images[absolute_image_path]
+            continue
+
+        # Unlike the image open operator, loading images through blend data doesn't validate the context, push an undo step or redraw for each image,
+        # and returns the loaded image directly instead of relying on image names (which collide for images with the same name in different folders).
+        try:
+            image = bpy.data.images.load(absolute_image_path, check_existing=True)
+        except RuntimeError as error:
+            debug_logging.log("Failed to load image {0}: {1}".format(absolute_image_path, error), message_type='ERROR')
+            image = None
+
+        loaded_images[absolute_image_path] = image
+        loaded_images[image_path] = image
+    return loaded_images
 
 def open_folder(folder_path, self):
     '''Opens the folder path in the users file browser based on their operating system.'''
@@ -53,4 +132,152 @@ def open_folder(folder_path, self):
         else:
             subprocess.Popen(["xdg-open", folder_path])
     else:
-        debug_logging.log_status("Folder path is invalid: {0}".format(folder_path), self, type='INFO')
\ No newline at end of file
+        debug_logging.log_status("Folder path is invalid: {0}".format(folder_path), self, type='INFO')
+
+def get_file_hash(file_path):
+    '''Returns the SHA-256 hash of the file contents, reading the file in chunks. Hashes are cached until the file size or modification time changes.'''
+    stat = os.stat(file_path)
+    cache_key = (os.path.normcase(os.path.abspath(file_path)), stat.st_size, stat.st_mtime_ns)
+    file_hash = _file_hashes.get(cache_key)
+    if file_hash:
+        return file_hash
+
+    hasher = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_BYTES), b''):
+            hasher.update(chunk)
+    file_hash = hasher.hexdigest()
+    _file_hashes[cache_key] = file_hash
+    return file_hash
+
+def get_raw_image_store_folder():
+    '''Returns the content addressed store raw images are kept in (shared by all projects), in Blender's user data files folder.'''
+    return bpy.utils.user_resource('DATAFILES', path="rywrangler/raw_image_store")
+
+def copy_file(source_path, destination_path):
+    '''Copies the file through a temporary path, so an interrupted copy never leaves a partial file at the destination.'''
+    temporary_path = destination_path + ".tmp"
+    shutil.copyfile(source_path, temporary_path)
+    os.replace(temporary_path, destination_path)
+
+def reflink_file(source_path, destination_path):
+    '''Clones the file (reflink) where the file system supports copy-on-write, so no data is duplicated. Returns false if the file couldn't be cloned.'''
+    if not sys.platform.startswith('linux'):
+        return False
+    import fcntl
+    temporary_path = destination_path + ".tmp"
+    try:
+        with open(source_path, 'rb') as source_file, open(temporary_path, 'wb') as destination_file:
+            fcntl.ioctl(destination_file.fileno(), FICLONE, source_file.fileno())
+    except OSError:
+        if os.path.isfile(temporary_path):
+            os.remove(temporary_path)
+        return False
+    os.replace(temporary_path, destination_path)
+    return True
+
+def copy_raw_image(source_path, store_path, raw_image_path):
+    '''Saves the source image into the raw image folder, as a clone of the stored image where the file system supports reflinks.
+    Clones share their data until one is edited (copy-on-write), so the same image in many projects is stored once, and editing a raw image in one project
+    (i.e with edit externally) never changes it for other projects. Without reflinks the image is copied straight into the raw image folder, since keeping
+    another copy in the store would double the disk space used. Runs on the raw image copy thread, so it doesn't access Blender data.'''
+    if os.path.isfile(raw_image_path):
+        # Raw images hard linked to the store (by earlier versions of this add-on) are replaced with copies.
+        if not (os.path.isfile(store_path) and os.path.samefile(raw_image_path, store_path)) and get_file_hash(raw_image_path) == os.path.splitext(os.path.basename(store_path))[0]:
+            return
+        os.remove(raw_image_path)
+    os.makedirs(os.path.dirname(raw_image_path), exist_ok=True)
+
+    if os.path.isfile(store_path) and reflink_file(store_path, raw_image_path):
+        return
+
+    if reflink_file(source_path, raw_image_path):
+        # Stored images are read-only clones, used for the next project importing the same image.
+        if not os.path.isfile(store_path):
+            os.makedirs(os.path.dirname(store_path), exist_ok=True)
+            if reflink_file(raw_image_path, store_path):
+                os.chmod(store_path, stat.S_IREAD | stat.S_IRGRP | stat.S_IROTH)
+        return
+
+    copy_file(source_path, raw_image_path)
+
+def save_raw_image_copy(source_path, raw_image_path, store_folder):
+    '''Hashes the source image and saves it into the raw image folder, logging (rather than raising) errors.'''
+    try:
+        file_hash = get_file_hash(source_path)
+        store_path = os.path.join(store_folder, file_hash[:2], file_hash + os.path.splitext(source_path)[1].lower())
+        copy_raw_image(source_path, store_path, raw_image_path)
+    except OSError as error:
+        debug_logging.log("Failed to save raw image {0}: {1}".format(source_path, error), message_type='ERROR')
+
+def process_raw_image_copies():
+    '''Copies queued raw images one after another, until the queue is empty.'''
+    global _raw_image_copy_thread
+    while True:
+        try:
+            source_path, raw_image_path, file_size = _raw_image_copy_queue.get(timeout=0.5)
+        except queue.Empty:
+            with _raw_image_copy_lock:
+                if _raw_image_copy_queue.empty():
+                    _raw_image_copy_thread = None
+                    return
+            continue
+
+        save_raw_image_copy(source_path, raw_image_path, _raw_image_copy_progress['store_folder'])
+        with _raw_image_copy_lock:
+            _raw_image_copy_progress['copied_bytes'] += file_size
+            _raw_image_copy_progress['copied_files'] += 1
+
+def update_raw_image_copy_status():
+    '''Timer displaying the progress of raw image copies in the status bar, until all copies are finished.'''
+    with _raw_image_copy_lock:
+        progress = dict(_raw_image_copy_progress)
+        finished = _raw_image_copy_thread == None and _raw_image_copy_queue.empty()
+        if finished:
+            _raw_image_copy_progress.update({'total_bytes': 0, 'copied_bytes': 0, 'total_files': 0, 'copied_files': 0})
+
+    status_text = None
+    if not finished:
+        status_text = "Saving raw images: {0} of {1} ({2:.0f}%)".format(
+            progress['copied_files'],
+            progress['total_files'],
+            progress['copied_bytes'] / max(progress['total_bytes'], 1) * 100
+        )
+    for window in bpy.context.window_manager.windows:
+        window.workspace.status_text_set(status_text)
+
+    if finished:
+        debug_logging.log("Saved {0} raw images.".format(progress['copied_files']))
+        return None
+    return 0.25
+
+def save_raw_image(image_path, image_name):
+    '''Saves a copy of the image file into the raw image folder on a background thread, and returns immediately (in background Blender, it's saved right away).
+    Raw images are content addressed: files are hashed, and on file systems supporting reflinks they're kept once in a shared store and cloned into the raw image folder
+    of each project, so the same image imported into many projects is only stored once.'''
+    global _raw_image_copy_thread
+    raw_image_folder = texture_settings.get_raw_image_folder()
+    if not raw_image_folder:
+        debug_logging.log("Raw image {0} wasn't saved, save the blend file or set a raw image folder first.".format(image_name), message_type='WARNING')
+        return
+
+    source_path = os.path.normpath(bpy.path.abspath(image_path))
+    raw_image_path = os.path.join(raw_image_folder, bpy.path.clean_name(os.path.splitext(image_name)[0]) + os.path.splitext(source_path)[1].lower())
+    if os.path.normcase(source_path) == os.path.normcase(raw_image_path):
+        return
+
+    # Background Blender (i.e batch pipeline workers) can exit as soon as a script finishes and never runs timers, so raw images are saved before returning.
+    if bpy.app.background:
+        save_raw_image_copy(source_path, raw_image_path, get_raw_image_store_folder())
+        return
+
+    with _raw_image_copy_lock:
+        _raw_image_copy_progress['store_folder'] = get_raw_image_store_folder()
+        _raw_image_copy_progress['total_bytes'] += os.path.getsize(source_path)
+        _raw_image_copy_progress['total_files'] += 1
+        _raw_image_copy_queue.put((source_path, raw_image_path, os.path.getsize(source_path)))
+        if _raw_image_copy_thread == None:
+            _raw_image_copy_thread = threading.Thread(target=process_raw_image_copies, daemon=True)
+            _raw_image_copy_thread.start()
+        if not bpy.app.timers.is_registered(update_raw_image_copy_status):
+            bpy.app.timers.register(update_raw_image_copy_status, first_interval=0.25)
@@ -0,0 +1,211 @@
+# This file contains functions to stack layers by blending each material channel (color, roughness, normal...) separately into a single Principled BSDF.
+# Blending channels with cheap mix nodes, rather than wrapping every layer in a Mix Shader, results in a single shader closure
+# no matter how many layers are stacked, which makes shader compiles and renders significantly faster.
+# Each channel is blended as a chain of mix nodes, one per layer, in stack order. Layers blend over the result of the layers below them (alpha over),
+# which isn't associative, so the chain can't be rebalanced into a pairwise tree without changing the result. Grouping layers into node groups doesn't help either,
+# Blender inlines node groups when compiling. The mixes are cheap scalar / vector operations inside the one closure, so chain depth costs little to compile,
+# but layers that fully cover the layers below them (a constant factor of 1) start the chain instead of adding to it.
+
+import bpy
+from .texture_channels import MATERIAL_CHANNEL_TAGS, split_filename_by_components
+from ..source import debug_logging
+
+# Name of the Principled BSDF all layer channels are blended into.
+STACK_SHADER_NODE_NAME = "RyWrangler_StackShader"
+
+# Principled BSDF input socket names for material channels that can be blended per channel.
+CHANNEL_SOCKET_NAMES = {
+    'BASE_COLOR': "Base Color",
+    'SUBSURFACE': "Subsurface Weight",
+    'METALLIC': "Metallic",
+    'SPECULAR': "Specular IOR Level",
+    'ROUGHNESS': "Roughness",
+    'EMISSION': "Emission Color",
+    'NORMAL': "Normal",
+    'ALPHA': "Alpha",
+    'COAT': "Coat Weight"
+}
+
+# Mix node data types for each socket type.
+MIX_DATA_TYPES = {
+    'RGBA': 'RGBA',
+    'VECTOR': 'VECTOR',
+    'VALUE': 'FLOAT'
+}
+
+def get_socket_channel(socket_name):
+    '''Returns the material channel the provided socket name identifies (i.e 'Base Color' = 'BASE_COLOR'), or None.'''
+    for channel, channel_socket_name in CHANNEL_SOCKET_NAMES.items():
+        if socket_name == channel_socket_name:
+            return channel
+    for component in split_filename_by_components(socket_name):
+        channel = MATERIAL_CHANNEL_TAGS.get(component)
+        if channel in CHANNEL_SOCKET_NAMES:
+            return channel
+    return None
+
+def get_channel_sources(node):
+    '''Returns a dictionary of material channels to the output socket (or constant value) the provided layer node supplies for them.
+    Group nodes supply channels through outputs named after material channels, Principled BSDF nodes through their (linked or constant) inputs.'''
+    channel_sources = {}
+    if node.type == 'BSDF_PRINCIPLED':
+        for channel, socket_name in CHANNEL_SOCKET_NAMES.items():
+            socket = node.inputs.get(socket_name)
+            if not socket:
+                continue
+            if socket.is_linked:
+                channel_sources[channel] = socket.links[0].from_socket
+            elif socket.type != 'VECTOR':
+                channel_sources[channel] = socket.default_value[:] if socket.type == 'RGBA' else socket.default_value
+
+    elif node.type == 'GROUP':
+        for output in node.outputs:
+            channel = get_socket_channel(output.name)
+            if channel and channel not in channel_sources and output.type != 'SHADER':
+                channel_sources[channel] = output
+
+    return channel_sources
+
+def get_mix_sockets(mix_node):
+    '''Returns the (factor, A, B, result) sockets used by the mix node for its data type.'''
+    match mix_node.data_type:
+        case 'RGBA':
+            return mix_node.inputs[0], mix_node.inputs[6], mix_node.inputs[7], mix_node.outputs[2]
+        case 'VECTOR':
+            return mix_node.inputs[0], mix_node.inputs[4], mix_node.inputs[5], mix_node.outputs[1]
+        case _:
+            return mix_node.inputs[0], mix_node.inputs[2], mix_node.inputs[3], mix_node.outputs[0]
+
+def connect_source(links, source, socket):
+    '''Links the source output socket into the provided input socket, or sets the input socket value if the source is a constant.'''
+    if isinstance(source, bpy.types.NodeSocket):
+        links.new(source, socket)
+    elif isinstance(source, tuple) and len(socket.default_value) != len(source):
+        socket.default_value = source[:len(socket.default_value)]
+    else:
+        socket.default_value = source
+
+def get_stack_shader(node_tree):
+    '''Returns the Principled BSDF layers are blended into, or None if the material isn't using a channel layer stack.'''
+    return node_tree.nodes.get(STACK_SHADER_NODE_NAME)
+
+def add_layer_to_stack(node_tree, layer_node, factor_source, channels=None):
+    '''Blends each material channel the layer node supplies (or only the provided channels) over the matching input of the stack shader,
+    using the provided factor (socket or constant). Returns the number of blended channels.'''
+    nodes = node_tree.nodes
+    links = node_tree.links
+    stack_shader = get_stack_shader(node_tree)
+    blended_channel_count = 0
+    for channel, layer_source in get_channel_sources(layer_node).items():
+        if channels != None and channel not in channels:
+            continue
+        shader_input = stack_shader.inputs.get(CHANNEL_SOCKET_NAMES[channel])
+        if not shader_input:
+            continue
+
+        # The current value of the channel is blended with the layer. Unlinked channels are blended with the shaders default value.
+        # Unlinked normals use the geometry normal, which can't be blended, so the layer normal is connected directly.
+        if shader_input.is_linked:
+            current_source = shader_input.links[0].from_socket
+        elif shader_input.type == 'VECTOR':
+            links.new(layer_source, shader_input)
+            blended_channel_count += 1
+            continue
+        else:
+            current_source = shader_input.default_value[:] if shader_input.type == 'RGBA' else shader_input.default_value
+
+        mix_node = nodes.new('ShaderNodeMix')
+        mix_node.data_type = MIX_DATA_TYPES.get(shader_input.type, 'FLOAT')
+        mix_node.label = "{0} {1}".format(layer_node.name, shader_input.name)
+        mix_node.hide = True
+        mix_node.location = (stack_shader.location.x - 250, stack_shader.location.y - 40 * list(CHANNEL_SOCKET_NAMES).index(channel))
+        factor_socket, a_socket, b_socket, result_socket = get_mix_sockets(mix_node)
+        connect_source(links, factor_source, factor_socket)
+        connect_source(links, current_source, a_socket)
+        connect_source(links, layer_source, b_socket)
+        links.new(result_socket, shader_input)
+        blended_channel_count += 1
+
+    return blended_channel_count
+
+def create_stack_shader(node_tree, location):
+    '''Creates the Principled BSDF layers are blended into and connects it to the material output.'''
+    stack_shader = node_tree.nodes.new('ShaderNodeBsdfPrincipled')
+    stack_shader.name = STACK_SHADER_NODE_NAME
+    stack_shader.label = "Layer Stack"
+    stack_shader.location = location
+
+    output_node = next((node for node in node_tree.nodes if node.type == 'OUTPUT_MATERIAL' and node.is_active_output), None)
+    if output_node:
+        node_tree.links.new(stack_shader.outputs[0], output_node.inputs['Surface'])
+    return stack_shader
+
+def get_mix_shader_chain(node):
+    '''Returns the layers of a Mix Shader chain (as made by adding layers in Mix Shader mode) as a list of (layer node, factor) tuples, starting with the base layer.
+    Factors are output sockets or constants. Returns None if the chain contains shaders that can't be blended per channel.'''
+    layers = []
+    while node.type == 'MIX_SHADER':
+        factor_input, base_input, layer_input = node.inputs[0], node.inputs[1], node.inputs[2]
+        if not base_input.is_linked or not layer_input.is_linked:
+            return None
+        factor = factor_input.links[0].from_socket if factor_input.is_linked else factor_input.default_value
+        layers.append((layer_input.links[0].from_node, factor))
+        node = base_input.links[0].from_node
+
+    layers.append((node, 1.0))
+    layers.reverse()
+    if any(not get_channel_sources(layer_node) for layer_node, factor in layers):
+        return None
+    return layers
+
+def rebuild_layer_stack(node_tree):
+    '''Converts the Mix Shader chain connected to the material output into a channel layer stack blending into a single Principled BSDF.
+    Returns the number of converted layers, or 0 if the chain can't be converted.'''
+    if get_stack_shader(node_tree):
+        return 0
+
+    output_node = next((node for node in node_tree.nodes if node.type == 'OUTPUT_MATERIAL' and node.is_active_output), None)
+    if not output_node or not output_node.inputs['Surface'].is_linked:
+        return 0
+
+    surface_node = output_node.inputs['Surface'].links[0].from_node
+    layers = get_mix_shader_chain(surface_node)
+    if not layers:
+        debug_logging.log("Can't rebuild the layer stack, the chain contains shaders without material channel outputs.", message_type='WARNING')
+        return 0
+
+    # Collect the Mix Shader nodes before the material output is relinked to the new stack shader.
+    mix_shader_nodes = []
+    node = surface_node
+    while node.type == 'MIX_SHADER':
+        mix_shader_nodes.append(node)
+        node = node.inputs[1].links[0].from_node
+
+    stack_shader = create_stack_shader(node_tree, (output_node.location.x - 300, output_node.location.y))
+
+    # Layers with a constant factor of 1 (including the base layer) completely cover the layers below them in the channels they supply.
+    # Each channel starts from the last layer completely covering it, layers below it would be mixed away, so they aren't blended into the channel.
+    channel_start_layers = {}
+    for layer_index, (layer_node, factor) in enumerate(layers):
+        if not isinstance(factor, bpy.types.NodeSocket) and factor >= 1.0:
+            for channel in get_channel_sources(layer_node):
+                channel_start_layers[channel] = layer_index
+
+    # Every following layer is blended over the start of each channel with its Mix Shader factor, layers with a constant factor of 0 don't change anything.
+    for layer_index, (layer_node, factor) in enumerate(layers):
+        channel_sources = get_channel_sources(layer_node)
+        for channel, source in channel_sources.items():
+            shader_input = stack_shader.inputs.get(CHANNEL_SOCKET_NAMES[channel])
+            if shader_input and channel_start_layers.get(channel) == layer_index:
+                connect_source(node_tree.links, source, shader_input)
+
+        if not isinstance(factor, bpy.types.NodeSocket) and factor <= 0.0:
+            continue
+        blended_channels = [channel for channel in channel_sources if channel_start_layers.get(channel, -1) < layer_index]
+        if blended_channels:
+            add_layer_to_stack(node_tree, layer_node, factor, blended_channels)
+
+    for mix_shader_node in mix_shader_nodes:
+        node_tree.nodes.remove(mix_shader_node)
+
+    return len(layers)
@@ -0,0 +1,136 @@
+# This file contains functions to hash the structure of node trees and merge node groups that are structurally identical.
+# Repeated appends and layer duplication leave many identical copies of node groups (i.e 'Mask_Grunge.001', 'Layer_UV_Copy') in blend files.
+# Node groups are bucketed by their structural hash, so duplicates are found in linear time rather than by comparing every pair of node groups.
+
+import hashlib
+import bpy
+from .asset_library import DUPLICATE_NAME_PATTERN
+from ..source import debug_logging
+
+# Node properties that only affect how nodes are displayed in the node editor, not the shader they compile to.
+IGNORED_NODE_PROPERTIES = {
+    'rna_type', 'name', 'label', 'location', 'location_absolute', 'width', 'height', 'dimensions', 'select', 'hide', 'parent', 'color', 'use_custom_color',
+    'show_options', 'show_preview', 'show_texture', 'inputs', 'outputs', 'internal_links', 'type', 'bl_idname', 'bl_label', 'bl_description', 'bl_icon',
+    'bl_static_type', 'bl_width_default', 'bl_width_min', 'bl_width_max', 'bl_height_default', 'bl_height_min', 'bl_height_max', 'warning_propagation',
+    'interface', 'texture_mapping', 'color_mapping'
+}
+
+def get_value_key(value):
+    '''Returns a hashable representation of a property or socket value.'''
+    if isinstance(value, bpy.types.ID):
+        return ('ID', type(value).__name__, value.name, value.library.filepath if value.library else "")
+    if isinstance(value, (str, int, float, bool)) or value == None:
+        return value
+    if isinstance(value, set):
+        return tuple(sorted(value))
+    if hasattr(value, "__len__"):
+        return tuple(get_value_key(item) for item in value)
+    return repr(value)
+
+def get_color_ramp_key(color_ramp):
+    '''Returns a hashable representation of a color ramp.'''
+    return (color_ramp.color_mode, color_ramp.interpolation, color_ramp.hue_interpolation, tuple((element.position, tuple(element.color)) for element in color_ramp.elements))
+
+def get_curve_mapping_key(curve_mapping):
+    '''Returns a hashable representation of a curve mapping (i.e from RGB curve nodes).'''
+    return (tuple(curve_mapping.black_level), tuple(curve_mapping.white_level), tuple(
+        tuple((tuple(point.location), point.handle_type) for point in curve.points) for curve in curve_mapping.curves
+    ))
+
+def get_node_key(node, node_tree_hashes):
+    '''Returns a hashable representation of the node settings and unlinked input values. Nested node groups are represented by their structural hash.'''
+    settings = []
+    for rna_property in node.bl_rna.properties:
+        identifier = rna_property.identifier
+        if identifier in IGNORED_NODE_PROPERTIES or rna_property.type == 'COLLECTION':
+            continue
+        value = getattr(node, identifier, None)
+        if identifier == 'node_tree':
+            value = get_node_tree_hash(value, node_tree_hashes) if value else None
+        elif identifier == 'color_ramp' and value:
+            value = get_color_ramp_key(value)
+        elif identifier == 'mapping' and value:
+            value = get_curve_mapping_key(value)
+        elif rna_property.type == 'POINTER' and not isinstance(value, bpy.types.ID):
+            continue
+        else:
+            value = get_value_key(value)
+        settings.append((identifier, value))
+
+    input_values = []
+    for socket in node.inputs:
+        if not socket.is_linked and hasattr(socket, "default_value"):
+            input_values.append((socket.identifier, get_value_key(socket.default_value)))
+
+    return (node.bl_idname, node.name, tuple(settings), tuple(input_values))
+
+def get_interface_key(node_tree):
+    '''Returns a hashable representation of the node tree interface (group inputs and outputs).'''
+    interface_items = []
+    for item in node_tree.interface.items_tree:
+        if item.item_type == 'SOCKET':
+            default_value = get_value_key(item.default_value) if hasattr(item, "default_value") else None
+            interface_items.append((item.item_type, item.in_out, item.name, item.socket_type, default_value))
+        else:
+            interface_items.append((item.item_type, item.name))
+    return tuple(interface_items)
+
+def get_node_tree_hash(node_tree, node_tree_hashes=None):
+    '''Returns a structural hash of the node tree, covering its interface, node settings, input values, links and (recursively) nested node groups.
+    Hashes are memoized in the provided dictionary (keyed by node tree pointer), so nested node groups shared by many node groups are hashed once.'''
+    if node_tree_hashes == None:
+        node_tree_hashes = {}
+    cache_key = node_tree.as_pointer()
+    if cache_key in node_tree_hashes:
+        return node_tree_hashes[cache_key]
+
+    # Mark the node tree as being hashed, in case of (invalid) recursive node groups.
+    node_tree_hashes[cache_key] = "RECURSIVE"
+
+    node_keys = sorted(get_node_key(node, node_tree_hashes) for node in node_tree.nodes)
+    link_keys = sorted(
+        (link.from_node.name, link.from_socket.identifier, link.to_node.name, link.to_socket.identifier, link.is_muted)
+        for link in node_tree.links
+    )
+    structure = (node_tree.bl_idname, get_interface_key(node_tree), tuple(node_keys), tuple(link_keys))
+    node_tree_hash = hashlib.sha1(repr(structure).encode('utf-8')).hexdigest()
+    node_tree_hashes[cache_key] = node_tree_hash
+    return node_tree_hash
+
+def get_canonical_node_group(node_groups, prefer=None):
+    '''Returns the node group duplicates are merged into. Preferred node groups (i.e shared layer node groups) come first,
+    then node groups without a duplicate suffix or copy name, then the shortest name.'''
+    return min(node_groups, key=lambda node_group: (
+        not (prefer and prefer(node_group)),
+        bool(DUPLICATE_NAME_PATTERN.match(node_group.name)),
+        node_group.name.endswith("_Copy") or "_NewLayer" in node_group.name,
+        len(node_group.name),
+        node_group.name
+    ))
+
+def deduplicate_node_groups(prefer=None):
+    '''Remaps all users of structurally identical local node groups to a single canonical node group and removes the duplicates.
+    Returns the number of removed node groups.'''
+    node_tree_hashes = {}
+    node_groups_by_hash = {}
+    for node_group in bpy.data.node_groups:
+        if node_group.library:
+            continue
+        node_groups_by_hash.setdefault(get_node_tree_hash(node_group, node_tree_hashes), []).append(node_group)
+
+    removed_count = 0
+    for node_groups in node_groups_by_hash.values():
+        if len(node_groups) < 2:
+            continue
+        canonical_node_group = get_canonical_node_group(node_groups, prefer)
+        for node_group in node_groups:
+            if node_group == canonical_node_group:
+                continue
+            if node_group.use_fake_user:
+                canonical_node_group.use_fake_user = True
+            node_group.user_remap(canonical_node_group)
+            bpy.data.node_groups.remove(node_group)
+            removed_count += 1
+
+    debug_logging.log("Removed {0} duplicate node groups.".format(removed_count))
+    return removed_count
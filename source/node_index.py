@@ -0,0 +1,126 @@
+# This file contains a cached index of the nodes in each node tree (nodes by type, the output node and layer group nodes).
+# Operators look nodes up through the index instead of scanning all nodes on every call, which keeps them responsive in node trees with thousands of nodes.
+# Indexes store node names rather than node references, and every lookup checks the indexed nodes still exist (with the same type), so nodes removed or
+# renamed since the node tree was indexed are never returned. Indexes are also cleared by a depsgraph handler when node trees change.
+# Selections aren't indexed. Node editor selection operators neither tag the depsgraph nor publish to the message bus, so an indexed selection can't be kept
+# up to date. Operators read selections from the node tree directly, stopping at the first match where they only need one selected node.
+
+import bpy
+from bpy.app.handlers import persistent
+
+# Cached node indexes keyed by node tree pointer.
+_node_indexes = {}
+
+# Node types that are output nodes.
+OUTPUT_NODE_TYPES = {'OUTPUT_MATERIAL', 'GROUP_OUTPUT'}
+
+def is_layer_group_node(node):
+    '''Returns true if the node is a layer group node added by this add-on (including unique copies, i.e 'Material_Layer_UV').'''
+    return node.type == 'GROUP' and node.node_tree != None and "Layer_" in node.node_tree.name
+
+def build_node_index(node_tree):
+    '''Indexes the names of all nodes in the node tree with a single pass over its nodes.'''
+    node_index = {
+        'node_count': len(node_tree.nodes),
+        'by_type': {},
+        'output': [],
+        'layer_groups': []
+    }
+    active_output_names = []
+    fallback_output_names = []
+    for node in node_tree.nodes:
+        node_index['by_type'].setdefault(node.type, []).append(node.name)
+        if node.type in OUTPUT_NODE_TYPES:
+            if node.is_active_output and not active_output_names:
+                active_output_names.append(node.name)
+            if not fallback_output_names:
+                fallback_output_names.append(node.name)
+        elif is_layer_group_node(node):
+            node_index['layer_groups'].append(node.name)
+
+    node_index['output'] = active_output_names or fallback_output_names
+    _node_indexes[node_tree.as_pointer()] = node_index
+    return node_index
+
+def get_node_index(node_tree):
+    '''Returns the cached index of the node tree, building it if the node tree wasn't indexed or its node count changed.'''
+    node_index = _node_indexes.get(node_tree.as_pointer())
+    if node_index == None or node_index['node_count'] != len(node_tree.nodes):
+        node_index = build_node_index(node_tree)
+    return node_index
+
+def resolve_nodes(node_tree, node_names, is_valid_node):
+    '''Returns the nodes with the provided names, or None if any of them no longer exists or is no longer valid.'''
+    nodes = []
+    for node_name in node_names:
+        node = node_tree.nodes.get(node_name)
+        if node == None or not is_valid_node(node):
+            return None
+        nodes.append(node)
+    return nodes
+
+def get_indexed_nodes(node_tree, key, is_valid_node, node_type=""):
+    '''Returns the indexed nodes under the key of the node tree index, rebuilding the index if any indexed node is no longer valid.'''
+    node_index = get_node_index(node_tree)
+    node_names = node_index[key].get(node_type, []) if node_type else node_index[key]
+    nodes = resolve_nodes(node_tree, node_names, is_valid_node)
+    if nodes == None:
+        node_index = build_node_index(node_tree)
+        node_names = node_index[key].get(node_type, []) if node_type else node_index[key]
+        nodes = resolve_nodes(node_tree, node_names, is_valid_node) or []
+    return nodes
+
+def get_nodes_by_type(node_tree, node_type):
+    '''Returns all nodes of the provided type (i.e 'TEX_IMAGE') in the node tree.'''
+    return get_indexed_nodes(node_tree, 'by_type', lambda node: node.type == node_type, node_type)
+
+def get_output_node(node_tree):
+    '''Returns the active material output (or group output) node of the node tree.'''
+    output_nodes = get_indexed_nodes(node_tree, 'output', lambda node: node.type in OUTPUT_NODE_TYPES)
+    return output_nodes[0] if output_nodes else None
+
+def get_layer_group_nodes(node_tree):
+    '''Returns all layer group nodes in the node tree.'''
+    return get_indexed_nodes(node_tree, 'layer_groups', is_layer_group_node)
+
+def invalidate(node_tree=None):
+    '''Clears the cached index of the node tree (or of all node trees), i.e after an operator adds or removes nodes.'''
+    if node_tree == None:
+        _node_indexes.clear()
+    else:
+        _node_indexes.pop(node_tree.as_pointer(), None)
+
+@persistent
+def on_depsgraph_update(scene, depsgraph):
+    '''Clears the indexes of node trees that changed.'''
+    for update in depsgraph.updates:
+        updated_id = update.id
+        if isinstance(updated_id, bpy.types.Material):
+            if updated_id.node_tree:
+                _node_indexes.pop(updated_id.node_tree.as_pointer(), None)
+        elif isinstance(updated_id, bpy.types.NodeTree):
+            _node_indexes.pop(updated_id.as_pointer(), None)
+
+@persistent
+def on_blend_data_reloaded(*args):
+    '''Clears all indexes when blend data is reloaded (undo, redo, loading blend files), since node tree pointers change.'''
+    _node_indexes.clear()
+
+def register_handlers():
+    '''Registers the handlers that keep node indexes up to date.'''
+    bpy.app.handlers.depsgraph_update_post.append(on_depsgraph_update)
+    bpy.app.handlers.undo_post.append(on_blend_data_reloaded)
+    bpy.app.handlers.redo_post.append(on_blend_data_reloaded)
+    bpy.app.handlers.load_post.append(on_blend_data_reloaded)
+
+def unregister_handlers():
+    '''Removes the handlers that keep node indexes up to date, and clears all indexes.'''
+    for handlers, handler in (
+        (bpy.app.handlers.depsgraph_update_post, on_depsgraph_update),
+        (bpy.app.handlers.undo_post, on_blend_data_reloaded),
+        (bpy.app.handlers.redo_post, on_blend_data_reloaded),
+        (bpy.app.handlers.load_post, on_blend_data_reloaded)
+    ):
+        if handler in handlers:
+            handlers.remove(handler)
+    _node_indexes.clear()
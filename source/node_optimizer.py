@@ -0,0 +1,258 @@
+# This file contains an optimisation pass for material node trees made with this add-on.
+# It removes nodes that don't contribute to the material output, collapses mixes with constant factors, folds math on constants
+# and merges identical group node instances. It doesn't require a context, so it can be run headless to clean up many materials.
+
+import re
+import math
+import bpy
+from ..source import shader_analysis
+from ..source import debug_logging
+
+# Math operations that can be folded into constants, with the number of inputs they use.
+MATH_OPERATIONS = {
+    'ADD': (2, lambda a, b, c: a + b),
+    'SUBTRACT': (2, lambda a, b, c: a - b),
+    'MULTIPLY': (2, lambda a, b, c: a * b),
+    'DIVIDE': (2, lambda a, b, c: a / b if b != 0.0 else 0.0),
+    'MULTIPLY_ADD': (3, lambda a, b, c: a * b + c),
+    'POWER': (2, lambda a, b, c: math.pow(a, b) if a > 0.0 or float(b).is_integer() else 0.0),
+    'SQRT': (1, lambda a, b, c: math.sqrt(a) if a > 0.0 else 0.0),
+    'ABSOLUTE': (1, lambda a, b, c: abs(a)),
+    'MINIMUM': (2, lambda a, b, c: min(a, b)),
+    'MAXIMUM': (2, lambda a, b, c: max(a, b)),
+    'LESS_THAN': (2, lambda a, b, c: 1.0 if a < b else 0.0),
+    'GREATER_THAN': (2, lambda a, b, c: 1.0 if a > b else 0.0),
+    'SIGN': (1, lambda a, b, c: math.copysign(1.0, a) if a != 0.0 else 0.0),
+    'ROUND': (1, lambda a, b, c: math.floor(a + 0.5)),
+    'FLOOR': (1, lambda a, b, c: math.floor(a)),
+    'CEIL': (1, lambda a, b, c: math.ceil(a)),
+    'FRACT': (1, lambda a, b, c: a - math.floor(a)),
+    'MODULO': (2, lambda a, b, c: math.fmod(a, b) if b != 0.0 else 0.0),
+    'SINE': (1, lambda a, b, c: math.sin(a)),
+    'COSINE': (1, lambda a, b, c: math.cos(a)),
+    'TANGENT': (1, lambda a, b, c: math.tan(a)),
+    'RADIANS': (1, lambda a, b, c: math.radians(a)),
+    'DEGREES': (1, lambda a, b, c: math.degrees(a))
+}
+
+# Pattern matching names of node groups made unique for a single layer by older versions of this add-on (i.e 'Metal_NewLayer.002', 'Layer_UV_Copy').
+LAYER_COPY_NAME_PATTERN = re.compile(r'(_NewLayer|_Copy)(\.\d{3,})?$')
+
+def relink_outputs(node_tree, old_socket, new_socket):
+    '''Moves all links from the old output socket to the new output socket.'''
+    for link in list(old_socket.links):
+        node_tree.links.new(new_socket, link.to_socket)
+        node_tree.links.remove(link)
+
+def get_mix_inputs(node):
+    '''Returns the (factor, A, B, result) sockets for mix nodes that select between inputs, or None for other nodes.'''
+    match node.type:
+        case 'MIX_SHADER':
+            return node.inputs[0], node.inputs[1], node.inputs[2], node.outputs[0]
+        case 'MIX':
+            if node.data_type == 'RGBA' and node.blend_type != 'MIX':
+                return None
+            if node.data_type == 'VECTOR' and node.factor_mode != 'UNIFORM':
+                return None
+            match node.data_type:
+                case 'RGBA':
+                    return node.inputs[0], node.inputs[6], node.inputs[7], node.outputs[2]
+                case 'VECTOR':
+                    return node.inputs[0], node.inputs[4], node.inputs[5], node.outputs[1]
+                case _:
+                    return node.inputs[0], node.inputs[2], node.inputs[3], node.outputs[0]
+        case 'MIX_RGB':
+            if node.blend_type != 'MIX':
+                return None
+            return node.inputs[0], node.inputs[1], node.inputs[2], node.outputs[0]
+    return None
+
+def collapse_constant_mixes(node_tree):
+    '''Bypasses mix nodes with an unlinked factor of exactly 0 or 1, since they only pass through one of their inputs. Returns the number of collapsed mix nodes.'''
+    collapsed_count = 0
+    for node in list(node_tree.nodes):
+        mix_inputs = get_mix_inputs(node)
+        if not mix_inputs or node.mute:
+            continue
+        factor_socket, a_socket, b_socket, result_socket = mix_inputs
+        if factor_socket.is_linked or factor_socket.default_value not in (0.0, 1.0):
+            continue
+
+        # Only inputs linked from other nodes can be passed through, constant inputs would need a new node.
+        selected_socket = a_socket if factor_socket.default_value == 0.0 else b_socket
+        if not selected_socket.is_linked or not result_socket.is_linked:
+            continue
+
+        relink_outputs(node_tree, result_socket, selected_socket.links[0].from_socket)
+        collapsed_count += 1
+    return collapsed_count
+
+def fold_constant_math(node_tree):
+    '''Replaces math nodes where all used inputs are unlinked with their result. Returns the number of folded math nodes.'''
+    folded_count = 0
+    for node in list(node_tree.nodes):
+        if node.type != 'MATH' or node.mute or not node.outputs[0].is_linked:
+            continue
+        operation = MATH_OPERATIONS.get(node.operation)
+        if not operation:
+            continue
+        input_count, calculate = operation
+        if any(node.inputs[i].is_linked for i in range(0, input_count)):
+            continue
+
+        try:
+            result = calculate(node.inputs[0].default_value, node.inputs[1].default_value, node.inputs[2].default_value)
+        except (ValueError, OverflowError):
+            continue
+        if node.use_clamp:
+            result = min(max(result, 0.0), 1.0)
+
+        # Write the result into float inputs directly, other inputs (i.e colors) are linked from a new value node.
+        value_node = None
+        for link in list(node.outputs[0].links):
+            to_socket = link.to_socket
+            if to_socket.type == 'VALUE' and hasattr(to_socket, "default_value"):
+                node_tree.links.remove(link)
+                to_socket.default_value = result
+            else:
+                if not value_node:
+                    value_node = node_tree.nodes.new('ShaderNodeValue')
+                    value_node.location = node.location
+                    value_node.label = node.label or node.name
+                    value_node.outputs[0].default_value = result
+                node_tree.links.new(value_node.outputs[0], to_socket)
+                node_tree.links.remove(link)
+        folded_count += 1
+    return folded_count
+
+def get_group_node_signature(node):
+    '''Returns a signature of the group node that's equal for group nodes that output identical values (same node group, input values and input links).'''
+    input_signature = []
+    for socket in node.inputs:
+        if socket.is_linked:
+            link = socket.links[0]
+            input_signature.append(('LINK', link.from_node.name, link.from_socket.identifier))
+        elif hasattr(socket, "default_value"):
+            value = socket.default_value
+            input_signature.append(('VALUE', tuple(value) if hasattr(value, "__len__") else value))
+        else:
+            input_signature.append(None)
+    return (node.node_tree.name, tuple(input_signature))
+
+def merge_identical_group_nodes(node_tree):
+    '''Merges group nodes using the same node group with identical inputs, so the node group is only evaluated once. Returns the number of merged group nodes.'''
+    merged_count = 0
+    group_nodes = {}
+    for node in list(node_tree.nodes):
+        if node.type != 'GROUP' or not node.node_tree or node.mute:
+            continue
+        signature = get_group_node_signature(node)
+        kept_node = group_nodes.get(signature)
+        if not kept_node:
+            group_nodes[signature] = node
+            continue
+
+        for old_socket, new_socket in zip(node.outputs, kept_node.outputs):
+            relink_outputs(node_tree, old_socket, new_socket)
+        merged_count += 1
+    return merged_count
+
+def remove_unreachable_nodes(node_tree):
+    '''Removes all nodes that don't contribute to any output node of the node tree (frames are kept). Returns the number of removed nodes.'''
+    input_nodes = shader_analysis.get_input_nodes(node_tree)
+    reachable_nodes = set()
+    for output_node in [node for node in node_tree.nodes if node.type in {'OUTPUT_MATERIAL', 'OUTPUT_AOV', 'GROUP_OUTPUT'}]:
+        nodes_to_visit = [output_node]
+        while nodes_to_visit:
+            node = nodes_to_visit.pop()
+            if node in reachable_nodes:
+                continue
+            reachable_nodes.add(node)
+            nodes_to_visit.extend(input_nodes.get(node, []))
+
+    unreachable_nodes = [node for node in node_tree.nodes if node not in reachable_nodes and node.type != 'FRAME']
+    for node in unreachable_nodes:
+        node_tree.nodes.remove(node)
+    return len(unreachable_nodes)
+
+def get_used_node_groups(node_tree, used_node_groups=None):
+    '''Returns all node groups used by group nodes in the node tree, including node groups nested inside them.'''
+    if used_node_groups == None:
+        used_node_groups = set()
+    for node in node_tree.nodes:
+        if node.type == 'GROUP' and node.node_tree and node.node_tree not in used_node_groups:
+            used_node_groups.add(node.node_tree)
+            get_used_node_groups(node.node_tree, used_node_groups)
+    return used_node_groups
+
+def is_unused_node_group(node_group):
+    '''Returns true if the node group has no users, or is only kept alive by a fake user and was made unique for a single layer.'''
+    if node_group.library:
+        return False
+    if node_group.users == 0:
+        return True
+    return node_group.use_fake_user and node_group.users == 1 and bool(LAYER_COPY_NAME_PATTERN.search(node_group.name))
+
+def purge_unused_layer_node_groups(node_groups):
+    '''Removes the provided node groups that are no longer used (see is_unused_node_group). Node groups nested in removed node groups can become unused,
+    so this repeats until nothing else can be removed. Returns the names of the removed node groups.'''
+    removed_node_group_names = []
+    remaining_node_groups = {node_group.name: node_group for node_group in node_groups}
+    while True:
+        unused_node_group_names = [name for name, node_group in remaining_node_groups.items() if is_unused_node_group(node_group)]
+        if not unused_node_group_names:
+            break
+        for name in unused_node_group_names:
+            bpy.data.node_groups.remove(remaining_node_groups.pop(name))
+            removed_node_group_names.append(name)
+    return removed_node_group_names
+
+def optimize_material(material, in_place=False):
+    '''Optimizes the node tree of the material, working on a copy of the material unless in place is on.
+    Returns the optimized material and a dictionary of statistics (removed nodes, removed image samples, removed node groups...).'''
+    if not material.use_nodes or not material.node_tree:
+        return material, {}
+
+    if not in_place:
+        material = material.copy()
+
+    node_tree = material.node_tree
+    shader_analysis.clear_cache()
+    node_count = len(node_tree.nodes)
+    used_node_groups = get_used_node_groups(node_tree)
+    image_samples = shader_analysis.analyse_node_tree(node_tree)['image_samples']
+
+    statistics = {
+        'collapsed_mixes': 0,
+        'folded_math': 0,
+        'merged_group_nodes': 0
+    }
+
+    # Each pass can expose more work for the others (i.e a folded factor allows a mix to be collapsed), so repeat until nothing changes.
+    while True:
+        collapsed_mixes = collapse_constant_mixes(node_tree)
+        folded_math = fold_constant_math(node_tree)
+        merged_group_nodes = merge_identical_group_nodes(node_tree)
+        removed_nodes = remove_unreachable_nodes(node_tree)
+        statistics['collapsed_mixes'] += collapsed_mixes
+        statistics['folded_math'] += folded_math
+        statistics['merged_group_nodes'] += merged_group_nodes
+        if collapsed_mixes + folded_math + merged_group_nodes + removed_nodes == 0:
+            break
+
+    # Only node groups the material stopped using are purged, and only when optimizing in place, since copies leave the original material unchanged.
+    statistics['removed_node_groups'] = 0
+    if in_place:
+        unused_node_groups = used_node_groups - get_used_node_groups(node_tree)
+        statistics['removed_node_groups'] = len(purge_unused_layer_node_groups(unused_node_groups))
+
+    shader_analysis.clear_cache()
+    statistics['removed_nodes'] = node_count - len(node_tree.nodes)
+    statistics['removed_image_samples'] = image_samples - shader_analysis.analyse_node_tree(node_tree)['image_samples']
+
+    debug_logging.log("Optimized material {0}: {1}".format(material.name, statistics))
+    return material, statistics
+
+def optimize_materials(materials):
+    '''Optimizes all provided materials in place (i.e for batch cleanup of blend files in background Blender instances). Returns statistics for each material name.'''
+    return {material.name: optimize_material(material, in_place=True)[1] for material in materials}
@@ -0,0 +1,196 @@
+# This file contains functions to preview (isolate) the output of any node in a material by linking it into the material output, at any node group depth.
+# Previews only change links, so they're instant, and the links they replace are remembered so previews can be stepped back through and removed.
+# Non-shader outputs are previewed through a single reused emission viewer node per node tree. Outputs inside node groups are passed up to the material
+# through a 'Viewer' output added to each node group on the way, which is removed again once the preview is removed.
+# Preview state is stored on the material (as a custom property), so it's saved with the blend file and restored by undo along with the links it describes.
+
+import json
+import bpy
+from ..source import node_index
+
+# Name of the reused emission node non-shader outputs are previewed through.
+VIEWER_NODE_NAME = "RyWrangler Viewer"
+
+# Name of the node group outputs previews inside node groups are passed up through.
+VIEWER_SOCKET_NAME = "Viewer"
+
+# Number of previous previews remembered for each material.
+PREVIEW_HISTORY_SIZE = 8
+
+# Custom property of materials storing their preview state: the original surface link, previously previewed sockets and node groups given viewer outputs.
+PREVIEW_STATE_PROPERTY = "rywrangler_preview"
+
+def get_preview_state(material):
+    '''Returns the preview state of the material, or None if nothing in the material is being previewed.'''
+    state_json = material.get(PREVIEW_STATE_PROPERTY)
+    if not state_json:
+        return None
+    state = json.loads(state_json)
+    return {
+        'original': tuple(state['original']) if state['original'] else None,
+        'history': [(tuple(node_group_names), tuple(socket_reference)) for node_group_names, socket_reference in state['history']],
+        'node_groups': set(state['node_groups'])
+    }
+
+def set_preview_state(material, state):
+    '''Stores the preview state on the material.'''
+    material[PREVIEW_STATE_PROPERTY] = json.dumps({
+        'original': state['original'],
+        'history': state['history'],
+        'node_groups': sorted(state['node_groups'])
+    })
+
+def get_socket_reference(socket):
+    '''Returns a (node name, socket identifier) reference to the socket, which stays valid through undo unlike the socket itself.'''
+    return (socket.node.name, socket.identifier)
+
+def find_output_socket(node_tree, socket_reference):
+    '''Returns the output socket referenced by a (node name, socket identifier) reference, or None if it no longer exists.'''
+    node = node_tree.nodes.get(socket_reference[0])
+    if not node:
+        return None
+    return next((socket for socket in node.outputs if socket.identifier == socket_reference[1]), None)
+
+def get_preview_socket(node):
+    '''Returns the output socket of the node that's previewed, the first linked output, or the first output if none are linked.'''
+    outputs = [socket for socket in node.outputs if socket.enabled and not socket.hide]
+    return next((socket for socket in outputs if socket.is_linked), outputs[0] if outputs else None)
+
+def get_viewer_node(node_tree, location):
+    '''Returns the emission viewer node of the node tree, adding it if it doesn't exist.'''
+    viewer_node = node_tree.nodes.get(VIEWER_NODE_NAME)
+    if not viewer_node:
+        viewer_node = node_tree.nodes.new('ShaderNodeEmission')
+        viewer_node.name = VIEWER_NODE_NAME
+        viewer_node.label = VIEWER_SOCKET_NAME
+        node_index.invalidate(node_tree)
+    viewer_node.location = location
+    return viewer_node
+
+def get_viewer_interface_socket(node_group):
+    '''Returns the viewer output of the node group interface, adding it if it doesn't exist.'''
+    for item in node_group.interface.items_tree:
+        if item.item_type == 'SOCKET' and item.in_out == 'OUTPUT' and item.name == VIEWER_SOCKET_NAME:
+            return item
+    return node_group.interface.new_socket(name=VIEWER_SOCKET_NAME, in_out='OUTPUT', socket_type='NodeSocketShader')
+
+def get_group_node(parent_node_tree, node_group):
+    '''Returns the group node in the parent node tree using the node group, preferring the active node (the group node that was entered).'''
+    active_node = parent_node_tree.nodes.active
+    if active_node and active_node.type == 'GROUP' and active_node.node_tree == node_group:
+        return active_node
+    return next((node for node in node_index.get_nodes_by_type(parent_node_tree, 'GROUP') if node.node_tree == node_group), None)
+
+def link_preview(node_trees, socket, state):
+    '''Links the socket (in the last node tree of the node tree path) into the material output of the first node tree, through the viewer output of each node group in between.
+    Returns false if the socket can't be linked to the material output.'''
+    if socket.type != 'SHADER':
+        node_tree = node_trees[-1]
+        viewer_node = get_viewer_node(node_tree, (socket.node.location.x + socket.node.width + 100, socket.node.location.y))
+        node_tree.links.new(socket, viewer_node.inputs['Color'])
+        socket = viewer_node.outputs[0]
+
+    # Pass the preview up through each node group to the material.
+    for depth in range(len(node_trees) - 1, 0, -1):
+        node_group = node_trees[depth]
+        group_output_node = node_index.get_output_node(node_group)
+        group_node = get_group_node(node_trees[depth - 1], node_group)
+        if not group_output_node or group_output_node.type != 'GROUP_OUTPUT' or not group_node:
+            return False
+        viewer_socket = get_viewer_interface_socket(node_group)
+        state['node_groups'].add(node_group.name)
+        node_group.links.new(socket, next(input for input in group_output_node.inputs if input.identifier == viewer_socket.identifier))
+        socket = next(output for output in group_node.outputs if output.identifier == viewer_socket.identifier)
+
+    material_output_node = node_index.get_output_node(node_trees[0])
+    if not material_output_node or material_output_node.type != 'OUTPUT_MATERIAL':
+        return False
+    node_trees[0].links.new(socket, material_output_node.inputs['Surface'])
+    return True
+
+def find_preview_socket(node_trees, preview):
+    '''Returns the node trees and output socket of a remembered preview, or (None, None) if they no longer exist.'''
+    node_group_names, socket_reference = preview
+    preview_node_trees = [node_trees[0]]
+    for node_group_name in node_group_names:
+        node_group = bpy.data.node_groups.get(node_group_name)
+        if not node_group:
+            return None, None
+        preview_node_trees.append(node_group)
+    return preview_node_trees, find_output_socket(preview_node_trees[-1], socket_reference)
+
+def remove_preview(material):
+    '''Removes the preview from the material, restoring its original surface link and removing viewer nodes and node group viewer outputs.'''
+    state = get_preview_state(material)
+    if not state:
+        return False
+    del material[PREVIEW_STATE_PROPERTY]
+
+    node_tree = material.node_tree
+    material_output_node = node_index.get_output_node(node_tree)
+    if material_output_node and material_output_node.type == 'OUTPUT_MATERIAL':
+        surface_input = material_output_node.inputs['Surface']
+        original_socket = find_output_socket(node_tree, state['original']) if state['original'] else None
+        if original_socket:
+            node_tree.links.new(original_socket, surface_input)
+        else:
+            for link in list(surface_input.links):
+                node_tree.links.remove(link)
+
+    # Remove viewer nodes and outputs added for previews.
+    node_trees = [node_tree] + [bpy.data.node_groups[name] for name in state['node_groups'] if name in bpy.data.node_groups]
+    for previewed_node_tree in node_trees:
+        viewer_node = previewed_node_tree.nodes.get(VIEWER_NODE_NAME)
+        if viewer_node:
+            previewed_node_tree.nodes.remove(viewer_node)
+            node_index.invalidate(previewed_node_tree)
+        if previewed_node_tree != node_tree:
+            for item in list(previewed_node_tree.interface.items_tree):
+                if item.item_type == 'SOCKET' and item.in_out == 'OUTPUT' and item.name == VIEWER_SOCKET_NAME:
+                    previewed_node_tree.interface.remove(item)
+    return True
+
+def toggle_preview(material, node_trees, node):
+    '''Previews the node in the last node tree of the node tree path (the material node tree, followed by the node groups entered to reach the node).
+    Previewing the node that's already previewed steps back to the previous preview, or removes the preview if there isn't one.
+    Returns 'PREVIEWED', 'RESTORED', 'REMOVED' or 'FAILED'.'''
+    state = get_preview_state(material)
+    socket = get_preview_socket(node)
+    if not socket:
+        return 'FAILED'
+
+    preview = (tuple(node_tree.name for node_tree in node_trees[1:]), get_socket_reference(socket))
+    if state and state['history'] and state['history'][-1] == preview:
+        state['history'].pop()
+
+        # Step back to the last remembered preview that still exists.
+        while state['history']:
+            previous_node_trees, previous_socket = find_preview_socket(node_trees, state['history'][-1])
+            if previous_socket and link_preview(previous_node_trees, previous_socket, state):
+                set_preview_state(material, state)
+                return 'RESTORED'
+            state['history'].pop()
+        set_preview_state(material, state)
+        remove_preview(material)
+        return 'REMOVED'
+
+    # Remember the original surface link before the first preview.
+    if not state:
+        material_output_node = node_index.get_output_node(node_trees[0])
+        if not material_output_node or material_output_node.type != 'OUTPUT_MATERIAL':
+            return 'FAILED'
+        surface_input = material_output_node.inputs['Surface']
+        original = get_socket_reference(surface_input.links[0].from_socket) if surface_input.is_linked else None
+        state = {'original': original, 'history': [], 'node_groups': set()}
+
+    # The state is stored even when linking fails, so viewer outputs added to node groups before the failure are still removed.
+    linked = link_preview(node_trees, socket, state)
+    if linked:
+        state['history'].append(preview)
+        del state['history'][:-PREVIEW_HISTORY_SIZE]
+    set_preview_state(material, state)
+    if not linked:
+        if not state['history']:
+            remove_preview(material)
+        return 'FAILED'
+    return 'PREVIEWED'
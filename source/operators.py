@@ -1,88 +1,29 @@
 import bpy
-from pathlib import Path
 from bpy.types import Operator
-from bpy_extras.io_utils import ImportHelper
-from bpy.utils import resource_path
-from .texture_settings import SHADER_NODES
+from bpy_extras.io_utils import ImportHelper, ExportHelper
+from .texture_channels import classify
+from ..source import texture_settings, texture_library
+from ..source import image_headers
+from ..source import image_utils
+from ..source import pixel_ops
+from ..source import asset_library
+from ..source import layer_stack
+from ..source import node_optimizer
+from ..source import node_dedupe
+from ..source import baking
+from ..source import export_textures
+from ..source import socket_matcher
+from ..source import node_index
+from ..source import node_preview
+from ..source import profiling
 from ..source import debug_logging
-from ..package import ADDON_PACKAGE
 import os
-import re
-
-# Dictionary of words / tags that may be in image texture names that could be used to identify material channels from image file names.
-MATERIAL_CHANNEL_TAGS = {
-    "color": 'BASE_COLOR',
-    "colour": 'BASE_COLOR',
-    "couleur": 'BASE_COLOR',
-    "diffuse": 'BASE_COLOR',
-    "diff": 'BASE_COLOR',
-    "dif": 'BASE_COLOR',
-    "subsurface": 'SUBSURFACE',
-    "subsurf": 'SUBSURFACE',
-    "ss": 'SUBSURFACE',
-    "metallic": 'METALLIC',
-    "metalness": 'METALLIC',
-    "metal": 'METALLIC',
-    "métalique": 'METALLIC',
-    "metalique": 'METALLIC',
-    "specular": 'SPECULAR',
-    "specularité": 'SPECULAR',
-    "specularite": 'SPECULAR',
-    "spec": 'SPECULAR',
-    "roughness": 'ROUGHNESS',
-    "rough": 'ROUGHNESS',
-    "rugosité": 'ROUGHNESS',
-    "rugosite": 'ROUGHNESS',
-    "emission": 'EMISSION',
-    "émission": 'EMISSION',
-    "emit": 'EMISSION',
-    "normal": 'NORMAL',
-    "normals": 'NORMAL',
-    "normale": 'NORMAL',
-    "nor": 'NORMAL',
-    "ngl": 'NORMAL',
-    "ndx": 'NORMAL',
-    "height": 'HEIGHT',
-    "hauteur": 'HEIGHT',
-    "bump": 'HEIGHT',
-    "opacity": 'ALPHA',
-    "opaque": 'ALPHA',
-    "alpha": 'ALPHA',
-    "ao": 'AMBIENT_OCCLUSION',
-    "occlusion": 'AMBIENT_OCCLUSION',
-    "ambient": 'AMBIENT_OCCLUSION',
-
-    # RGB channel packing...
-    "orm": 'CHANNEL_PACKED',
-    "rmo": 'CHANNEL_PACKED',
-
-    # RGBA channel packing, 'X' is used to identify when nothing is packed into a channel.
-    "moxs": 'CHANNEL_PACKED',
-
-    # Naming conventions such as 'MyTextureName_RoughnessMetallic' can't be imported automatically
-    # because it's ambiguous for which RGBA channel the values are intended to go into.
-}
-
-# https://docs.unrealengine.com/4.27/en-US/ProductionPipelines/AssetNaming/
-# With an identifiable material channel format, such as the one used commonly in game engines (T_MyTexture_C_1),
-# we can identify material channels using only the first few letters.
-MATERIAL_CHANNEL_ABBREVIATIONS = {
-    "c": 'BASE_COLOR',
-    "m": 'METALLIC',
-    "r": 'ROUGHNESS',
-    "n": 'NORMAL',
-    "ngl": 'NORMAL',
-    "ndx": 'NORMAL',
-    "h": 'HEIGHT',
-    "b": 'HEIGHT',
-    "s": 'SPECULAR',
-    "ss": 'SUBSURFACE',
-    "a": 'ALPHA',
-    "cc": 'COAT',
-    "e": 'EMISSION',
-    "o": 'AMBIENT_OCCLUSION',
-    "ao": 'AMBIENT_OCCLUSION'
-}
+
+# Custom property marking node groups shared by all new layers / masks of the same type (copy-on-write).
+SHARED_NODE_GROUP_PROPERTY = "rywrangler_shared"
+
+# Custom property listing the channels of an image that were already inverted on import, images loaded again are reused rather than reloaded.
+INVERTED_CHANNELS_PROPERTY = "rywrangler_inverted_channels"
 
 # ==============================================================
 # Layers
@@ -172,8 +113,12 @@ class RYWRANGLER_OT_AddGrunge(Operator):
     bl_description = "Adds a group node designed for adding grunge to objects"
     bl_options  = {'REGISTER', 'UNDO'}
     
+    bake_mask: bpy.props.BoolProperty(name="Bake Mask", default=False, description="Bakes the mask into an image at the texture set resolution and replaces the mask with the baked image, so it isn't evaluated procedurally when rendering")
+
     def execute(self, context):
-        add_group_node("Mask_Grunge")
+        mask_node = add_group_node("Mask_Grunge")
+        if mask_node and self.bake_mask:
+            bake_mask_node(mask_node, self)
         return {'FINISHED'}
     
 class RYWRANGLER_OT_AddEdgeWear(Operator):
@@ -182,8 +127,33 @@ class RYWRANGLER_OT_AddEdgeWear(Operator):
     bl_description = "Adds a group node designed for adding edge wear to objects"
     bl_options  = {'REGISTER', 'UNDO'}
     
+    bake_mask: bpy.props.BoolProperty(name="Bake Mask", default=False, description="Bakes the mask into an image at the texture set resolution and replaces the mask with the baked image, so it isn't evaluated procedurally when rendering")
+
+    def execute(self, context):
+        mask_node = add_group_node("Mask_EdgeWear")
+        if mask_node and self.bake_mask:
+            bake_mask_node(mask_node, self)
+        return {'FINISHED'}
+
+class RYWRANGLER_OT_bake_masks(Operator):
+    bl_idname = "rywrangler.bake_masks"
+    bl_label = "Bake Masks"
+    bl_description = "Bakes the selected mask nodes into images at the texture set resolution and replaces them with the baked images. Bakes are cached on disk, so masks that haven't changed (including the mesh and UVs) are never baked again"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    @classmethod
+    def poll(cls, context):
+        return context.object and context.object.active_material and context.object.active_material.use_nodes
+
     def execute(self, context):
-        add_group_node("Mask_EdgeWear")
+        node_tree = context.object.active_material.node_tree
+        mask_nodes = [node for node in node_tree.nodes if node.select and node.type == 'GROUP' and node.node_tree and node.node_tree.name.startswith("Mask_")]
+        if not mask_nodes:
+            debug_logging.log_status("Select mask nodes to bake.", self, type='ERROR')
+            return {'CANCELLED'}
+
+        baked_count = sum(1 for mask_node in mask_nodes if bake_mask_node(mask_node, self))
+        debug_logging.log_status("Baked {0} masks.".format(baked_count), self, type='INFO')
         return {'FINISHED'}
 
 # ==============================================================
@@ -212,248 +182,358 @@ class RYWRANGLER_OT_import_texture_set(Operator, ImportHelper):
         return True
 
     def execute(self, context):
-        def split_filename_by_components(filename):
-            '''Helper function to split the file name into components.'''
-
-            # Remove file extension.
-            filename = os.path.splitext(filename)[0]
-
-            # Remove numbers (these can't be used to identify a material channel from the texture name).
-            filename = ''.join(i for i in filename if not i.isdigit())
-            
-            # Separate camel case by space.
-            filename = re.sub('([A-Z][a-z]+)', r' \1', re.sub('([A-Z]+)', r' \1', filename))
-
-            # Replace common separators with a space.
-            separators = ['_', '.', '-', '__', '--', '#']
-            for seperator in separators:
-                filename = filename.replace(seperator, ' ')
-
-            # Return all components split by a space with lowercase characters.
-            split_components = filename.split(' ')
-            components = []
-            for c in split_components:
-                if c != '':
-                    components.append(c.lower())
-
-            return components
-
-        def get_rgba_channel_from_index(index):
-            '''Returns the RGBA channel name for the provided index (i.e 0 = R, 1 = G...).'''
-            match index:
-                case -1:
-                    return 'COLOR'
-                case 0:
-                    return 'RED'
-                case 1:
-                    return 'GREEN'
-                case 2:
-                    return 'BLUE'
-                case 3:
-                    return 'ALPHA'
-                case _:
-                    return 'ERROR'
-
-        # Get some information about the layer user later in the function.
-        selected_layer_index = bpy.context.scene.RYWRANGLER_layer_stack.selected_layer_index
-        layer_type = material_layers.get_layer_type()
-        layer_node = material_layers.get_material_layer_node('LAYER', selected_layer_index)
-        shader_info = bpy.context.scene.RYWRANGLER_shader_info
-        
-        # Compile a list of all unique tags found accross all user selected image file names.
-        material_channel_occurance = {}
-        for file in self.files:
-            tags = split_filename_by_components(file.name)
-            for tag in tags:
-                if tag not in material_channel_occurance and tag in MATERIAL_CHANNEL_TAGS:
-                    material_channel = MATERIAL_CHANNEL_TAGS[tag]
-                    material_channel_occurance[material_channel] = 0
-
-        # Calculate how many times a unique channel tag appears accross all user selected image files.
-        for file in self.files:
-            tags = split_filename_by_components(file.name)
-            for tag in tags:
-                if tag in MATERIAL_CHANNEL_TAGS:
-                    material_channel = MATERIAL_CHANNEL_TAGS[tag]
-                    if material_channel in material_channel_occurance:
-                        material_channel_occurance[material_channel] += 1
-
-        # Cycle through all selected image files and try to identify the correct material channel to import them into.
-        selected_image_file = False
-        no_files_imported = True
-        for file in self.files:
-            detected_material_channel = 'NONE'
-            
-            # If the image file starts with a 'T_' assume it's using a commonly used Unreal Engine / game engine naming convention.
-            if file.name.startswith('T_'):
-                remove_file_extension = file.name.split('.')[0]
-                channel_abbreviation = remove_file_extension.split('_')[2].lower()
-                if channel_abbreviation in MATERIAL_CHANNEL_ABBREVIATIONS:
-                    detected_material_channel = MATERIAL_CHANNEL_ABBREVIATIONS[channel_abbreviation]
-
-            # For all other files, guess the material channel by parsing for tags in the file name that would ID it.
-            else:
+        folder_directory = os.path.split(self.filepath)[0]
+        image_paths = [os.path.join(folder_directory, file.name) for file in self.files]
 
-                # Create a list of tags used in this files name.
-                tags = split_filename_by_components(file.name)
-                channel_tags_in_filename = []
-                for tag in tags:
-                    if tag in MATERIAL_CHANNEL_TAGS:
-                        channel_tags_in_filename.append(MATERIAL_CHANNEL_TAGS[tag])
-
-                # Don't import files that have no material channel tag detected in it's file name.
-                if len(channel_tags_in_filename) > 0:
-
-                    # Start by assuming the correct material channel is the one that appears the least in the file name.
-                    # I.E: Selected files: RoughMetal_002_2k_Color, RoughMetal_002_2k_Normal, RoughMetal_002_2k_Metallic, RoughMetal_002_2k_Rough
-                    # For the first file in the above example, the correct material channel would be color,
-                    # because 'metallic' appears more than once accross all user selected image files.
-                    detected_material_channel = channel_tags_in_filename[0]
-                    material_channel_occurances_equal = True
-                    for material_channel_name in channel_tags_in_filename:
-                        if material_channel_occurance[material_channel_name] < material_channel_occurance[detected_material_channel]:
-                            detected_material_channel = material_channel_name
-                            material_channel_occurances_equal = False
-                    
-                    # If all material channels identified in the files name occur equally throughout all selected filenames,
-                    # use the material channel that occurs the most in the files name.
-                    # I.E: Selected files: RoughMetal_002_2k_Color, RoughMetal_002_2k_Normal, RoughMetal_002_2k_Metallic, RoughMetal_002_2k_Rough
-                    # For the third file in the above example, the correct material channel is 'metallic' because that tag appears twice in the name.
-                    if material_channel_occurances_equal:
-                        for material_channel_name in channel_tags_in_filename:
-                            if material_channel_occurance[material_channel_name] > material_channel_occurance[detected_material_channel]:
-                                detected_material_channel = material_channel_name
-
-            # Only import the image if a material channel was detected.
-            if detected_material_channel != 'NONE':
-                no_files_imported = False
-                folder_directory = os.path.split(self.filepath)
-                image_path = os.path.join(folder_directory[0], file.name)
-                bpy.ops.image.open(filepath=image_path)
-                imported_image = bpy.data.images.get(file.name)
-                if imported_image == None:
-                    debug_logging.log(
-                        "Import texture set operator failed to locate {0} in the blend data.".format(file.name), 
-                        message_type='ERROR',
-                        sub_process=False
-                    )
-                    continue
-
-                # To support proper importing of channel packed images,
-                # create a list of all material channels that are packed into this image.
-                # For images not using channel packing, this list will have a length of 1.
-                packed_channels = []
-                channel_packed_format = ""
-                if detected_material_channel == 'CHANNEL_PACKED':
-                    for tag in tags:
-                        if tag in MATERIAL_CHANNEL_TAGS:
-                            channel_packed_format = tag
-                            for i in range(0, len(channel_packed_format)):
-                                if channel_packed_format[i] in MATERIAL_CHANNEL_ABBREVIATIONS:
-                                    packed_channel = MATERIAL_CHANNEL_ABBREVIATIONS[channel_packed_format[i]]
-
-                                    # If the active material isn't using the specular material channel, the material channel abbreviated with 'S'
-                                    # is more likely 'Smoothness', instead of 'Specular'. Swap the packed channel to Roughness and invert the filter
-                                    # to convert the smoothness into roughness.
-                                    if packed_channel == 'SPECULAR':
-                                        packed_channel = 'ROUGHNESS'
-
-                                        invert_r = False
-                                        invert_g = False
-                                        invert_b = False
-                                        invert_a = False
-                                        match i:
-                                            case 0:
-                                                invert_r = True
-                                            case 1:
-                                                invert_g = True
-                                            case 2:
-                                                invert_b = True
-                                            case 3:
-                                                invert_a = True
-
-                                        export_textures.invert_image(imported_image, invert_r, invert_g, invert_b, invert_a)
-                                        debug_logging.log_status("Channel packed smoothness was detected and inverted into roughness.", self, type='INFO')
-
-                                    packed_channels.append([packed_channel, get_rgba_channel_from_index(i)])
-                else:
-                    packed_channels.append([detected_material_channel, -1])                
-                
-                # Adjust nodes for the layer to support importing of all packed channels in the imported image.
-                for packed_channel in packed_channels:
-                    channel = packed_channel[0]
-
-                    # Create material channel nodes for all new channels.
-                    material_layers.add_material_channel_nodes(channel, layer_node.node_tree, layer_type)
-
-                    # Change all material channels to use texture nodes (if they aren't already).
-                    value_node = material_layers.get_material_layer_node('VALUE', selected_layer_index, channel)
-                    if value_node.bl_static_type != 'TEX_IMAGE':
-                        material_layers.replace_material_channel_node(channel, 'TEXTURE')
-
-                    # Determine the default texture interpolation based on the material channel name.
-                    default_texture_interpolation = 'Linear'
-                    channel_socket_name = shaders.get_shader_channel_socket_name(channel)
-                    shader_material_channel = shader_info.material_channels.get(channel_socket_name)
-                    if shader_material_channel:
-                        default_texture_interpolation = shader_material_channel.default_texture_interpolation
-
-                    # Place the image into a material nodes based on texture projection and inferred material channel name.
-                    projection_node = material_layers.get_material_layer_node('PROJECTION', selected_layer_index)
-                    match projection_node.node_tree.name:
-                        case 'RY_UVProjection':
-                            value_node = material_layers.get_material_layer_node('VALUE', selected_layer_index, channel)
-                            if value_node.bl_static_type == 'TEX_IMAGE':
-                                value_node.image = imported_image
-                                value_node.interpolation = default_texture_interpolation
+        # Identify the material channel for all selected image files at once.
+        import_texture_set(image_paths, classify([file.name for file in self.files]), self)
+        return {'FINISHED'}
 
-                        case 'RY_TriplanarProjection':
-                            for i in range(0, 3):
-                                value_node = material_layers.get_material_layer_node('VALUE', selected_layer_index, channel, node_number=i + 1)
-                                if value_node.bl_static_type == 'TEX_IMAGE':
-                                    value_node.image = imported_image
-                                    value_node.interpolation = default_texture_interpolation
-
-                # If the image is detected to be using channel packing, adjust the output of the material channel.
-                if detected_material_channel == 'CHANNEL_PACKED':
-                    for i in range(0, len(packed_channels)):
-                        channel = packed_channels[i][0]
-                        output_channel = packed_channels[i][1]
-                        material_layers.set_material_channel_crgba_output(channel, output_channel, selected_layer_index)
-
-                # Select the first image file in the canvas painting window.
-                if selected_image_file == False:
-                    context.scene.tool_settings.image_paint.canvas = imported_image
-                    selected_image_file = True
-
-                # Update the imported images colorspace based on it's detected material channel.
-                image_utilities.set_default_image_colorspace(imported_image, detected_material_channel)
-
-                # Print a warning about using DirectX normal maps for users if it's suspected they are using one.
-                if detected_material_channel == 'NORMAL':
-                    if image_utilities.check_for_directx(file.name):
-                        self.report({'INFO'}, "DirectX normal map import suspected, normals may be inverted. Use an OpenGL normal map instead.")
-
-                # Copy the imported image to a folder next to the blend file for file management purposes.
-                # This happens only if 'save imported textures' is on in the add-on preferences.
-                image_utilities.save_raw_image(image_path, imported_image.name)
+class RYWRANGLER_OT_scan_texture_library(Operator):
+    bl_idname = "rywrangler.scan_texture_library"
+    bl_label = "Scan Texture Library"
+    bl_description = "Indexes all images in the texture library folder and groups them into texture sets. Only new or changed images are re-scanned"
+    bl_options = {'REGISTER'}
 
-            else:
-                debug_logging.log("No material channel detected for file: {0}".format(file.name))
+    def execute(self, context):
+        library_folder = bpy.path.abspath(context.scene.rywrangler_texture_settings.texture_library_folder)
+        if not os.path.isdir(library_folder):
+            debug_logging.log_status("Invalid texture library folder.", self, type='WARNING')
+            return {'CANCELLED'}
+
+        index_path = texture_settings.get_texture_library_index_path(library_folder)
+        index = texture_library.get_index(index_path)
+        changed_image_count = texture_library.scan_folder(library_folder, index)
+        if changed_image_count > 0:
+            texture_library.save_index(index_path, index)
+
+        texture_set_count = len(texture_library.get_texture_sets(index_path))
+        debug_logging.log_status("Indexed {0} texture sets ({1} images updated or removed).".format(texture_set_count, changed_image_count), self, type='INFO')
+        return {'FINISHED'}
+
+class RYWRANGLER_OT_import_library_texture_set(Operator):
+    bl_idname = "rywrangler.import_library_texture_set"
+    bl_label = "Import Library Texture Set"
+    bl_description = "Imports the selected texture set from the indexed texture library into material channels"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        settings = context.scene.rywrangler_texture_settings
+        index_path = texture_settings.get_texture_library_index_path(bpy.path.abspath(settings.texture_library_folder))
+        texture_set = texture_library.get_texture_sets(index_path).get(settings.texture_library_set)
+        if not texture_set:
+            debug_logging.log_status("No texture set selected, scan the texture library first.", self, type='WARNING')
+            return {'CANCELLED'}
+
+        # Material channels were identified when the library was indexed, so file names don't need to be parsed again.
+        image_paths = [entry['path'] for entry in texture_set]
+        classified_files = [(entry['channel'], entry['packed_layout']) for entry in texture_set]
+        import_texture_set(image_paths, classified_files, self)
+        return {'FINISHED'}
+
+class RYWRANGLER_OT_localize_assets(Operator):
+    bl_idname = "rywrangler.localize_assets"
+    bl_label = "Localize Assets"
+    bl_description = "Makes all node groups linked from the asset library local, so the blend file can be opened without access to the asset library"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        localized_count = asset_library.localize_linked_node_groups()
+        debug_logging.log_status("Localized {0} linked node groups.".format(localized_count), self, type='INFO')
+        return {'FINISHED'}
+
+class RYWRANGLER_OT_relink_assets(Operator):
+    bl_idname = "rywrangler.relink_assets"
+    bl_label = "Relink Assets"
+    bl_description = "Replaces local copies of inner node groups (masks, projections) with read-only node groups linked from the asset library. Edits made to local copies of these node groups will be lost"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        relinked_count = asset_library.relink_inner_node_groups()
+        debug_logging.log_status("Relinked {0} node groups to the asset library.".format(relinked_count), self, type='INFO')
+        return {'FINISHED'}
+
+class RYWRANGLER_OT_make_layer_unique(Operator):
+    bl_idname = "rywrangler.make_layer_unique"
+    bl_label = "Make Layer Unique"
+    bl_description = "Gives the active layer its own copy of the shared layer node group, so its internals can be edited without changing other layers"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    @classmethod
+    def poll(cls, context):
+        return (
+            context.space_data and
+            context.space_data.type == 'NODE_EDITOR' and
+            context.space_data.edit_tree != None
+        )
+
+    def execute(self, context):
+        path = context.space_data.path
+
+        # When editing inside a shared node group, make the group node that was entered unique and re-enter its unique node group.
+        if len(path) > 1 and is_shared_node_group(context.space_data.edit_tree):
+            group_node = path[-2].node_tree.nodes.active
+            if not group_node or group_node.type != 'GROUP' or group_node.node_tree != context.space_data.edit_tree:
+                debug_logging.log_status("Can't find the group node for the edited node group.", self, type='WARNING')
+                return {'CANCELLED'}
+            unique_node_tree = make_group_node_unique(group_node)
+            path.pop()
+            path.append(unique_node_tree, node=group_node)
+
+        else:
+            group_node = context.space_data.edit_tree.nodes.active
+            if not group_node or group_node.type != 'GROUP' or not is_shared_node_group(group_node.node_tree):
+                debug_logging.log_status("The active node isn't using a shared layer node group.", self, type='INFO')
+                return {'CANCELLED'}
+            unique_node_tree = make_group_node_unique(group_node)
+
+        debug_logging.log_status("Layer now uses the unique node group {0}.".format(unique_node_tree.name), self, type='INFO')
+        return {'FINISHED'}
+
+class RYWRANGLER_OT_edit_group(Operator):
+    bl_idname = "rywrangler.edit_group"
+    bl_label = "Edit Group"
+    bl_description = "Gives the active layer its own copy of its shared layer node group before entering it, so edits never change other layers. Runs before the default edit group (Tab) shortcut"
+    bl_options = {'INTERNAL'}
+
+    @classmethod
+    def poll(cls, context):
+        return (
+            context.space_data and
+            context.space_data.type == 'NODE_EDITOR' and
+            context.space_data.edit_tree != None
+        )
+
+    def invoke(self, context, event):
+        # Layers share one node group until their internals are edited (copy-on-write), entering a shared node group to edit it copies it first.
+        # The event is always passed through, so the default edit group operator enters (or exits) the node group afterwards.
+        group_node = context.space_data.edit_tree.nodes.active
+        if group_node and group_node.type == 'GROUP' and is_shared_node_group(group_node.node_tree):
+            unique_node_tree = make_group_node_unique(group_node)
+            debug_logging.log("Layer now uses the unique node group {0}.".format(unique_node_tree.name))
+        return {'PASS_THROUGH'}
+
+class RYWRANGLER_OT_rebuild_layer_stack(Operator):
+    bl_idname = "rywrangler.rebuild_layer_stack"
+    bl_label = "Rebuild Layer Stack"
+    bl_description = "Converts the chain of Mix Shader layers connected to the material output into a channel layer stack, which blends each material channel of all layers into a single Principled BSDF. This results in far fewer shader closures and faster shader compiles"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    @classmethod
+    def poll(cls, context):
+        return context.object and context.object.active_material and context.object.active_material.use_nodes
+
+    def execute(self, context):
+        node_tree = context.object.active_material.node_tree
+        if layer_stack.get_stack_shader(node_tree):
+            debug_logging.log_status("The material is already using a channel layer stack.", self, type='INFO')
+            return {'CANCELLED'}
+
+        layer_count = layer_stack.rebuild_layer_stack(node_tree)
+        if layer_count == 0:
+            debug_logging.log_status("Can't rebuild the layer stack, all layers must be Mix Shaders, Principled BSDFs or layers with material channel outputs.", self, type='WARNING')
+            return {'CANCELLED'}
+
+        debug_logging.log_status("Rebuilt {0} layers into a channel layer stack.".format(layer_count), self, type='INFO')
+        return {'FINISHED'}
+
+class RYWRANGLER_OT_optimize_material(Operator):
+    bl_idname = "rywrangler.optimize_material"
+    bl_label = "Optimize Material"
+    bl_description = "Makes an optimized copy of the active material and assigns it to the active material slot. Nodes that don't contribute to the material output are removed, mixes with constant factors are collapsed, math on constants is folded and identical layer instances are merged. When optimizing in place, layer node groups only the material used are purged once it stops using them"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    in_place: bpy.props.BoolProperty(name="In Place", default=False, description="Optimizes the active material directly instead of a copy")
+
+    @classmethod
+    def poll(cls, context):
+        return context.object and context.object.active_material and context.object.active_material.use_nodes
+
+    def execute(self, context):
+        original_material = context.object.active_material
+        material, statistics = node_optimizer.optimize_material(original_material, in_place=self.in_place)
+        if material != original_material:
+            material.name = "{0}_Optimized".format(original_material.name)
+            context.object.active_material = material
+
+        debug_logging.log_status("Optimized {0}: removed {1} nodes, {2} image samples and {3} node groups.".format(
+            material.name,
+            statistics.get('removed_nodes', 0),
+            statistics.get('removed_image_samples', 0),
+            statistics.get('removed_node_groups', 0)
+        ), self, type='INFO')
+        return {'FINISHED'}
+
+class RYWRANGLER_OT_deduplicate_node_groups(Operator):
+    bl_idname = "rywrangler.deduplicate_node_groups"
+    bl_label = "Deduplicate Node Groups"
+    bl_description = "Finds node groups that are structurally identical (same nodes, settings, links and nested node groups), remaps all of their users to a single node group and removes the duplicates"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        removed_count = node_dedupe.deduplicate_node_groups(prefer=is_shared_node_group)
+        debug_logging.log_status("Removed {0} duplicate node groups.".format(removed_count), self, type='INFO')
+        return {'FINISHED'}
+
+class RYWRANGLER_OT_bake_triplanar_layers(Operator):
+    bl_idname = "rywrangler.bake_triplanar_layers"
+    bl_label = "Bake Triplanar Layers"
+    bl_description = "Bakes the material channels of the selected triplanar layers into UV images at the texture set resolution, and replaces them with equivalent UV layers. Triplanar layers sample each texture three times, UV layers only once"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    all_layers: bpy.props.BoolProperty(name="All Layers", default=False, description="Bakes all triplanar layers in the active material, rather than only selected layers")
+
+    @classmethod
+    def poll(cls, context):
+        return context.object and context.object.active_material and context.object.active_material.use_nodes
+
+    def execute(self, context):
+        obj = context.object
+        material = obj.active_material
+        if obj.type != 'MESH' or not obj.data.uv_layers:
+            debug_logging.log_status("Can't bake triplanar layers, the active object must be a mesh with a UV map.", self, type='ERROR')
+            return {'CANCELLED'}
+
+        triplanar_layer_nodes = [
+            node for node in node_index.get_layer_group_nodes(material.node_tree)
+            if "Layer_Triplanar" in node.node_tree.name and (self.all_layers or node.select)
+        ]
+        if not triplanar_layer_nodes:
+            debug_logging.log_status("No triplanar layers to bake.", self, type='ERROR')
+            return {'CANCELLED'}
+
+        # The mesh is hashed once for the bake cache keys of all layers.
+        mesh_hash = baking.get_mesh_hash(obj)
+        baked_count = sum(1 for layer_node in triplanar_layer_nodes if bake_triplanar_layer(layer_node, obj, material, mesh_hash, self))
+        debug_logging.log_status("Baked {0} of {1} triplanar layers into UV layers.".format(baked_count, len(triplanar_layer_nodes)), self, type='INFO')
+        return {'FINISHED'}
 
-        if no_files_imported:
-            debug_logging.log_status("No detected material channel in any selected files.", self, type='WARNING')
+class RYWRANGLER_OT_export_textures(Operator):
+    bl_idname = "rywrangler.export_textures"
+    bl_label = "Export Textures"
+    bl_description = "Bakes and exports all material channels of the active objects materials to the export folder. Channels are baked in parallel by background Blender processes, so Blender stays responsive while exporting"
+    bl_options = {'REGISTER'}
 
+    _timer = None
+    _texture_export = None
+
+    @classmethod
+    def poll(cls, context):
+        return context.object and context.object.type == 'MESH' and context.object.active_material
+
+    def execute(self, context):
+        settings = context.scene.rywrangler_texture_settings
+        export_folder = bpy.path.abspath(settings.export_folder)
+        if not export_folder:
+            debug_logging.log_status("Set an export folder before exporting textures.", self, type='ERROR')
+            return {'CANCELLED'}
+        if not context.object.data.uv_layers:
+            debug_logging.log_status("Can't export textures, the active object has no UV map.", self, type='ERROR')
+            return {'CANCELLED'}
+
+        materials = {material_slot.material for material_slot in context.object.material_slots if material_slot.material}
+        self._texture_export = export_textures.start_export(
+            context.object,
+            materials,
+            export_folder,
+            texture_settings.get_texture_width(),
+            texture_settings.get_texture_height(),
+            settings.export_file_format,
+            settings.export_bit_depth,
+            settings.export_workers,
+            get_export_packed_format(settings)
+        )
+        if not self._texture_export:
+            debug_logging.log_status("No material channels to export, materials must use a Principled BSDF or a channel layer stack.", self, type='ERROR')
+            return {'CANCELLED'}
+
+        # Poll the workers from a timer, so the interface stays responsive while they bake.
+        self._timer = context.window_manager.event_timer_add(0.5, window=context.window)
+        context.window_manager.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        texture_export = self._texture_export
+
+        # Escape stops the export workers.
+        if event.type == 'ESC' and event.value == 'PRESS':
+            context.window_manager.event_timer_remove(self._timer)
+            context.workspace.status_text_set(None)
+            finished_job_count = texture_export.get_finished_job_count()
+            texture_export.cancel()
+            debug_logging.log_status("Cancelled the texture export, {0} of {1} textures were exported.".format(finished_job_count, texture_export.job_count), self, type='WARNING')
+            return {'CANCELLED'}
+
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        if not texture_export.is_finished():
+            context.workspace.status_text_set("Exporting textures: {0} of {1} (Esc to cancel)".format(texture_export.get_finished_job_count(), texture_export.job_count))
+            return {'PASS_THROUGH'}
+
+        context.window_manager.event_timer_remove(self._timer)
+        context.workspace.status_text_set(None)
+        results = texture_export.finish()
+        settings = context.scene.rywrangler_texture_settings
+        packed_format = get_export_packed_format(settings)
+        if packed_format:
+            export_textures.pack_export_results(results, packed_format, bpy.path.abspath(settings.export_folder), settings.export_file_format, settings.export_bit_depth)
+        failed_results = [result for result in results if result['error']]
+        if failed_results or len(results) < texture_export.job_count:
+            debug_logging.log_status("Exported {0} of {1} textures, see the console for errors.".format(len(results) - len(failed_results), texture_export.job_count), self, type='WARNING')
         else:
-            # Organize all material channel frames.
-            material_layers.organize_material_channel_frames(layer_node.node_tree)
+            debug_logging.log_status("Exported {0} textures.".format(len(results)), self, type='INFO')
+        return {'FINISHED'}
+
+class RYWRANGLER_OT_toggle_profiling_trace(Operator):
+    bl_idname = "rywrangler.toggle_profiling_trace"
+    bl_label = "Record Profiling Trace"
+    bl_description = "Starts or stops recording the timing of each operator and helper call, so they can be saved to a trace file"
+    bl_options = {'REGISTER'}
 
+    def execute(self, context):
+        profiling.set_trace_recording(not profiling.is_recording_trace())
+        return {'FINISHED'}
+
+class RYWRANGLER_OT_save_profiling_trace(Operator, ExportHelper):
+    bl_idname = "rywrangler.save_profiling_trace"
+    bl_label = "Save Profiling Trace"
+    bl_description = "Saves the recorded operator timings to a trace file in the Chrome trace format (open it in chrome://tracing or ui.perfetto.dev)"
+    bl_options = {'REGISTER'}
+
+    filename_ext = ".json"
+
+    filter_glob: bpy.props.StringProperty(
+        default="*.json",
+        options={'HIDDEN'}
+    )
+
+    def execute(self, context):
+        if profiling.get_trace_event_count() == 0:
+            debug_logging.log_status("No timings were recorded, enable trace recording before running operators.", self, type='WARNING')
+            return {'CANCELLED'}
+        try:
+            span_count = profiling.save_trace(self.filepath)
+        except OSError as error:
+            debug_logging.log_status("Failed to save the profiling trace: {0}".format(error), self, type='ERROR')
+            return {'CANCELLED'}
+        debug_logging.log_status("Saved {0} timings to {1}.".format(span_count, self.filepath), self, type='INFO')
+        return {'FINISHED'}
+
+class RYWRANGLER_OT_clear_profiling_statistics(Operator):
+    bl_idname = "rywrangler.clear_profiling_statistics"
+    bl_label = "Clear Profiling Statistics"
+    bl_description = "Clears all recorded operator timings"
+    bl_options = {'REGISTER'}
+
+    def execute(self, context):
+        profiling.clear_statistics()
         return {'FINISHED'}
 
 class RYWRANGLER_OT_AutoLinkNodes(bpy.types.Operator):
     bl_idname = "rywrangler.auto_link_nodes"
     bl_label = "Auto Link Nodes"
-    bl_description = "Attempts to link two nodes together automatically by referencing their node type, socket names, and socket types"
+    bl_description = "Links the selected nodes together in a chain from left to right, matching sockets by their names, socket types and the material channels their names identify"
     bl_options = {'REGISTER', 'UNDO'}
 
     def execute(self, context):
@@ -462,28 +542,16 @@ class RYWRANGLER_OT_AutoLinkNodes(bpy.types.Operator):
             self.report({'ERROR'}, "Can't link nodes, there's no active node tree.")
             return {'CANCELLED'}
         
-        node_tree = context.space_data.node_tree
-        selected_nodes = [node for node in node_tree.nodes if node.select]
+        node_tree = context.space_data.edit_tree or context.space_data.node_tree
+        selected_nodes = [node for node in node_tree.nodes if node.select and node.type not in {'FRAME', 'REROUTE'}]
         
-        # Throw an error if the user selections less or more than two nodes.
-        if len(selected_nodes) != 2:
-            self.report({'ERROR'}, "Can't link nodes, you must select exactly two nodes for automatic linking.")
+        # Throw an error if the user selects less than two nodes.
+        if len(selected_nodes) < 2:
+            self.report({'ERROR'}, "Can't link nodes, you must select at least two nodes for automatic linking.")
             return {'CANCELLED'}
         
-        node1, node2 = selected_nodes
-        
-        # Create a dictionary of output sockets by name for node1
-        outputs1 = {socket.name: socket for socket in node1.outputs}
-        inputs2 = {socket.name: socket for socket in node2.inputs if not socket.is_linked}
-        
-        # Link matching sockets
-        links = node_tree.links
-        link_count = 0
-        
-        for name, output_socket in outputs1.items():
-            if name in inputs2:
-                links.new(output_socket, inputs2[name])
-                link_count += 1
+        # Link each node into the next with the best matching sockets.
+        link_count = socket_matcher.link_node_chain(node_tree, selected_nodes)
 
         if link_count == 0:
             self.report({'WARNING'}, "No matching sockets found to link.")
@@ -496,52 +564,57 @@ class RYWRANGLER_OT_IsolateNode(Operator):
     bl_idname = "rywrangler.isolate_node"
     bl_label = "Isolate Node"
     bl_options  = {'REGISTER', 'UNDO'}
-    bl_description = "Isolates the active node by connecting it to the material output node"
+    bl_description = "Previews the active node by connecting it to the material output, at any node group depth. Non-shader outputs are previewed through an emission viewer. Isolating the previewed node again steps back to the previous preview, or restores the original material output link"
     
     def execute(self, context):
         # Ensure we're in the node editor and using a material node tree
-        if not context.space_data or context.space_data.tree_type != 'ShaderNodeTree':
+        space_data = context.space_data
+        if not space_data or space_data.type != 'NODE_EDITOR' or space_data.tree_type != 'ShaderNodeTree':
             self.report({'WARNING'}, "Not in a Shader Node Tree")
             return {'CANCELLED'}
 
-        mat = context.object.active_material
-        if not mat or not mat.node_tree:
-            self.report({'WARNING'}, "No active material with node tree found")
+        material = space_data.id
+        if not isinstance(material, bpy.types.Material) or not material.node_tree:
+            self.report({'WARNING'}, "No material with node tree found")
             return {'CANCELLED'}
-        
-        nodes = mat.node_tree.nodes
-        links = mat.node_tree.links
-        
-        # Find the first Material Output node
-        output_node = next((node for node in nodes if node.type == 'OUTPUT_MATERIAL'), None)
-        if not output_node:
-            self.report({'WARNING'}, "No Material Output node found")
-            return {'CANCELLED'}
-        
-        # Get the selected node
-        selected_nodes = [node for node in nodes if node.select]
-        if not selected_nodes:
+
+        # The node tree path leads from the material node tree through each entered node group to the edited node tree.
+        node_trees = [path.node_tree for path in space_data.path]
+        if not node_trees or node_trees[0] != material.node_tree:
+            node_trees = [material.node_tree]
+        edit_tree = node_trees[-1]
+
+        # Get the active node, or the first selected node (only searched for when the active node isn't selected).
+        active_node = edit_tree.nodes.active
+        selected_node = active_node if active_node and active_node.select else next((node for node in edit_tree.nodes if node.select), None)
+        if not selected_node:
             self.report({'WARNING'}, "No node selected")
             return {'CANCELLED'}
-        
-        selected_node = selected_nodes[0]  # Use the first selected node
-        
-        # Determine the output socket (assuming first available output socket)
-        if not selected_node.outputs:
-            self.report({'WARNING'}, "Selected node has no output sockets")
-            return {'CANCELLED'}
-        
-        output_socket = selected_node.outputs[0]
-        
-        # Determine the input socket of the Material Output node
-        input_socket = output_node.inputs.get("Surface")
-        if not input_socket:
-            self.report({'WARNING'}, "Material Output node has no Surface input")
+
+        if selected_node.type in {'OUTPUT_MATERIAL', 'GROUP_OUTPUT', 'FRAME'} or selected_node.name == node_preview.VIEWER_NODE_NAME:
+            self.report({'WARNING'}, "The selected node can't be isolated")
             return {'CANCELLED'}
-        
-        # Create the link
-        links.new(output_socket, input_socket)
-        self.report({'INFO'}, "Connected node to Material Output")
+
+        # Previews add a viewer output to each node group on the node tree path. Linked node groups can't be edited,
+        # and editing a shared node group would change every layer using it.
+        for node_group in node_trees[1:]:
+            if node_group.library:
+                self.report({'WARNING'}, "Can't isolate nodes inside the linked node group {0}, localize assets first".format(node_group.name))
+                return {'CANCELLED'}
+            if is_shared_node_group(node_group):
+                self.report({'WARNING'}, "Can't isolate nodes inside the shared node group {0}, make the layer unique first".format(node_group.name))
+                return {'CANCELLED'}
+
+        match node_preview.toggle_preview(material, node_trees, selected_node):
+            case 'PREVIEWED':
+                self.report({'INFO'}, "Connected node to Material Output")
+            case 'RESTORED':
+                self.report({'INFO'}, "Restored the previous preview")
+            case 'REMOVED':
+                self.report({'INFO'}, "Restored the original Material Output link")
+            case _:
+                self.report({'WARNING'}, "Can't connect the selected node to the Material Output")
+                return {'CANCELLED'}
         
         return {'FINISHED'}
 
@@ -558,22 +631,38 @@ class RYWRANGLER_OT_edit_image_externally(Operator):
 # Helper Functions
 # ==============================================================
 
-def get_blend_assets_path():
-    '''Returns the path to the blend file where assets are stored for this add-on.'''
-    blend_assets_path = str(Path(resource_path('USER')) / "scripts/addons" / ADDON_PACKAGE / "assets" / "Assets.blend")
-    return blend_assets_path
-
 def duplicate_node_group(node_group_name):
     '''Duplicates (makes a unique version of) the provided node group.'''
     node_group = bpy.data.node_groups.get(node_group_name)
     if node_group:
         duplicated_node_group = node_group.copy()
         duplicated_node_group.name = node_group_name + "_Copy"
+        if SHARED_NODE_GROUP_PROPERTY in duplicated_node_group:
+            del duplicated_node_group[SHARED_NODE_GROUP_PROPERTY]
         return duplicated_node_group
     else:
         debug_logging.log("Error: Can't duplicate node, group node with the provided name does not exist.")
         return None
-    
+
+def is_shared_node_group(node_tree):
+    '''Returns true if the provided node tree is a shared (canonical) layer node group that must be copied before it's edited.'''
+    return node_tree != None and node_tree.get(SHARED_NODE_GROUP_PROPERTY, False)
+
+def make_group_node_unique(group_node, unique_name=""):
+    '''Gives the group node its own copy of its node group if it's using a shared layer node group (copy-on-write).
+    Layers reference one shared node group until their internals are edited, which keeps datablock counts and shader compile times low.'''
+    node_tree = group_node.node_tree
+    if not is_shared_node_group(node_tree):
+        return node_tree
+
+    unique_node_tree = node_tree.copy()
+    del unique_node_tree[SHARED_NODE_GROUP_PROPERTY]
+    unique_node_tree.use_fake_user = False
+    unique_node_tree.name = unique_name or "{0}_{1}".format(group_node.id_data.name, node_tree.name)
+    group_node.node_tree = unique_node_tree
+    return unique_node_tree
+
+@profiling.profile("append_group_node")
 def append_group_node(node_group_name, keep_link=False, return_unique=False, append_missing=True, use_fake_user=True):
     '''Appends the group node with the provided name from this add-ons asset blend file.'''
 
@@ -581,20 +670,20 @@ def append_group_node(node_group_name, keep_link=False, return_unique=False, app
 
     # If the node group doesn't exist, append it from the blend asset file for the add-on.
     if not node_tree and append_missing:
-        blend_assets_path = get_blend_assets_path()
-        with bpy.data.libraries.load(blend_assets_path, link=keep_link) as (data_from, data_to):
-            data_to.node_groups = [node_group_name]
-        
-        # Check if the node group was successfully appended.
-        node_tree = bpy.data.node_groups.get(node_group_name)
-        if node_tree:
 
-            # Mark appended node trees with a 'fake user' to stop them from being 
-            # auto deleted from the blend file if they are not actively used.
-            node_tree.use_fake_user = use_fake_user
+        # Optionally append all asset node groups on first use, so later operations don't need to load the asset blend file.
+        # Preloading appends local copies, so it's skipped in link mode, where node groups are linked from the asset library instead.
+        link_assets = bpy.context.scene.rywrangler_texture_settings.asset_library_mode == 'LINK'
+        if bpy.context.scene.rywrangler_texture_settings.preload_assets and not link_assets:
+            asset_library.preload_assets()
 
-        # Throw an error if the node group doesn't exist and can't be appended.
+        if link_assets and not keep_link:
+            node_tree = asset_library.link_node_group(node_group_name, use_fake_user=use_fake_user)
         else:
+            node_tree = asset_library.append_node_groups([node_group_name], link=keep_link, use_fake_user=use_fake_user)[node_group_name]
+
+        # Throw an error if the node group doesn't exist and can't be appended.
+        if not node_tree:
             debug_logging.log("{0} does not exist and has failed to append from the blend asset file.".format(node_group_name))
             return None
 
@@ -607,6 +696,175 @@ def append_group_node(node_group_name, keep_link=False, return_unique=False, app
     # Return the node tree.
     return node_tree
 
+@profiling.profile("validate_texture_set_images")
+def validate_texture_set_images(image_paths, classified_files, self):
+    '''Reads the image headers of all classified images in a thread pool and removes images that can't be read.
+    Warns when image resolutions don't match the resolution defined in the texture settings. Returns the remaining image paths and their classifications.'''
+    used_image_paths = [image_path for image_path, (material_channel, packed_layout) in zip(image_paths, classified_files) if material_channel != 'NONE']
+    probed_headers = dict(zip(used_image_paths, image_headers.probe_image_headers(used_image_paths)))
+
+    texture_width = texture_settings.get_texture_width()
+    texture_height = texture_settings.get_texture_height()
+    valid_image_paths = []
+    valid_classified_files = []
+    mismatched_resolution_files = []
+    for image_path, classified_file in zip(image_paths, classified_files):
+        if image_path in probed_headers:
+            image_header = probed_headers[image_path]
+            if image_header == None:
+                debug_logging.log("Can't read image file, it won't be imported: {0}".format(image_path), message_type='ERROR')
+                continue
+
+            if image_header.width != texture_width or image_header.height != texture_height:
+                mismatched_resolution_files.append("{0} ({1}x{2})".format(os.path.basename(image_path), image_header.width, image_header.height))
+
+        valid_image_paths.append(image_path)
+        valid_classified_files.append(classified_file)
+
+    if mismatched_resolution_files:
+        debug_logging.log_status(
+            "{0} imported images don't match the texture resolution ({1}x{2}): {3}".format(len(mismatched_resolution_files), texture_width, texture_height, ", ".join(mismatched_resolution_files)),
+            self,
+            type='WARNING'
+        )
+
+    return valid_image_paths, valid_classified_files
+
+@profiling.profile("import_texture_set")
+def import_texture_set(image_paths, classified_files, self):
+    '''Imports the provided images into the material channels they were classified into (see texture_channels.classify).'''
+
+    # Read image headers before any image is loaded into blend data, so only images that will be used are loaded.
+    image_paths, classified_files = validate_texture_set_images(image_paths, classified_files, self)
+
+    # Get some information about the layer user later in the function.
+    selected_layer_index = bpy.context.scene.RYWRANGLER_layer_stack.selected_layer_index
+    layer_type = material_layers.get_layer_type()
+    layer_node = material_layers.get_material_layer_node('LAYER', selected_layer_index)
+    make_group_node_unique(layer_node)
+    shader_info = bpy.context.scene.RYWRANGLER_shader_info
+
+    # Load all images with a detected material channel into blend data at once.
+    with profiling.profile("import_texture_set.load_images"):
+        imported_images = image_utils.load_images([image_path for image_path, (material_channel, packed_layout) in zip(image_paths, classified_files) if material_channel != 'NONE'])
+
+    # Cycle through all selected image files and import them into their identified material channel.
+    selected_image_file = False
+    no_files_imported = True
+    unmatched_file_count = 0
+    for image_path, (detected_material_channel, packed_layout) in zip(image_paths, classified_files):
+        file_name = os.path.basename(image_path)
+
+        # Only import the image if a material channel was detected.
+        if detected_material_channel != 'NONE':
+            no_files_imported = False
+            imported_image = imported_images.get(image_path)
+            if imported_image == None:
+                debug_logging.log(
+                    "Import texture set operator failed to load {0} into the blend data.".format(image_path), 
+                    message_type='ERROR',
+                    sub_process=False
+                )
+                continue
+
+            # To support proper importing of channel packed images,
+            # create a list of all material channels that are packed into this image.
+            # For images not using channel packing, this list will have a length of 1.
+            packed_channels = []
+            if detected_material_channel == 'CHANNEL_PACKED':
+                for packed_channel, rgba_channel, invert in packed_layout:
+
+                    # Packed smoothness is inverted into roughness. Images imported again are reused, so channels that were already inverted are skipped.
+                    inverted_channels = imported_image.get(INVERTED_CHANNELS_PROPERTY, "").split(",")
+                    if invert and rgba_channel not in inverted_channels:
+                        pixel_ops.invert_image(
+                            imported_image,
+                            rgba_channel == 'RED',
+                            rgba_channel == 'GREEN',
+                            rgba_channel == 'BLUE',
+                            rgba_channel == 'ALPHA'
+                        )
+                        imported_image[INVERTED_CHANNELS_PROPERTY] = ",".join(channel for channel in inverted_channels + [rgba_channel] if channel)
+                        debug_logging.log_status("Channel packed smoothness was detected and inverted into roughness.", self, type='INFO')
+
+                    packed_channels.append([packed_channel, rgba_channel])
+            else:
+                packed_channels.append([detected_material_channel, -1])                
+
+            # Adjust nodes for the layer to support importing of all packed channels in the imported image.
+            for packed_channel in packed_channels:
+                channel = packed_channel[0]
+
+                # Create material channel nodes for all new channels.
+                material_layers.add_material_channel_nodes(channel, layer_node.node_tree, layer_type)
+
+                # Change all material channels to use texture nodes (if they aren't already).
+                value_node = material_layers.get_material_layer_node('VALUE', selected_layer_index, channel)
+                if value_node.bl_static_type != 'TEX_IMAGE':
+                    material_layers.replace_material_channel_node(channel, 'TEXTURE')
+
+                # Determine the default texture interpolation based on the material channel name.
+                default_texture_interpolation = 'Linear'
+                channel_socket_name = shaders.get_shader_channel_socket_name(channel)
+                shader_material_channel = shader_info.material_channels.get(channel_socket_name)
+                if shader_material_channel:
+                    default_texture_interpolation = shader_material_channel.default_texture_interpolation
+
+                # Place the image into a material nodes based on texture projection and inferred material channel name.
+                projection_node = material_layers.get_material_layer_node('PROJECTION', selected_layer_index)
+                match projection_node.node_tree.name:
+                    case 'RY_UVProjection':
+                        value_node = material_layers.get_material_layer_node('VALUE', selected_layer_index, channel)
+                        if value_node.bl_static_type == 'TEX_IMAGE':
+                            value_node.image = imported_image
+                            value_node.interpolation = default_texture_interpolation
+
+                    case 'RY_TriplanarProjection':
+                        for i in range(0, 3):
+                            value_node = material_layers.get_material_layer_node('VALUE', selected_layer_index, channel, node_number=i + 1)
+                            if value_node.bl_static_type == 'TEX_IMAGE':
+                                value_node.image = imported_image
+                                value_node.interpolation = default_texture_interpolation
+
+            # If the image is detected to be using channel packing, adjust the output of the material channel.
+            if detected_material_channel == 'CHANNEL_PACKED':
+                for i in range(0, len(packed_channels)):
+                    channel = packed_channels[i][0]
+                    output_channel = packed_channels[i][1]
+                    material_layers.set_material_channel_crgba_output(channel, output_channel, selected_layer_index)
+
+            # Select the first image file in the canvas painting window.
+            if selected_image_file == False:
+                bpy.context.scene.tool_settings.image_paint.canvas = imported_image
+                selected_image_file = True
+
+            # Update the imported images colorspace based on it's detected material channel.
+            image_utilities.set_default_image_colorspace(imported_image, detected_material_channel)
+
+            # Print a warning about using DirectX normal maps for users if it's suspected they are using one.
+            if detected_material_channel == 'NORMAL':
+                if image_utilities.check_for_directx(file_name):
+                    self.report({'INFO'}, "DirectX normal map import suspected, normals may be inverted. Use an OpenGL normal map instead.")
+
+            # Copy the imported image to the raw image folder for file management purposes.
+            # Copies run on a background thread, and images already in the raw image store are only linked.
+            image_utils.save_raw_image(image_path, imported_image.name)
+
+        else:
+            unmatched_file_count += 1
+            debug_logging.log("No material channel detected for file: {0}".format(file_name), message_type='DEBUG')
+
+    if no_files_imported:
+        debug_logging.log_status("No detected material channel in any selected files.", self, type='WARNING')
+
+    else:
+        if unmatched_file_count:
+            debug_logging.log("No material channel detected for {0} files, they weren't imported.".format(unmatched_file_count))
+
+        # Organize all material channel frames.
+        material_layers.organize_material_channel_frames(layer_node.node_tree)
+
+
 def set_snapping_mode(snapping_mode, snap_on=True):
     '''Sets snapping settings for working with different scenarios (decals).'''
     match snapping_mode:
@@ -623,6 +881,7 @@ def set_snapping_mode(snapping_mode, snap_on=True):
             bpy.context.scene.tool_settings.snap_elements_individual = {'FACE_PROJECT'}
             bpy.context.scene.tool_settings.snap_target = 'CENTER'
 
+@profiling.profile("add_group_node")
 def add_group_node(group_node_name):
     '''Appends a group node from the asset blend file and adds it to the active material.'''
     pie_menu_location = bpy.context.scene.rywrangler_pie_menu_location
@@ -632,18 +891,199 @@ def add_group_node(group_node_name):
     if not active_node_tree:
         return
 
-    # Create a new empty node group.
+    # All new group nodes reference the same shared node group, which is only copied for a group node when its internals are edited.
     node_tree = append_group_node(group_node_name)
-    node_tree.name = bpy.context.active_object.active_material.name + "_NewLayer"
+    if not node_tree:
+        return None
+    node_tree[SHARED_NODE_GROUP_PROPERTY] = True
 
     # Add a Group Node to the material node editor.
     group_node = active_node_tree.nodes.new('ShaderNodeGroup')
     group_node.node_tree = node_tree
-    group_node.name = node_tree.name
+    group_node.name = group_node_name
     group_node.width = 200.0
     group_node.location = (pie_menu_location[0] - 100, pie_menu_location[1] + group_node.height)
     return group_node
 
+def bake_mask_node(mask_node, self):
+    '''Bakes the linked outputs (or the first output) of the mask group node into cached images, and replaces the mask with image texture nodes using them.
+    Returns true if the mask was baked.'''
+    obj = bpy.context.object
+    material = obj.active_material if obj else None
+    if not material or not material.use_nodes or mask_node.id_data != material.node_tree:
+        debug_logging.log_status("Can't bake the mask, only masks in the active material (outside of node groups) can be baked.", self, type='ERROR')
+        return False
+    if obj.type != 'MESH' or not obj.data.uv_layers:
+        debug_logging.log_status("Can't bake the mask, the active object must be a mesh with a UV map.", self, type='ERROR')
+        return False
+
+    width = texture_settings.get_texture_width()
+    height = texture_settings.get_texture_height()
+    thirty_two_bit = bpy.context.scene.rywrangler_texture_settings.thirty_two_bit
+    mask_outputs = [output for output in mask_node.outputs if output.is_linked and output.type != 'SHADER'] or [mask_node.outputs[0]]
+    mask_bake_key = baking.get_node_bake_key(mask_node, obj, width, height, thirty_two_bit)
+
+    # Bake all outputs before replacing the mask, so a failed bake leaves the mask untouched.
+    baked_images = []
+    for output in mask_outputs:
+        bake_key = "{0}_{1}".format(mask_bake_key, output.identifier)
+        image_name = "{0}_{1}".format(mask_node.label or mask_node.name, output.name)
+        image = baking.bake_socket_cached(obj, material, output, bake_key, image_name, width, height, thirty_two_bit)
+        if not image:
+            debug_logging.log_status("Failed to bake the mask {0}.".format(mask_node.name), self, type='ERROR')
+            return False
+        baked_images.append((output, image))
+
+    nodes = material.node_tree.nodes
+    links = material.node_tree.links
+    for i, (output, image) in enumerate(baked_images):
+        image_node = nodes.new('ShaderNodeTexImage')
+        image_node.image = image
+        image_node.label = "{0} (Baked)".format(mask_node.label or mask_node.name)
+        image_node.location = (mask_node.location.x, mask_node.location.y - i * 300)
+        for link in list(output.links):
+            links.new(image_node.outputs['Color'], link.to_socket)
+    nodes.remove(mask_node)
+    return True
+
+def get_channel_texture_node(node_tree, material_channel):
+    '''Returns the image texture node inside the layer node group that supplies the material channel, identified by its label or name (i.e 'Roughness').'''
+    for node in node_tree.nodes:
+        if node.type == 'TEX_IMAGE' and layer_stack.get_socket_channel(node.label or node.name) == material_channel:
+            return node
+    return None
+
+def set_layer_channel_image(node_tree, material_channel, image):
+    '''Places the image into the image texture node for the material channel inside the UV layer node group.
+    If the layer has no image texture node for the channel, one is added and linked to the layer output for the channel. Returns false if the layer has no output for the channel.'''
+    texture_node = get_channel_texture_node(node_tree, material_channel)
+    if texture_node:
+        texture_node.image = image
+        return True
+
+    group_output_node = next((node for node in node_tree.nodes if node.type == 'GROUP_OUTPUT' and node.is_active_output), None)
+    if not group_output_node:
+        return False
+    output_socket = next((socket for socket in group_output_node.inputs if layer_stack.get_socket_channel(socket.name) == material_channel), None)
+    if not output_socket:
+        return False
+
+    texture_node = node_tree.nodes.new('ShaderNodeTexImage')
+    texture_node.image = image
+    texture_node.label = output_socket.name
+    texture_node.location = (group_output_node.location.x - 500, group_output_node.location.y - 300 * list(layer_stack.CHANNEL_SOCKET_NAMES).index(material_channel))
+    if material_channel == 'NORMAL':
+        normal_map_node = node_tree.nodes.new('ShaderNodeNormalMap')
+        normal_map_node.location = (texture_node.location.x + 300, texture_node.location.y)
+        node_tree.links.new(texture_node.outputs['Color'], normal_map_node.inputs['Color'])
+        node_tree.links.new(normal_map_node.outputs[0], output_socket)
+    else:
+        node_tree.links.new(texture_node.outputs['Color'], output_socket)
+    return True
+
+def bake_triplanar_layer(layer_node, obj, material, mesh_hash, self):
+    '''Bakes all material channels of the triplanar layer node into cached UV images, and replaces the layer with a UV layer using them.
+    Returns true if the layer was baked.'''
+    channel_sources = layer_stack.get_channel_sources(layer_node)
+    if not channel_sources:
+        debug_logging.log_status("Can't bake {0}, the layer has no material channel outputs.".format(layer_node.name), self, type='ERROR')
+        return False
+
+    width = texture_settings.get_texture_width()
+    height = texture_settings.get_texture_height()
+    thirty_two_bit = bpy.context.scene.rywrangler_texture_settings.thirty_two_bit
+    layer_bake_key = baking.get_node_bake_key(layer_node, obj, width, height, thirty_two_bit, mesh_hash=mesh_hash)
+
+    # Bake all channels before replacing the layer, so a failed bake leaves the layer untouched.
+    baked_images = {}
+    for material_channel, output in channel_sources.items():
+        image = baking.bake_socket_cached(
+            obj,
+            material,
+            output,
+            "{0}_{1}".format(layer_bake_key, material_channel),
+            "{0}_{1}".format(layer_node.label or layer_node.name, material_channel),
+            width,
+            height,
+            thirty_two_bit,
+            non_color=material_channel not in {'BASE_COLOR', 'EMISSION'},
+            bake_type='NORMAL' if material_channel == 'NORMAL' else 'EMIT'
+        )
+        if not image:
+            debug_logging.log_status("Failed to bake the {0} channel of {1}.".format(material_channel, layer_node.name), self, type='ERROR')
+            return False
+        baked_images[material_channel] = image
+
+    # The baked images are placed into a unique copy of the UV layer node group.
+    uv_node_tree = append_group_node("Layer_UV")
+    if not uv_node_tree:
+        return False
+    uv_node_tree = uv_node_tree.copy()
+    uv_node_tree.name = "{0}_Layer_UV".format(material.name)
+    uv_node_tree.use_fake_user = False
+    if SHARED_NODE_GROUP_PROPERTY in uv_node_tree:
+        del uv_node_tree[SHARED_NODE_GROUP_PROPERTY]
+    for material_channel, image in baked_images.items():
+        if not set_layer_channel_image(uv_node_tree, material_channel, image):
+            debug_logging.log("The UV layer has no output for the {0} channel, it won't be used.".format(material_channel), message_type='WARNING')
+
+    # Replace the triplanar layer, keeping its input values and links.
+    nodes = material.node_tree.nodes
+    links = material.node_tree.links
+    uv_layer_node = nodes.new('ShaderNodeGroup')
+    uv_layer_node.node_tree = uv_node_tree
+    uv_layer_node.label = layer_node.label
+    uv_layer_node.width = layer_node.width
+    uv_layer_node.location = layer_node.location
+    for input_socket in layer_node.inputs:
+        uv_input_socket = uv_layer_node.inputs.get(input_socket.name)
+        if not uv_input_socket:
+            continue
+        if input_socket.is_linked:
+            links.new(input_socket.links[0].from_socket, uv_input_socket)
+        elif hasattr(input_socket, "default_value") and hasattr(uv_input_socket, "default_value") and input_socket.type == uv_input_socket.type:
+            uv_input_socket.default_value = input_socket.default_value
+    for output_socket in layer_node.outputs:
+        uv_output_socket = uv_layer_node.outputs.get(output_socket.name)
+        if not uv_output_socket:
+            continue
+        for link in list(output_socket.links):
+            links.new(uv_output_socket, link.to_socket)
+
+    layer_name = layer_node.name
+    nodes.remove(layer_node)
+    uv_layer_node.name = layer_name
+    return True
+
+def get_export_packed_format(settings):
+    '''Returns the channel packed format (i.e 'orm') textures are exported with, or an empty string if channels aren't packed.'''
+    if settings.export_packed_format == 'NONE':
+        return ""
+    return settings.export_packed_format.lower()
+
+def add_channel_layer(node_tree, layer_group_node):
+    '''Blends all material channels of the layer group node into the materials layer stack shader, creating the layer stack if it doesn't exist.
+    Returns false if the layer group node doesn't supply any material channels.'''
+    if not layer_stack.get_channel_sources(layer_group_node):
+        return False
+
+    stack_shader = layer_stack.get_stack_shader(node_tree)
+    if not stack_shader:
+        if layer_stack.rebuild_layer_stack(node_tree) == 0:
+            output_node = next((node for node in node_tree.nodes if node.type == 'OUTPUT_MATERIAL' and node.is_active_output), None)
+            location = (output_node.location.x - 300, output_node.location.y) if output_node else (0, 0)
+            layer_stack.create_stack_shader(node_tree, location)
+        stack_shader = layer_stack.get_stack_shader(node_tree)
+
+    # A single value node controls the opacity of the layer for all of its channels.
+    opacity_node = node_tree.nodes.new('ShaderNodeValue')
+    opacity_node.label = "{0} Opacity".format(layer_group_node.name)
+    opacity_node.outputs[0].default_value = 0.5
+    opacity_node.location = (layer_group_node.location.x, layer_group_node.location.y + 100)
+    layer_stack.add_layer_to_stack(node_tree, layer_group_node, opacity_node.outputs[0])
+    return True
+
+@profiling.profile("add_layer_node")
 def add_layer_node(layer_type):
     '''Adds a default layer node of the specified type, organizes nodes and connects layers if applicable.'''
 
@@ -662,7 +1102,7 @@ def add_layer_node(layer_type):
 
     # Add the new layer group node based on the specified type
     layer_group_node = None
-    match layer_type:
+    match layer_type.upper():
         case "UV":
             layer_group_node = add_group_node("Layer_UV")
         case "DECAL":
@@ -675,6 +1115,12 @@ def add_layer_node(layer_type):
     if not layer_group_node:
         return
 
+    # In channel layer stack mode, blend each material channel of the layer into the stack shader rather than adding a Mix Shader.
+    if bpy.context.scene.rywrangler_texture_settings.layer_stack_mode == 'CHANNEL':
+        if add_channel_layer(mat.node_tree, layer_group_node):
+            return
+        debug_logging.log("{0} has no material channel outputs, it will be mixed using a Mix Shader.".format(layer_group_node.node_tree.name), message_type='WARNING')
+
     if not selected_node:
         # Just add the layer node with no connections
         return
@@ -708,15 +1154,15 @@ def add_layer_node(layer_type):
     links.new(layer_group_node.outputs[0], mix_shader.inputs[2])
 
     # Reconnect to Material Output (Surface)
-    output_node = next((n for n in nodes if isinstance(n, bpy.types.ShaderNodeOutputMaterial)), None)
-    if output_node:
+    output_node = node_index.get_output_node(mat.node_tree)
+    if output_node and output_node.type == 'OUTPUT_MATERIAL':
         for link in output_node.inputs['Surface'].links:
             links.remove(link)
         links.new(mix_shader.outputs[0], output_node.inputs['Surface'])
 
     # Select original, layer, and mix nodes
-    for n in nodes:
-        n.select = False
+    for node in nodes:
+        node.select = False
     selected_node.select = True
     layer_group_node.select = True
     mix_shader.select = True
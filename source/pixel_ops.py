@@ -0,0 +1,206 @@
+# This file contains vectorized functions to edit image pixels (invert, swizzle, pack and unpack channels) using NumPy.
+# Pixels are copied between Blender images and float32 buffers with foreach_get / foreach_set, which is orders of magnitude faster than editing pixels in Python loops.
+# Images too large to copy whole are edited in row bands through slices of their pixels instead, so peak extra memory stays bounded at any resolution.
+
+import time
+import tracemalloc
+import numpy
+from ..source import debug_logging
+
+# RGBA channel names mapped to their index in pixel buffers.
+RGBA_CHANNEL_INDICES = {
+    'RED': 0,
+    'GREEN': 1,
+    'BLUE': 2,
+    'ALPHA': 3
+}
+
+# Maximum size of the row bands pixel buffers are processed in. Operations that need temporary memory only allocate (and reuse) a scratch buffer of this size,
+# so peak extra memory stays bounded at any resolution (a full 8K RGBA float image is 1 GiB).
+BAND_BYTES = 32 * 1024 * 1024
+
+# Bytes used per pixel value while images are edited in bands, a float32 value in the band buffer plus the Python float (and sequence pointer) it's read
+# from or written through, since image pixels can only be read and written in parts through slices.
+SLICE_VALUE_BYTES = 4 + 32
+
+# Scratch buffer reused by all banded operations.
+_scratch_buffer = numpy.empty(0, dtype=numpy.float32)
+
+def get_channel_index(channel):
+    '''Returns the pixel buffer index for the provided channel name (i.e 'RED') or index.'''
+    if isinstance(channel, str):
+        return RGBA_CHANNEL_INDICES[channel]
+    return channel
+
+def get_scratch_buffer(shape):
+    '''Returns a view of the reusable scratch buffer with the provided shape, only allocating memory when the scratch buffer is too small.'''
+    global _scratch_buffer
+    size = int(numpy.prod(shape))
+    if _scratch_buffer.size < size:
+        _scratch_buffer = numpy.empty(size, dtype=numpy.float32)
+    return _scratch_buffer[:size].reshape(shape)
+
+def iter_row_bands(pixels, band_bytes=BAND_BYTES):
+    '''Yields consecutive row bands (views) of the pixel buffer, each no larger than the provided number of bytes.'''
+    row_bytes = max(pixels[0].nbytes, 1)
+    band_rows = max(band_bytes // row_bytes, 1)
+    for start_row in range(0, pixels.shape[0], band_rows):
+        yield pixels[start_row:start_row + band_rows]
+
+def get_image_pixels(image):
+    '''Returns the pixels of the provided image as a float32 buffer shaped (height, width, channels).'''
+    width, height = image.size
+    pixels = numpy.empty(width * height * image.channels, dtype=numpy.float32)
+    image.pixels.foreach_get(pixels)
+    return pixels.reshape(height, width, image.channels)
+
+def set_image_pixels(image, pixels):
+    '''Writes the provided float32 pixel buffer into the provided image.'''
+    image.pixels.foreach_set(numpy.ascontiguousarray(pixels, dtype=numpy.float32).ravel())
+    image.update()
+
+def invert_channels(pixels, invert_r=False, invert_g=False, invert_b=False, invert_a=False):
+    '''Inverts the specified channels of the pixel buffer in place.'''
+    for channel_index, invert in enumerate((invert_r, invert_g, invert_b, invert_a)):
+        if invert and channel_index < pixels.shape[-1]:
+            channel = pixels[..., channel_index]
+            numpy.subtract(1.0, channel, out=channel)
+    return pixels
+
+def swizzle_channels(pixels, channel_order, band_bytes=BAND_BYTES):
+    '''Reorders channels of the pixel buffer in place (i.e ('GREEN', 'RED', 'BLUE', 'ALPHA') swaps the red and green channels).
+    Rows are reordered in bands through the scratch buffer, so a full size copy of the pixel buffer is never made.'''
+    channel_indices = [get_channel_index(channel) for channel in channel_order]
+    for band in iter_row_bands(pixels, band_bytes):
+        scratch = get_scratch_buffer(band.shape)
+        numpy.take(band, channel_indices, axis=-1, out=scratch, mode='clip')
+        band[...] = scratch
+    return pixels
+
+def unpack_channel(pixels, channel):
+    '''Returns a single channel of the pixel buffer as a new (height, width) buffer.'''
+    return pixels[..., get_channel_index(channel)].copy()
+
+def pack_channels(channels, default_values=(0.0, 0.0, 0.0, 1.0), out=None):
+    '''Packs up to four single channel (height, width) buffers into an RGBA pixel buffer, written into the provided output buffer if there is one.
+    Channels provided as None are filled with their default value (i.e alpha defaults to 1).'''
+    height, width = next(channel.shape for channel in channels if channel is not None)
+    pixels = out if out is not None else numpy.empty((height, width, 4), dtype=numpy.float32)
+    for channel_index in range(0, 4):
+        channel = channels[channel_index] if channel_index < len(channels) else None
+        if channel is None:
+            pixels[..., channel_index] = default_values[channel_index]
+        else:
+            pixels[..., channel_index] = channel
+    return pixels
+
+def resample_channel(channel, height, width, band_bytes=BAND_BYTES):
+    '''Returns the single channel (height, width) buffer resampled to the provided resolution with bilinear filtering, or the buffer itself if it's already that size.
+    Output rows are resampled in bands, so temporary memory stays bounded by the band size rather than growing with the resolution.'''
+    if channel.shape == (height, width):
+        return channel
+
+    # Sample positions are pixel centers mapped into the source buffer, each blended from its two closest source pixels per axis.
+    source_height, source_width = channel.shape
+    y = numpy.clip((numpy.arange(height, dtype=numpy.float32) + 0.5) * (source_height / height) - 0.5, 0, source_height - 1)
+    x = numpy.clip((numpy.arange(width, dtype=numpy.float32) + 0.5) * (source_width / width) - 0.5, 0, source_width - 1)
+    y0 = y.astype(numpy.int64)
+    x0 = x.astype(numpy.int64)
+    y1 = numpy.minimum(y0 + 1, source_height - 1)
+    x1 = numpy.minimum(x0 + 1, source_width - 1)
+    y_weight = (y - y0).astype(numpy.float32)[:, None]
+    x_weight = (x - x0).astype(numpy.float32)[None, :]
+
+    # Each band row needs two gathered source rows and five output sized rows of temporaries (the blended top and bottom rows, and three while blending).
+    resampled_channel = numpy.empty((height, width), dtype=numpy.float32)
+    band_row_bytes = (2 * source_width + 5 * width) * resampled_channel.itemsize
+    band_rows = max(band_bytes // band_row_bytes, 1)
+    for start_row in range(0, height, band_rows):
+        rows = slice(start_row, start_row + band_rows)
+        top_rows = channel[y0[rows]]
+        bottom_rows = channel[y1[rows]]
+
+        # Blend horizontally (left + (right - left) * weight) within the top and bottom rows, then vertically between them.
+        top = top_rows[:, x0]
+        top += (top_rows[:, x1] - top) * x_weight
+        bottom = bottom_rows[:, x0]
+        bottom += (bottom_rows[:, x1] - bottom) * x_weight
+        bottom -= top
+        bottom *= y_weight[rows]
+        numpy.add(top, bottom, out=resampled_channel[rows])
+    return resampled_channel
+
+def edit_image_pixels(image, operation, *args, band_bytes=BAND_BYTES):
+    '''Runs the operation on the pixels of the provided image in place, one band of rows at a time, so a full size copy of the image pixels is never made.
+    Images small enough to fit in one band are read and written with a single (much faster) foreach_get / foreach_set instead.'''
+    width, height = image.size
+    row_values = width * image.channels
+    if row_values * height * SLICE_VALUE_BYTES <= band_bytes:
+        pixels = get_image_pixels(image)
+        operation(pixels, *args)
+        set_image_pixels(image, pixels)
+        return
+
+    band_rows = max(band_bytes // (row_values * SLICE_VALUE_BYTES), 1)
+    for start_row in range(0, height, band_rows):
+        row_count = min(band_rows, height - start_row)
+        start = start_row * row_values
+        end = start + row_count * row_values
+        band = numpy.array(image.pixels[start:end], dtype=numpy.float32).reshape(row_count, width, image.channels)
+        operation(band, *args)
+        image.pixels[start:end] = band.ravel().tolist()
+    image.update()
+
+def invert_image(image, invert_r=False, invert_g=False, invert_b=False, invert_a=False, band_bytes=BAND_BYTES):
+    '''Inverts the specified channels of the provided image (i.e to convert smoothness into roughness).'''
+    edit_image_pixels(image, invert_channels, invert_r, invert_g, invert_b, invert_a, band_bytes=band_bytes)
+
+def swizzle_image(image, channel_order, band_bytes=BAND_BYTES):
+    '''Reorders the channels of the provided image.'''
+    edit_image_pixels(image, swizzle_channels, channel_order, band_bytes=band_bytes)
+
+def get_peak_extra_memory(operation, *args, **kwargs):
+    '''Runs the operation and returns the peak memory (in bytes) it allocated. NumPy reports its allocations to tracemalloc, so the peak includes any temporary buffers.'''
+    tracemalloc.start()
+    try:
+        operation(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def get_benchmark_operations(pixels, packed_pixels):
+    '''Returns the benchmarked operations as (function, arguments) for each operation name, run on the provided buffers.'''
+    return {
+        'invert': (invert_channels, (pixels, False, True)),
+        'swizzle': (swizzle_channels, (pixels, ('GREEN', 'RED', 'BLUE', 'ALPHA'))),
+        'unpack': (unpack_channel, (pixels, 'RED')),
+        'pack': (pack_channels, ((pixels[..., 0], pixels[..., 1], None, None), (0.0, 0.0, 0.0, 1.0), packed_pixels))
+    }
+
+def benchmark(resolutions=(1024, 2048, 4096, 8192), repeats=3):
+    '''Times vectorized pixel operations on square RGBA float32 buffers of each provided resolution.
+    Returns the best time in milliseconds and the peak extra memory in MiB (memory allocated beyond the pixel buffer) for each operation.
+    Blender images aren't required, so this can be run from Blender's Python console, a background Blender instance or plain Python.'''
+    results = {}
+    for resolution in resolutions:
+        pixels = numpy.random.default_rng(0).random((resolution, resolution, 4), dtype=numpy.float32)
+        packed_pixels = numpy.empty_like(pixels)
+
+        results[resolution] = {}
+        for operation_name, (operation, arguments) in get_benchmark_operations(pixels, packed_pixels).items():
+            best_time = None
+            for i in range(0, repeats):
+                start_time = time.perf_counter()
+                operation(*arguments)
+                elapsed_time = (time.perf_counter() - start_time) * 1000
+                if best_time == None or elapsed_time < best_time:
+                    best_time = elapsed_time
+
+            # Unpack returns a single channel buffer by design, so its peak includes that buffer.
+            peak_memory = get_peak_extra_memory(operation, *arguments) / (1024 * 1024)
+            results[resolution][operation_name] = (best_time, peak_memory)
+            debug_logging.log("Pixel ops benchmark {0}x{0} {1}: {2:.2f}ms, {3:.1f}MiB peak extra memory".format(resolution, operation_name, best_time, peak_memory))
+
+        # Free the buffers before allocating the next (larger) resolution.
+        del pixels, packed_pixels
+    return results
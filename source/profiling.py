@@ -0,0 +1,146 @@
+# This file contains lightweight profiling used to find where time is spent in operators (i.e appending node groups, creating nodes or importing images).
+# Operators and helper functions report timed spans, rolling timings of each operation are kept for the performance section of the side panel,
+# and spans can optionally be recorded and saved as a trace file in the Chrome trace format (open it in chrome://tracing or https://ui.perfetto.dev).
+
+import os
+import json
+import math
+import time
+import threading
+import functools
+from collections import deque
+
+# Number of recent timings kept per operation for rolling percentiles.
+ROLLING_SAMPLE_COUNT = 100
+
+# Maximum number of spans kept while recording a trace, the oldest spans are dropped past this.
+MAX_TRACE_EVENTS = 100000
+
+# Recent timings (in seconds) of each operation.
+_timings = {}
+
+# Recorded trace events, only recorded while trace recording is enabled.
+_trace_events = deque(maxlen=MAX_TRACE_EVENTS)
+_record_trace = False
+
+# Time all trace event timestamps are relative to.
+_trace_start_time = time.perf_counter()
+
+class ProfileSpan():
+    '''Times the code in a with block (or a decorated function) and reports it as a span of the named operation.'''
+    def __init__(self, name):
+        self.name = name
+        self.start_time = 0.0
+
+    def __enter__(self):
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        add_span(self.name, self.start_time, time.perf_counter())
+        return False
+
+    def __call__(self, function):
+        '''Decorates the function, each call is timed with its own span so nested and recursive calls are timed correctly.'''
+        @functools.wraps(function)
+        def profiled_function(*args, **kwargs):
+            with ProfileSpan(self.name):
+                return function(*args, **kwargs)
+        return profiled_function
+
+def profile(name):
+    '''Returns a span for the named operation, used as a context manager (with profiling.profile("name"):) or a function decorator (@profiling.profile("name")).'''
+    return ProfileSpan(name)
+
+def add_span(name, start_time, end_time):
+    '''Adds the timing of a span to the rolling timings of its operation, and to the trace if one is being recorded.'''
+    duration = end_time - start_time
+    timings = _timings.get(name)
+    if timings == None:
+        timings = _timings.setdefault(name, deque(maxlen=ROLLING_SAMPLE_COUNT))
+    timings.append(duration)
+
+    if _record_trace:
+        _trace_events.append({
+            'name': name,
+            'cat': name.split(".")[0],
+            'ph': 'X',
+            'ts': (start_time - _trace_start_time) * 1000000,
+            'dur': duration * 1000000,
+            'pid': os.getpid(),
+            'tid': threading.get_ident()
+        })
+
+def instrument_operator(operator_class):
+    '''Reports the execute and invoke calls of the operator class as spans named by the operators id name. Operators are only instrumented once.
+    Blender checks the argument count of operator functions when registering them, so wrappers keep the exact arguments of the functions they wrap.'''
+    name = operator_class.bl_idname
+    execute = operator_class.__dict__.get('execute')
+    if execute != None and not getattr(execute, "_rywrangler_profiled", False):
+        @functools.wraps(execute)
+        def profiled_execute(self, context):
+            with ProfileSpan(name):
+                return execute(self, context)
+        profiled_execute._rywrangler_profiled = True
+        operator_class.execute = profiled_execute
+
+    invoke = operator_class.__dict__.get('invoke')
+    if invoke != None and not getattr(invoke, "_rywrangler_profiled", False):
+        @functools.wraps(invoke)
+        def profiled_invoke(self, context, event):
+            with ProfileSpan(name):
+                return invoke(self, context, event)
+        profiled_invoke._rywrangler_profiled = True
+        operator_class.invoke = profiled_invoke
+    return operator_class
+
+def get_percentile(sorted_values, percentile):
+    '''Returns the percentile (0 - 100) of the sorted values, using the nearest rank.'''
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(percentile / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+def get_statistics():
+    '''Returns (name, sample count, last, p50, p95) timings in milliseconds for each operation, slowest (by p95) first.'''
+    statistics = []
+    for name, timings in list(_timings.items()):
+        samples = list(timings)
+        if not samples:
+            continue
+        sorted_samples = sorted(samples)
+        statistics.append((
+            name,
+            len(samples),
+            samples[-1] * 1000,
+            get_percentile(sorted_samples, 50) * 1000,
+            get_percentile(sorted_samples, 95) * 1000
+        ))
+    statistics.sort(key=lambda statistic: statistic[4], reverse=True)
+    return statistics
+
+def clear_statistics():
+    '''Clears the rolling timings of all operations and all recorded trace events.'''
+    _timings.clear()
+    _trace_events.clear()
+
+def set_trace_recording(record_trace):
+    '''Starts or stops recording spans for trace files.'''
+    global _record_trace
+    _record_trace = record_trace
+
+def is_recording_trace():
+    '''Returns true if spans are being recorded for trace files.'''
+    return _record_trace
+
+def get_trace_event_count():
+    '''Returns the number of recorded trace events.'''
+    return len(_trace_events)
+
+def save_trace(file_path):
+    '''Saves the recorded spans to a trace file in the Chrome trace (json) format. Returns the number of saved spans.'''
+    trace_events = list(_trace_events)
+    os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+    with open(file_path, 'w', encoding='utf-8') as trace_file:
+        json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, trace_file)
+    return len(trace_events)
@@ -0,0 +1,203 @@
+# This file contains a static analyser that estimates the shader compile / render cost of material node trees.
+# Results are cached per node tree, and cleared by a depsgraph handler when node trees change (and when blend data is reloaded by undo, redo or loading blend files),
+# so the user interface can display them every redraw. Cached results are also recalculated when images they use change resolution or format.
+
+import bpy
+from bpy.app.handlers import persistent
+
+# Procedural texture nodes that evaluate noise functions per sample.
+NOISE_NODE_TYPES = {'TEX_NOISE', 'TEX_VORONOI', 'TEX_MUSGRAVE', 'TEX_WAVE', 'TEX_MAGIC', 'TEX_WHITE_NOISE', 'TEX_GABOR'}
+
+# Nodes that mix values or shaders, used to measure mix depth.
+MIX_NODE_TYPES = {'MIX_SHADER', 'ADD_SHADER', 'MIX', 'MIX_RGB'}
+
+# Cached analysis results keyed by node tree pointer, and cached per layer results for materials keyed by material node tree pointer.
+_analysis_cache = {}
+_layer_analysis_cache = {}
+
+def new_shader_cost():
+    '''Returns an empty shader cost.'''
+    return {
+        'image_samples': 0,
+        'noise_evaluations': 0,
+        'closures': 0,
+        'mix_depth': 0,
+        'images': {}
+    }
+
+def add_shader_cost(shader_cost, other_shader_cost):
+    '''Adds the other shader cost to the shader cost. Mix depth isn't added since it's measured along node paths.'''
+    shader_cost['image_samples'] += other_shader_cost['image_samples']
+    shader_cost['noise_evaluations'] += other_shader_cost['noise_evaluations']
+    shader_cost['closures'] += other_shader_cost['closures']
+    shader_cost['images'].update(other_shader_cost['images'])
+
+def get_image_memory(image):
+    '''Returns the estimated memory used by the image in bytes.'''
+    width, height = image.size
+    return width * height * image.channels * (4 if image.is_float else 1)
+
+def is_image_memory_current(shader_cost):
+    '''Returns true if the images in the shader cost still exist and use the memory they did when the shader cost was estimated.'''
+    for image_name, image_memory in shader_cost['images'].items():
+        image = bpy.data.images.get(image_name)
+        if image == None or get_image_memory(image) != image_memory:
+            return False
+    return True
+
+def get_input_nodes(node_tree):
+    '''Returns a dictionary of nodes to the nodes linked into their inputs, so walking the tree doesn't scan all links for each node.'''
+    input_nodes = {}
+    for link in node_tree.links:
+        if link.is_valid and not link.is_muted:
+            input_nodes.setdefault(link.to_node, []).append(link.from_node)
+    return input_nodes
+
+def get_output_node(node_tree):
+    '''Returns the active material output (for materials) or group output (for node groups) node of the node tree.'''
+    fallback_output_node = None
+    for node in node_tree.nodes:
+        if node.type in {'OUTPUT_MATERIAL', 'GROUP_OUTPUT'}:
+            if node.is_active_output:
+                return node
+            fallback_output_node = fallback_output_node or node
+    return fallback_output_node
+
+def get_reachable_nodes(node_tree, input_nodes=None):
+    '''Returns all nodes that contribute to the output of the node tree. Nodes that aren't connected to the output aren't compiled.'''
+    output_node = get_output_node(node_tree)
+    if not output_node:
+        return []
+
+    input_nodes = input_nodes or get_input_nodes(node_tree)
+    reachable_nodes = []
+    visited_nodes = {output_node}
+    nodes_to_visit = [output_node]
+    while nodes_to_visit:
+        node = nodes_to_visit.pop()
+        reachable_nodes.append(node)
+        for from_node in input_nodes.get(node, []):
+            if from_node not in visited_nodes:
+                visited_nodes.add(from_node)
+                nodes_to_visit.append(from_node)
+    return reachable_nodes
+
+def get_mix_depth(reachable_nodes, input_nodes):
+    '''Returns the largest number of mix nodes along any path to the output of the node tree.'''
+    # Resolve depths from the leaves up, iteratively so very deep chains don't hit the recursion limit.
+    depths = {}
+    for node in reversed(reachable_nodes):
+        nodes_to_resolve = [node]
+        while nodes_to_resolve:
+            current_node = nodes_to_resolve[-1]
+            if current_node in depths:
+                nodes_to_resolve.pop()
+                continue
+            unresolved_nodes = [from_node for from_node in input_nodes.get(current_node, []) if from_node not in depths]
+            if unresolved_nodes:
+                nodes_to_resolve.extend(unresolved_nodes)
+                continue
+            nodes_to_resolve.pop()
+            input_depth = max((depths[from_node] for from_node in input_nodes.get(current_node, [])), default=0)
+            depths[current_node] = input_depth + (1 if current_node.type in MIX_NODE_TYPES else 0)
+    return max(depths.values(), default=0)
+
+def analyse_node_tree(node_tree):
+    '''Returns the estimated shader cost of the node tree (image samples, noise evaluations, closures, mix depth, unique images), including nested node groups.'''
+    cache_key = node_tree.as_pointer()
+    shader_cost = _analysis_cache.get(cache_key)
+    if shader_cost != None and is_image_memory_current(shader_cost):
+        return shader_cost
+
+    # Cache an empty cost first, in case of (invalid) recursive node groups.
+    shader_cost = new_shader_cost()
+    _analysis_cache[cache_key] = shader_cost
+
+    input_nodes = get_input_nodes(node_tree)
+    reachable_nodes = get_reachable_nodes(node_tree, input_nodes)
+    group_mix_depth = 0
+    for node in reachable_nodes:
+        if node.mute:
+            continue
+
+        match node.type:
+            case 'TEX_IMAGE':
+                # Box projected (triplanar) images are sampled once per axis.
+                shader_cost['image_samples'] += 3 if node.projection == 'BOX' else 1
+                if node.image:
+                    shader_cost['images'][node.image.name] = get_image_memory(node.image)
+            case 'TEX_ENVIRONMENT':
+                shader_cost['image_samples'] += 1
+                if node.image:
+                    shader_cost['images'][node.image.name] = get_image_memory(node.image)
+            case 'GROUP':
+                if node.node_tree:
+                    group_shader_cost = analyse_node_tree(node.node_tree)
+                    add_shader_cost(shader_cost, group_shader_cost)
+                    group_mix_depth = max(group_mix_depth, group_shader_cost['mix_depth'])
+            case _:
+                if node.type in NOISE_NODE_TYPES:
+                    shader_cost['noise_evaluations'] += 1
+                elif any(output.type == 'SHADER' for output in node.outputs):
+                    shader_cost['closures'] += 1
+
+    shader_cost['mix_depth'] = get_mix_depth(reachable_nodes, input_nodes) + group_mix_depth
+    return shader_cost
+
+def analyse_material(material):
+    '''Returns the estimated shader cost of the material, and a list of (layer name, shader cost) tuples for each group node (layer / mask) in the material.'''
+    node_tree = material.node_tree
+    cache_key = node_tree.as_pointer()
+    layer_costs = _layer_analysis_cache.get(cache_key)
+    if layer_costs == None or not all(is_image_memory_current(layer_cost) for layer_name, layer_cost in layer_costs):
+        layer_costs = []
+        for node in get_reachable_nodes(node_tree):
+            if node.type == 'GROUP' and node.node_tree:
+                layer_costs.append((node.label or node.name, analyse_node_tree(node.node_tree)))
+        layer_costs.sort(key=lambda layer_cost: layer_cost[1]['image_samples'] + layer_cost[1]['noise_evaluations'], reverse=True)
+        _layer_analysis_cache[cache_key] = layer_costs
+    return analyse_node_tree(node_tree), layer_costs
+
+def clear_cache():
+    '''Clears all cached analysis results.'''
+    _analysis_cache.clear()
+    _layer_analysis_cache.clear()
+
+@persistent
+def on_depsgraph_update(scene, depsgraph):
+    '''Clears cached analysis results for node trees that changed.'''
+    for update in depsgraph.updates:
+        updated_id = update.id
+        if isinstance(updated_id, bpy.types.Material):
+            if updated_id.node_tree:
+                _analysis_cache.pop(updated_id.node_tree.as_pointer(), None)
+                _layer_analysis_cache.pop(updated_id.node_tree.as_pointer(), None)
+
+        # Node groups can be used in any material, so all results that might include them are cleared.
+        elif isinstance(updated_id, bpy.types.NodeTree):
+            clear_cache()
+            return
+
+@persistent
+def on_blend_data_reloaded(*args):
+    '''Clears all cached analysis results when blend data is reloaded (undo, redo, loading blend files), since node tree pointers can be reused.'''
+    clear_cache()
+
+def register_handlers():
+    '''Registers the handlers that clear cached analysis results.'''
+    bpy.app.handlers.depsgraph_update_post.append(on_depsgraph_update)
+    bpy.app.handlers.undo_post.append(on_blend_data_reloaded)
+    bpy.app.handlers.redo_post.append(on_blend_data_reloaded)
+    bpy.app.handlers.load_post.append(on_blend_data_reloaded)
+
+def unregister_handlers():
+    '''Removes the handlers that clear cached analysis results, and clears all cached results.'''
+    for handlers, handler in (
+        (bpy.app.handlers.depsgraph_update_post, on_depsgraph_update),
+        (bpy.app.handlers.undo_post, on_blend_data_reloaded),
+        (bpy.app.handlers.redo_post, on_blend_data_reloaded),
+        (bpy.app.handlers.load_post, on_blend_data_reloaded)
+    ):
+        if handler in handlers:
+            handlers.remove(handler)
+    clear_cache()
@@ -0,0 +1,213 @@
+# This file contains a matcher that finds the best links between the output sockets of one node and the input sockets of another.
+# Socket pairs are scored by name similarity, socket type compatibility and the material channel their names identify (i.e 'Color' into 'Base Color'),
+# then the assignment of outputs to inputs with the highest total score is solved optimally with the Hungarian method.
+# Socket signatures (the scoring features of all sockets on a node) are cached per node type, so matching large selections stays fast.
+
+import difflib
+from collections import namedtuple
+from .texture_channels import MATERIAL_CHANNEL_TAGS, split_filename_by_components
+
+# Scoring features of a socket. Index is the sockets index in its nodes inputs or outputs.
+SocketFeature = namedtuple('SocketFeature', ['index', 'name', 'type', 'channel', 'components'])
+
+# How well an output socket type converts into an input socket type (1 = same type, 0 = can't be linked).
+SOCKET_TYPE_COMPATIBILITY = {
+    ('VALUE', 'RGBA'): 0.6,
+    ('RGBA', 'VALUE'): 0.6,
+    ('VALUE', 'VECTOR'): 0.5,
+    ('VECTOR', 'VALUE'): 0.4,
+    ('RGBA', 'VECTOR'): 0.5,
+    ('VECTOR', 'RGBA'): 0.5,
+    ('INT', 'VALUE'): 0.7,
+    ('BOOLEAN', 'VALUE'): 0.5,
+    ('VALUE', 'INT'): 0.4
+}
+
+# Socket types that can't be linked automatically.
+UNLINKABLE_SOCKET_TYPES = {'CUSTOM', 'STRING', 'MENU'}
+
+# Weights of each part of the score of a socket pair.
+NAME_WEIGHT = 2.0
+CHANNEL_WEIGHT = 1.5
+TYPE_WEIGHT = 1.0
+
+# Pairs scoring below this aren't linked.
+MIN_LINK_SCORE = 1.0
+
+# Socket names less similar than this don't count as a match. Character similarity is never zero, so without this every pair of same type sockets
+# would score above the minimum link score and be linked (i.e 'Fac' into 'Metallic').
+MIN_NAME_SIMILARITY = 0.5
+
+# Scalar material channels a value output without a channel of its own (i.e 'Fac') can still be linked into, with the channel score used for each.
+# Generic values most commonly drive roughness, so it's preferred when several scalar channel inputs are free.
+SCALAR_CHANNEL_FALLBACK_SCORES = {
+    'ROUGHNESS': 0.6,
+    'METALLIC': 0.4,
+    'SPECULAR': 0.3,
+    'ALPHA': 0.2
+}
+
+# Cached socket signatures, keyed by node type and the names and types of the nodes sockets.
+_socket_signatures = {}
+
+def get_socket_channel(socket_name):
+    '''Returns the material channel identified by the socket name (i.e 'Base Color' = 'BASE_COLOR'), or None.'''
+    for component in split_filename_by_components(socket_name):
+        channel = MATERIAL_CHANNEL_TAGS.get(component)
+        if channel:
+            return channel
+    return None
+
+def get_socket_feature(index, name, socket_type):
+    '''Returns the scoring features of a socket.'''
+    return SocketFeature(index, name.lower(), socket_type, get_socket_channel(name), frozenset(split_filename_by_components(name)))
+
+def get_name_similarity(output_feature, input_feature):
+    '''Returns how similar the names of the two sockets are, from 0 (nothing in common) to 1 (same name).'''
+    if output_feature.name == input_feature.name:
+        return 1.0
+    shared_components = len(output_feature.components & input_feature.components)
+    all_components = len(output_feature.components | input_feature.components)
+    component_similarity = shared_components / all_components if all_components else 0.0
+    character_similarity = difflib.SequenceMatcher(None, output_feature.name, input_feature.name).ratio()
+    return max(component_similarity, character_similarity * 0.8)
+
+def get_type_compatibility(output_type, input_type):
+    '''Returns how well the output socket type converts into the input socket type, from 0 (can't be linked) to 1 (same type).'''
+    if output_type in UNLINKABLE_SOCKET_TYPES or input_type in UNLINKABLE_SOCKET_TYPES:
+        return 0.0
+    if output_type == input_type:
+        return 1.0
+    if output_type == 'SHADER' or input_type == 'SHADER':
+        return 0.0
+    return SOCKET_TYPE_COMPATIBILITY.get((output_type, input_type), 0.0)
+
+def score_socket_pair(output_feature, input_feature):
+    '''Returns the score for linking the output socket into the input socket, or None if they can't (or shouldn't) be linked.'''
+    type_compatibility = get_type_compatibility(output_feature.type, input_feature.type)
+    if type_compatibility == 0.0:
+        return None
+
+    channel_score = 0.0
+    if output_feature.channel and input_feature.channel:
+        channel_score = 1.0 if output_feature.channel == input_feature.channel else -0.5
+    elif output_feature.type == 'VALUE' and input_feature.type == 'VALUE' and not output_feature.channel:
+        channel_score = SCALAR_CHANNEL_FALLBACK_SCORES.get(input_feature.channel, 0.0)
+
+    # Pairs need a similar name or a matching material channel to be linked, shaders only need to link into a shader input.
+    # Names less similar than the minimum don't add to the score, so they can't outweigh the channel score.
+    name_similarity = get_name_similarity(output_feature, input_feature)
+    if name_similarity < MIN_NAME_SIMILARITY:
+        if channel_score <= 0.0 and output_feature.type != 'SHADER':
+            return None
+        name_similarity = 0.0
+    return NAME_WEIGHT * name_similarity + CHANNEL_WEIGHT * channel_score + TYPE_WEIGHT * type_compatibility
+
+def solve_assignment(costs):
+    '''Solves the assignment problem for a cost matrix (list of rows, with no more rows than columns) with the Hungarian method in O(rows² * columns).
+    Returns the column assigned to each row.'''
+    row_count = len(costs)
+    column_count = len(costs[0]) if costs else 0
+    infinity = float('inf')
+
+    # Potentials for rows (u) and columns (v), and the row assigned to each column (1-based, 0 = unassigned).
+    u = [0.0] * (row_count + 1)
+    v = [0.0] * (column_count + 1)
+    column_rows = [0] * (column_count + 1)
+    way = [0] * (column_count + 1)
+    for row in range(1, row_count + 1):
+        column_rows[0] = row
+        current_column = 0
+        min_values = [infinity] * (column_count + 1)
+        used = [False] * (column_count + 1)
+        while True:
+            used[current_column] = True
+            current_row = column_rows[current_column]
+            delta = infinity
+            next_column = 0
+            for column in range(1, column_count + 1):
+                if used[column]:
+                    continue
+                reduced_cost = costs[current_row - 1][column - 1] - u[current_row] - v[column]
+                if reduced_cost < min_values[column]:
+                    min_values[column] = reduced_cost
+                    way[column] = current_column
+                if min_values[column] < delta:
+                    delta = min_values[column]
+                    next_column = column
+            for column in range(0, column_count + 1):
+                if used[column]:
+                    u[column_rows[column]] += delta
+                    v[column] -= delta
+                else:
+                    min_values[column] -= delta
+            current_column = next_column
+            if column_rows[current_column] == 0:
+                break
+
+        # Flip the augmenting path.
+        while current_column:
+            previous_column = way[current_column]
+            column_rows[current_column] = column_rows[previous_column]
+            current_column = previous_column
+
+    row_columns = [-1] * row_count
+    for column in range(1, column_count + 1):
+        if column_rows[column]:
+            row_columns[column_rows[column] - 1] = column - 1
+    return row_columns
+
+def match_sockets(output_features, input_features, min_score=MIN_LINK_SCORE):
+    '''Returns the optimal (output index, input index, score) links between the output and input sockets, where each socket is linked at most once
+    and the total score is the highest possible. Pairs that can't be linked or score below the minimum score aren't returned.'''
+    if not output_features or not input_features:
+        return []
+
+    scores = [[score_socket_pair(output_feature, input_feature) for input_feature in input_features] for output_feature in output_features]
+
+    # The Hungarian method minimizes cost over rows, so the smaller side is used as rows.
+    transposed = len(output_features) > len(input_features)
+    if transposed:
+        scores = [list(column) for column in zip(*scores)]
+    # Only the score above the minimum counts, so pairs that can't be linked (or score below the minimum) cost nothing and never take a socket
+    # from a better pair just to increase how many pairs are linked.
+    costs = [[-(score - min_score) if score != None and score >= min_score else 0.0 for score in row] for row in scores]
+
+    links = []
+    for row, column in enumerate(solve_assignment(costs)):
+        score = scores[row][column]
+        if score == None or score < min_score:
+            continue
+        output_position, input_position = (column, row) if transposed else (row, column)
+        links.append((output_features[output_position].index, input_features[input_position].index, score))
+    return links
+
+def get_node_signature(node):
+    '''Returns the (output features, input features) of the nodes linkable sockets, cached by node type and socket layout.
+    Disabled and hidden sockets aren't included, linked inputs are filtered out when matching.'''
+    node_group_name = node.node_tree.name if node.type == 'GROUP' and node.node_tree else ""
+    outputs = [(i, socket.name, socket.type) for i, socket in enumerate(node.outputs) if socket.enabled and not socket.hide]
+    inputs = [(i, socket.name, socket.type) for i, socket in enumerate(node.inputs) if socket.enabled and not socket.hide]
+    cache_key = (node.bl_idname, node_group_name, tuple(outputs), tuple(inputs))
+    signature = _socket_signatures.get(cache_key)
+    if signature == None:
+        signature = (
+            tuple(get_socket_feature(*output) for output in outputs),
+            tuple(get_socket_feature(*socket_input) for socket_input in inputs)
+        )
+        _socket_signatures[cache_key] = signature
+    return signature
+
+def link_nodes(node_tree, from_node, to_node, min_score=MIN_LINK_SCORE):
+    '''Links the outputs of the from node into the unlinked inputs of the to node with the best socket matches. Returns the number of created links.'''
+    output_features = get_node_signature(from_node)[0]
+    input_features = [input_feature for input_feature in get_node_signature(to_node)[1] if not to_node.inputs[input_feature.index].is_linked]
+    links = match_sockets(output_features, input_features, min_score)
+    for output_index, input_index, score in links:
+        node_tree.links.new(from_node.outputs[output_index], to_node.inputs[input_index])
+    return len(links)
+
+def link_node_chain(node_tree, nodes, min_score=MIN_LINK_SCORE):
+    '''Links the nodes in a chain from left to right (by node location), each node into the next. Returns the number of created links.'''
+    ordered_nodes = sorted(nodes, key=lambda node: (node.location.x, -node.location.y))
+    return sum(link_nodes(node_tree, from_node, to_node, min_score) for from_node, to_node in zip(ordered_nodes, ordered_nodes[1:]))
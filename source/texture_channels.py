@@ -0,0 +1,198 @@
+# This file contains functions to identify material channels from image file names.
+# It doesn't depend on Blender so file names can be classified in bulk (and tested) outside of operators.
+
+import os
+import re
+
+# Dictionary of words / tags that may be in image texture names that could be used to identify material channels from image file names.
+MATERIAL_CHANNEL_TAGS = {
+    "color": 'BASE_COLOR',
+    "colour": 'BASE_COLOR',
+    "couleur": 'BASE_COLOR',
+    "diffuse": 'BASE_COLOR',
+    "diff": 'BASE_COLOR',
+    "dif": 'BASE_COLOR',
+    "subsurface": 'SUBSURFACE',
+    "subsurf": 'SUBSURFACE',
+    "ss": 'SUBSURFACE',
+    "metallic": 'METALLIC',
+    "metalness": 'METALLIC',
+    "metal": 'METALLIC',
+    "métalique": 'METALLIC',
+    "metalique": 'METALLIC',
+    "specular": 'SPECULAR',
+    "specularité": 'SPECULAR',
+    "specularite": 'SPECULAR',
+    "spec": 'SPECULAR',
+    "roughness": 'ROUGHNESS',
+    "rough": 'ROUGHNESS',
+    "rugosité": 'ROUGHNESS',
+    "rugosite": 'ROUGHNESS',
+    "emission": 'EMISSION',
+    "émission": 'EMISSION',
+    "emit": 'EMISSION',
+    "normal": 'NORMAL',
+    "normals": 'NORMAL',
+    "normale": 'NORMAL',
+    "nor": 'NORMAL',
+    "ngl": 'NORMAL',
+    "ndx": 'NORMAL',
+    "height": 'HEIGHT',
+    "hauteur": 'HEIGHT',
+    "bump": 'HEIGHT',
+    "opacity": 'ALPHA',
+    "opaque": 'ALPHA',
+    "alpha": 'ALPHA',
+    "ao": 'AMBIENT_OCCLUSION',
+    "occlusion": 'AMBIENT_OCCLUSION',
+    "ambient": 'AMBIENT_OCCLUSION',
+
+    # RGB channel packing...
+    "orm": 'CHANNEL_PACKED',
+    "rmo": 'CHANNEL_PACKED',
+
+    # RGBA channel packing, 'X' is used to identify when nothing is packed into a channel.
+    "moxs": 'CHANNEL_PACKED',
+
+    # Naming conventions such as 'MyTextureName_RoughnessMetallic' can't be imported automatically
+    # because it's ambiguous for which RGBA channel the values are intended to go into.
+}
+
+# https://docs.unrealengine.com/4.27/en-US/ProductionPipelines/AssetNaming/
+# With an identifiable material channel format, such as the one used commonly in game engines (T_MyTexture_C_1),
+# we can identify material channels using only the first few letters.
+MATERIAL_CHANNEL_ABBREVIATIONS = {
+    "c": 'BASE_COLOR',
+    "m": 'METALLIC',
+    "r": 'ROUGHNESS',
+    "n": 'NORMAL',
+    "ngl": 'NORMAL',
+    "ndx": 'NORMAL',
+    "h": 'HEIGHT',
+    "b": 'HEIGHT',
+    "s": 'SPECULAR',
+    "ss": 'SUBSURFACE',
+    "a": 'ALPHA',
+    "cc": 'COAT',
+    "e": 'EMISSION',
+    "o": 'AMBIENT_OCCLUSION',
+    "ao": 'AMBIENT_OCCLUSION'
+}
+
+# RGBA channel names in the order they appear in channel packed formats (i.e 'orm' = R: Occlusion, G: Roughness, B: Metallic).
+RGBA_CHANNELS = ('RED', 'GREEN', 'BLUE', 'ALPHA')
+
+# Compiled patterns used to split file names into lowercase components in a single pass.
+# Patterns splitting camel case (i.e 'RoughMetal' = ' Rough Metal') and common separators in file names.
+# Only ASCII capitals start a new component, so accented capitals (i.e 'RUGOSITÉ') stay part of the component they're in.
+UPPERCASE_RUN_PATTERN = re.compile(r'([A-Z]+)')
+CAMEL_CASE_PATTERN = re.compile(r'([A-Z][a-z]+)')
+SEPARATOR_PATTERN = re.compile(r'[_.\-#]')
+
+def split_filename_by_components(filename):
+    '''Splits the file name into lowercase components (i.e 'RoughMetal_002_2k_Color.png' = ['rough', 'metal', 'k', 'color']).'''
+
+    # Remove the file extension and numbers (numbers can't be used to identify a material channel from the texture name).
+    filename = ''.join(character for character in os.path.splitext(filename)[0] if not character.isdigit())
+
+    # Separate camel case and common separators (_ . - #) by a space.
+    filename = SEPARATOR_PATTERN.sub(' ', CAMEL_CASE_PATTERN.sub(r' \1', UPPERCASE_RUN_PATTERN.sub(r' \1', filename)))
+
+    # Return all components split by a space with lowercase characters.
+    return [component.lower() for component in filename.split(' ') if component != '']
+
+def get_channel_packed_layout(packed_format):
+    '''Returns the channel packed layout for the provided format (i.e 'orm') as a tuple of (material channel, rgba channel, invert) entries.'''
+    packed_layout = []
+    for i, abbreviation in enumerate(packed_format[:len(RGBA_CHANNELS)]):
+        packed_channel = MATERIAL_CHANNEL_ABBREVIATIONS.get(abbreviation)
+
+        # 'X' is used to identify when nothing is packed into a channel.
+        if not packed_channel:
+            continue
+
+        # The material channel abbreviated with 'S' in packed formats is more likely 'Smoothness', instead of 'Specular'.
+        # Swap the packed channel to Roughness and mark it to be inverted to convert the smoothness into roughness.
+        invert = False
+        if packed_channel == 'SPECULAR':
+            packed_channel = 'ROUGHNESS'
+            invert = True
+
+        packed_layout.append((packed_channel, RGBA_CHANNELS[i], invert))
+    return tuple(packed_layout)
+
+def get_game_engine_channel(filename):
+    '''Returns the material channel for file names using the common Unreal Engine / game engine naming convention (T_MyTexture_C_1), or 'NONE'.'''
+    name_components = filename.split('.')[0].split('_')
+    if len(name_components) < 3:
+        return 'NONE'
+    return MATERIAL_CHANNEL_ABBREVIATIONS.get(name_components[2].lower(), 'NONE')
+
+def detect_material_channel(channel_tags, material_channel_occurance):
+    '''Returns the material channel the provided channel tags most likely identify, based on how often each channel occurs accross all classified files.'''
+
+    # Start by assuming the correct material channel is the one that appears the least in the file name.
+    # I.E: Selected files: RoughMetal_002_2k_Color, RoughMetal_002_2k_Normal, RoughMetal_002_2k_Metallic, RoughMetal_002_2k_Rough
+    # For the first file in the above example, the correct material channel would be color,
+    # because 'metallic' appears more than once accross all user selected image files.
+    detected_material_channel = channel_tags[0]
+    material_channel_occurances_equal = True
+    for material_channel_name in channel_tags:
+        if material_channel_occurance[material_channel_name] < material_channel_occurance[detected_material_channel]:
+            detected_material_channel = material_channel_name
+            material_channel_occurances_equal = False
+
+    # If all material channels identified in the files name occur equally throughout all selected filenames,
+    # use the material channel that occurs the most in the files name.
+    # I.E: Selected files: RoughMetal_002_2k_Color, RoughMetal_002_2k_Normal, RoughMetal_002_2k_Metallic, RoughMetal_002_2k_Rough
+    # For the third file in the above example, the correct material channel is 'metallic' because that tag appears twice in the name.
+    if material_channel_occurances_equal:
+        for material_channel_name in channel_tags:
+            if material_channel_occurance[material_channel_name] > material_channel_occurance[detected_material_channel]:
+                detected_material_channel = material_channel_name
+
+    return detected_material_channel
+
+def classify(filenames):
+    '''Identifies the material channel for each of the provided file names, as a list of (material channel, packed layout) tuples.
+    
+    Files are classified together because tags shared by every file in a texture set (i.e 'RoughMetal') identify the set rather than a material channel.
+    The material channel is 'NONE' when it can't be identified, and the packed layout is None for images that aren't channel packed.'''
+
+    # Split each file name into material channel tags only once.
+    filenames = list(filenames)
+    file_channel_tags = []
+    for filename in filenames:
+        tags = split_filename_by_components(filename)
+        file_channel_tags.append([(tag, MATERIAL_CHANNEL_TAGS[tag]) for tag in tags if tag in MATERIAL_CHANNEL_TAGS])
+
+    # Calculate how many times each material channel tag appears accross all provided file names.
+    material_channel_occurance = {}
+    for channel_tags in file_channel_tags:
+        for tag, material_channel in channel_tags:
+            material_channel_occurance[material_channel] = material_channel_occurance.get(material_channel, 0) + 1
+
+    classified_files = []
+    for filename, channel_tags in zip(filenames, file_channel_tags):
+
+        # If the image file starts with a 'T_' assume it's using a commonly used Unreal Engine / game engine naming convention.
+        if filename.startswith('T_'):
+            classified_files.append((get_game_engine_channel(filename), None))
+            continue
+
+        # Don't classify files that have no material channel tag detected in their file name.
+        if not channel_tags:
+            classified_files.append(('NONE', None))
+            continue
+
+        detected_material_channel = detect_material_channel([material_channel for tag, material_channel in channel_tags], material_channel_occurance)
+
+        # To support proper importing of channel packed images, list all material channels that are packed into this image.
+        packed_layout = None
+        if detected_material_channel == 'CHANNEL_PACKED':
+            packed_format = next(tag for tag, material_channel in channel_tags if material_channel == 'CHANNEL_PACKED')
+            packed_layout = get_channel_packed_layout(packed_format)
+
+        classified_files.append((detected_material_channel, packed_layout))
+
+    return classified_files
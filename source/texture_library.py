@@ -0,0 +1,170 @@
+# This file contains functions to index texture libraries on disk, so whole texture sets can be picked and imported without parsing file names at import time.
+# The index is saved as JSON lines (one image per line) and rescans only re-classify texture sets containing new or changed files.
+
+import os
+import re
+import json
+from .texture_channels import MATERIAL_CHANNEL_TAGS, MATERIAL_CHANNEL_ABBREVIATIONS, split_filename_by_components, classify
+
+# Image file extensions indexed in texture libraries (matches the file filter used when importing texture sets).
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.tif', '.tiff', '.bmp', '.exr'}
+
+# Pattern used to find the separated segments of a file name (i.e 'RoughMetal_002_2k_Color' = 'RoughMetal', '002', '2k', 'Color').
+SEGMENT_PATTERN = re.compile(r'[^\s_.\-#]+')
+
+# Loaded indexes and their grouped texture sets, cached by index file path so the user interface can read texture sets without touching the disk.
+_loaded_indexes = {}
+_loaded_texture_sets = {}
+
+def get_texture_set_name(filename):
+    '''Returns the name of the texture set the image belongs to, which is the file name without the segment identifying its material channel (i.e 'RoughMetal_002_2k_Color.png' = 'RoughMetal_002_2k').'''
+    stem = os.path.splitext(filename)[0]
+    segments = list(SEGMENT_PATTERN.finditer(stem))
+
+    # Files using the Unreal Engine / game engine naming convention (T_MyTexture_C_1) identify the material channel with the third segment.
+    channel_segment = None
+    if stem.startswith('T_') and len(segments) >= 3:
+        if segments[2].group().lower() in MATERIAL_CHANNEL_ABBREVIATIONS:
+            channel_segment = segments[2]
+
+    # For all other files, remove the last segment containing a material channel tag.
+    else:
+        for segment in reversed(segments):
+            if any(component in MATERIAL_CHANNEL_TAGS for component in split_filename_by_components(segment.group())):
+                channel_segment = segment
+                break
+
+    if not channel_segment:
+        return stem
+
+    texture_set_name = "{0}{1}".format(stem[:channel_segment.start()].rstrip(" _.-#"), stem[channel_segment.end():])
+    return texture_set_name or stem
+
+def load_index(index_path):
+    '''Returns the texture library index saved at the provided path as a dictionary of entries keyed by image path.'''
+    index = {}
+    if os.path.isfile(index_path):
+        with open(index_path, 'r', encoding='utf-8') as index_file:
+            for line in index_file:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if entry['packed_layout'] != None:
+                    entry['packed_layout'] = tuple(tuple(packed_channel) for packed_channel in entry['packed_layout'])
+                index[entry['path']] = entry
+
+    _loaded_indexes[index_path] = index
+    _loaded_texture_sets.pop(index_path, None)
+    return index
+
+def save_index(index_path, index):
+    '''Saves the texture library index to the provided path as JSON lines.'''
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+
+    # Write to a temporary file first so an interrupted save doesn't corrupt the existing index.
+    temporary_path = index_path + ".tmp"
+    with open(temporary_path, 'w', encoding='utf-8') as index_file:
+        for entry in index.values():
+            index_file.write(json.dumps(entry, ensure_ascii=False))
+            index_file.write('\n')
+    os.replace(temporary_path, index_path)
+
+    _loaded_indexes[index_path] = index
+    _loaded_texture_sets.pop(index_path, None)
+
+def get_index(index_path):
+    '''Returns the cached texture library index for the provided path, loading it from disk if it's not loaded yet.'''
+    index = _loaded_indexes.get(index_path)
+    if index == None:
+        index = load_index(index_path)
+    return index
+
+def scan_image_files(folder_path):
+    '''Yields (path, size, mtime) for all image files in the provided folder and its sub-folders.'''
+    folders = [folder_path]
+    while folders:
+        try:
+            entries = os.scandir(folders.pop())
+        except OSError:
+            continue
+
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        folders.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+                        stat = entry.stat()
+                        yield entry.path, stat.st_size, stat.st_mtime
+                except OSError:
+                    continue
+
+def scan_folder(folder_path, index):
+    '''Incrementally updates the texture library index with images in the provided folder.
+    Only texture sets containing new, changed or removed images are re-classified. Returns the number of re-classified and removed images.'''
+    folder_path = os.path.abspath(folder_path)
+    scanned_paths = set()
+    changed_texture_sets = set()
+    new_files = {}
+
+    for path, size, mtime in scan_image_files(folder_path):
+        scanned_paths.add(path)
+        entry = index.get(path)
+        if entry and entry['size'] == size and entry['mtime'] == mtime:
+            continue
+
+        texture_set = os.path.join(os.path.dirname(path), get_texture_set_name(os.path.basename(path)))
+        new_files[path] = (size, mtime, texture_set)
+        changed_texture_sets.add(texture_set)
+        if entry:
+            changed_texture_sets.add(entry['texture_set'])
+
+    # Remove images that no longer exist in the scanned folder.
+    folder_prefix = os.path.join(folder_path, '')
+    removed_paths = [path for path in index if path.startswith(folder_prefix) and path not in scanned_paths]
+    for path in removed_paths:
+        changed_texture_sets.add(index.pop(path)['texture_set'])
+
+    if not changed_texture_sets:
+        return 0
+
+    # Texture sets grouped from this index are out of date (i.e they may list a texture set whose images were all removed).
+    for index_path, loaded_index in _loaded_indexes.items():
+        if loaded_index is index:
+            _loaded_texture_sets.pop(index_path, None)
+
+    # Group all images (unchanged and changed) of texture sets that need to be re-classified.
+    texture_set_files = {texture_set: [] for texture_set in changed_texture_sets}
+    for path, entry in index.items():
+        if path not in new_files and entry['texture_set'] in texture_set_files:
+            texture_set_files[entry['texture_set']].append((path, entry['size'], entry['mtime']))
+    for path, (size, mtime, texture_set) in new_files.items():
+        texture_set_files[texture_set].append((path, size, mtime))
+
+    # Material channels are identified per texture set, because tags shared by every image in a set identify the set rather than a material channel.
+    reclassified_count = 0
+    for texture_set, files in texture_set_files.items():
+        classified_files = classify([os.path.basename(path) for path, size, mtime in files])
+        for (path, size, mtime), (material_channel, packed_layout) in zip(files, classified_files):
+            index[path] = {
+                'path': path,
+                'size': size,
+                'mtime': mtime,
+                'channel': material_channel,
+                'packed_layout': packed_layout,
+                'texture_set': texture_set
+            }
+        reclassified_count += len(files)
+
+    return reclassified_count + len(removed_paths)
+
+def get_texture_sets(index_path):
+    '''Returns a dictionary of texture set names to the list of indexed images in the set with an identified material channel.'''
+    texture_sets = _loaded_texture_sets.get(index_path)
+    if texture_sets == None:
+        texture_sets = {}
+        for entry in get_index(index_path).values():
+            if entry['channel'] != 'NONE':
+                texture_sets.setdefault(entry['texture_set'], []).append(entry)
+        _loaded_texture_sets[index_path] = texture_sets
+    return texture_sets
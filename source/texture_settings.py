@@ -3,8 +3,11 @@
 import os
 import bpy
 from bpy.types import PropertyGroup, Operator
-from bpy.props import BoolProperty, StringProperty, EnumProperty
+from bpy.props import BoolProperty, StringProperty, EnumProperty, IntProperty
 from ..source import debug_logging
+from ..source import texture_library
+from ..source import image_utils
+import hashlib
 
 # Standard texture resolutions used for textures.
 STANDARD_TEXTURE_RESOLUTIONS = [
@@ -24,6 +27,39 @@ SHADER_NODES = [
     ("GROUP_NODE", "Group Node", "Use a group node as the shader node.")
 ]
 
+# Modes for stacking layers in materials.
+LAYER_STACK_MODES = [
+    ("MIX_SHADER", "Mix Shader", "Mix each new layer with the previous layers using a Mix Shader."),
+    ("CHANNEL", "Channel", "Blend each material channel (color, roughness, normal...) of new layers separately into a single Principled BSDF. This results in far fewer shader closures and faster shader compiles for materials with many layers.")
+]
+
+# Modes for adding node groups from the asset library.
+ASSET_LIBRARY_MODES = [
+    ("APPEND", "Append", "Append full copies of all node groups into the blend file."),
+    ("LINK", "Link", "Link read-only inner node groups (masks, projections) from the asset library and only make the editable layer node group local. This results in smaller blend files that save and open faster.")
+]
+
+# File formats textures can be exported to.
+EXPORT_FILE_FORMATS = [
+    ("PNG", "PNG", "Export textures as PNG images (8 or 16 bit)."),
+    ("OPEN_EXR", "OpenEXR", "Export textures as OpenEXR images (16 or 32 bit float).")
+]
+
+# Bit depths textures can be exported with. Bit depths a file format doesn't support are clamped to the closest supported bit depth.
+EXPORT_BIT_DEPTHS = [
+    ("8", "8", "8 bits per channel (PNG only)."),
+    ("16", "16", "16 bits per channel."),
+    ("32", "32", "32 bit float per channel (OpenEXR only).")
+]
+
+# Channel packed formats textures can be exported with, named by the abbreviation of the material channel packed into each RGBA channel.
+EXPORT_PACKED_FORMATS = [
+    ("NONE", "None", "Export each material channel to its own texture."),
+    ("ORM", "ORM", "Pack occlusion, roughness and metallic into the red, green and blue channels of one texture."),
+    ("RMO", "RMO", "Pack roughness, metallic and occlusion into the red, green and blue channels of one texture."),
+    ("MOXS", "MOXS", "Pack metallic, occlusion and smoothness into the red, green and alpha channels of one texture.")
+]
+
 def update_match_image_resolution(self, context):
     texture_set_settings = context.scene.rywrangler_texture_settings
     if texture_set_settings.match_image_resolution:
@@ -54,6 +90,8 @@ def get_texture_width():
             return 2048
         case 'FOUR_K':
             return 4096
+        case 'EIGHT_K':
+            return 8192
         case _:
             return 10
 
@@ -76,9 +114,47 @@ def get_texture_height():
             return 2048
         case 'FOUR_K':
             return 4096
+        case 'EIGHT_K':
+            return 8192
         case _:
             return 10
 
+def get_raw_image_folder():
+    '''Returns the absolute path of the folder raw images are saved to. By default this is a 'Raw Textures' folder next to the blend file,
+    returns an empty string if the default is used and the blend file isn't saved.'''
+    raw_image_folder = bpy.context.scene.rywrangler_texture_settings.raw_image_folder
+    if raw_image_folder and raw_image_folder != "Default":
+        return os.path.normpath(bpy.path.abspath(raw_image_folder))
+    if not bpy.data.filepath:
+        return ""
+    return os.path.join(os.path.dirname(bpy.data.filepath), "Raw Textures")
+
+def get_texture_library_index_path(library_folder):
+    '''Returns the path to the index file for the provided texture library folder, stored in Blender's user config folder.'''
+    folder_hash = hashlib.sha1(os.path.normcase(os.path.abspath(library_folder)).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(bpy.utils.user_resource('CONFIG', path="rywrangler"), "texture_library_{0}.jsonl".format(folder_hash))
+
+# Blender requires enum items returned from callbacks to be referenced in Python, otherwise their names can become corrupted.
+_texture_library_set_items = []
+_texture_library_sets = None
+
+def get_texture_library_set_items(self, context):
+    '''Returns enum items for all texture sets in the index of the texture library folder.'''
+    global _texture_library_set_items, _texture_library_sets
+    library_folder = bpy.path.abspath(self.texture_library_folder)
+    if not library_folder:
+        return []
+
+    # Only rebuild the enum items when the texture sets were re-indexed.
+    texture_sets = texture_library.get_texture_sets(get_texture_library_index_path(library_folder))
+    if texture_sets is not _texture_library_sets:
+        _texture_library_sets = texture_sets
+        _texture_library_set_items = [
+            (texture_set, os.path.relpath(texture_set, library_folder), "{0} images".format(len(texture_sets[texture_set])))
+            for texture_set in sorted(texture_sets)
+        ]
+    return _texture_library_set_items
+
 class RYWRANGLER_texture_settings(PropertyGroup):
     '''Settings for textures.'''
     raw_image_folder: StringProperty(
@@ -116,6 +192,82 @@ class RYWRANGLER_texture_settings(PropertyGroup):
         update=update_match_image_resolution
     )
 
+    texture_library_folder: StringProperty(
+        name="Texture Library Folder",
+        description="The path to a folder of texture sets. Scanning the folder indexes all images in it, so texture sets can be imported without selecting files",
+        default="",
+        subtype='DIR_PATH'
+    )
+
+    texture_library_set: EnumProperty(
+        items=get_texture_library_set_items,
+        name="Texture Set",
+        description="The indexed texture set to import from the texture library folder"
+    )
+
+    layer_stack_mode: EnumProperty(
+        items=LAYER_STACK_MODES,
+        name="Layer Stack Mode",
+        description="How new layers are stacked with existing layers in the material",
+        default='MIX_SHADER'
+    )
+
+    asset_library_mode: EnumProperty(
+        items=ASSET_LIBRARY_MODES,
+        name="Asset Library Mode",
+        description="How node groups from the asset library are added to blend files",
+        default='APPEND'
+    )
+
+    asset_library_path: StringProperty(
+        name="Asset Library",
+        description="Path to a central asset library blend file shared by the project. When blank, the asset file included with this add-on is used. Linking node groups from a shared location keeps blend files portable between machines",
+        default="",
+        subtype='FILE_PATH'
+    )
+
+    preload_assets: BoolProperty(
+        name="Preload Assets",
+        description="When toggled on, all node groups in this add-ons asset file are appended the first time any of them is used, so later layers and masks are added without loading the asset file again. Not used in link mode, where node groups are linked instead",
+        default=False
+    )
+
+    export_folder: StringProperty(
+        name="Export Folder",
+        description="The folder exported textures are saved to",
+        default="",
+        subtype='DIR_PATH'
+    )
+
+    export_file_format: EnumProperty(
+        items=EXPORT_FILE_FORMATS,
+        name="Export File Format",
+        description="The file format textures are exported with",
+        default='PNG'
+    )
+
+    export_bit_depth: EnumProperty(
+        items=EXPORT_BIT_DEPTHS,
+        name="Export Bit Depth",
+        description="The bit depth textures are exported with",
+        default='8'
+    )
+
+    export_packed_format: EnumProperty(
+        items=EXPORT_PACKED_FORMATS,
+        name="Export Packed Format",
+        description="Channel packed format textures are exported with. Packing single channel textures into one texture reduces the number of texture samplers and texture memory used by game engines",
+        default='NONE'
+    )
+
+    export_workers: IntProperty(
+        name="Export Workers",
+        description="Number of background Blender processes material channels are baked in at the same time, 0 uses one worker per processor core. Each worker uses an equal share of the processor threads",
+        default=0,
+        min=0,
+        max=64
+    )
+
     thirty_two_bit: BoolProperty(
         name="32 Bit Color", 
         description="If on, images created using this add-on will be created with 32 bit color depth. 32-bit images will take up more memory, but will have significantly less color banding in gradients", 
@@ -139,7 +291,7 @@ class RYWRANGLER_OT_set_raw_texture_folder(Operator):
         if not os.path.isdir(self.directory):
             debug_logging.log_status("Invalid directory.", self, type='INFO')
         else:
-            context.scene.RYWRANGLER_raw_textures_folder = self.directory
+            context.scene.rywrangler_texture_settings.raw_image_folder = self.directory
             debug_logging.log_status("Raw texture folder set to: {0}".format(self.directory), self, type='INFO')
         return {'FINISHED'}
 
@@ -158,5 +310,5 @@ class RYWRANGLER_OT_open_raw_texture_folder(Operator):
         return context.active_object
 
     def execute(self, context):
-        raw_textures_folder = context.scene.RYWRANGLER_raw_textures_folder
+        image_utils.open_folder(get_raw_image_folder(), self)
         return {'FINISHED'}
\ No newline at end of file
@@ -1,6 +1,12 @@
 # This file contains the user interface for this add-on.
 
 import bpy
+from .operators import is_shared_node_group
+from ..source import shader_analysis
+from ..source import profiling
+
+# Number of operations shown in the performance section, the slowest operations are shown first.
+PERFORMANCE_ROW_COUNT = 12
 
 class RYWRANGLER_MT_pie_menu(bpy.types.Menu):
     bl_idname = "RYWRANGLER_MT_pie_menu"
@@ -15,6 +21,7 @@ class RYWRANGLER_MT_pie_menu(bpy.types.Menu):
         row.scale_y = 2.0
         row.operator("rywrangler.add_grunge", text="", icon='FORCE_TURBULENCE')
         row.operator("rywrangler.add_edge_wear", text="", icon='EDGESEL')
+        row.operator("rywrangler.bake_masks", text="", icon='RENDER_STILL')
         
         # Layers
         row = pie.row(align=True)
@@ -24,6 +31,7 @@ class RYWRANGLER_MT_pie_menu(bpy.types.Menu):
         row.operator("rywrangler.add_uv_layer", text="", icon='UV')
         row.operator("rywrangler.add_decal_layer", text="", icon='STICKY_UVS_DISABLE')
         row.operator("rywrangler.add_triplanar_layer", text="", icon='FILE_3D')
+        row.operator("rywrangler.bake_triplanar_layers", text="", icon='UV_DATA')
 
         pie.operator("rywrangler.auto_link_nodes", text="Auto-Link")
         pie.operator("rywrangler.isolate_node", text="Isolate")
@@ -65,6 +73,14 @@ class RYWRANGLER_PT_side_panel(bpy.types.Panel):
     def draw(self, context):
         layout = self.layout
 
+        # Warn when editing inside a node group shared by multiple layers, since edits apply to all of them.
+        edit_tree = context.space_data.edit_tree
+        if len(context.space_data.path) > 1 and is_shared_node_group(edit_tree):
+            row = layout.row()
+            row.alert = True
+            row.label(text="Editing a shared layer", icon='ERROR')
+            row.operator("rywrangler.make_layer_unique", text="Make Unique")
+
         split = layout.split(factor=0.25)
         first_column = split.column()
         second_column = split.column()
@@ -101,7 +117,118 @@ class RYWRANGLER_PT_side_panel(bpy.types.Panel):
         else:
             row.prop(texture_settings, "thirty_two_bit", text="False", toggle=True)
 
+        row = first_column.row()
+        row.label(text="Layers: ")
+        row = second_column.row(align=True)
+        row.prop(texture_settings, "layer_stack_mode", text="")
+        row.operator("rywrangler.rebuild_layer_stack", text="", icon="FILE_REFRESH")
+
+        row = first_column.row()
+        row.label(text="Assets: ")
+        row = second_column.row(align=True)
+        row.prop(texture_settings, "asset_library_mode", text="")
+        row.operator("rywrangler.relink_assets", text="", icon="LINKED")
+        row.operator("rywrangler.localize_assets", text="", icon="UNLINKED")
+        row.operator("rywrangler.deduplicate_node_groups", text="", icon="DUPLICATE")
+        row = first_column.row()
+        row.label(text="")
+        row = second_column.row()
+        row.prop(texture_settings, "asset_library_path", text="")
+
+        row = first_column.row()
+        row.label(text="Preload: ")
+        row = second_column.row()
+        row.prop(texture_settings, "preload_assets", text="Preload Assets", toggle=True)
+
         row = layout.row(align=True)
         row.prop(texture_settings, "raw_image_folder", text="")
         row.operator("rywrangler.set_raw_texture_folder", text="", icon="FOLDER_REDIRECT")
         row.operator("rywrangler.open_raw_texture_folder", text="", icon="FILE_FOLDER")
+
+        # Texture Library
+        row = layout.row(align=True)
+        row.prop(texture_settings, "texture_library_folder", text="")
+        row.operator("rywrangler.scan_texture_library", text="", icon="FILE_REFRESH")
+        row = layout.row(align=True)
+        row.prop(texture_settings, "texture_library_set", text="")
+        row.operator("rywrangler.import_library_texture_set", text="", icon="IMPORT")
+
+        # Texture Export
+        row = layout.row(align=True)
+        row.prop(texture_settings, "export_folder", text="")
+        row.operator("rywrangler.export_textures", text="", icon="EXPORT")
+        row = layout.row(align=True)
+        row.prop(texture_settings, "export_file_format", text="")
+        row.prop(texture_settings, "export_bit_depth", text="")
+        row.prop(texture_settings, "export_workers", text="Workers")
+        row = layout.row(align=True)
+        row.prop(texture_settings, "export_packed_format", text="Packing")
+
+
+class RYWRANGLER_PT_shader_cost(bpy.types.Panel):
+    bl_label = "Shader Cost"
+    bl_idname = "RYWRANGLER_PT_shader_cost"
+    bl_space_type = 'NODE_EDITOR'
+    bl_region_type = 'UI'
+    bl_category = 'RyWrangler'
+    bl_parent_id = "RYWRANGLER_PT_shader_panel"
+    bl_options = {'DEFAULT_CLOSED'}
+
+    @classmethod
+    def poll(cls, context):
+        return context.object and context.object.active_material and context.object.active_material.use_nodes
+
+    def draw(self, context):
+        layout = self.layout
+        material_cost, layer_costs = shader_analysis.analyse_material(context.object.active_material)
+
+        column = layout.column(align=True)
+        column.label(text="Image Samples: {0}".format(material_cost['image_samples']))
+        column.label(text="Noise Evaluations: {0}".format(material_cost['noise_evaluations']))
+        column.label(text="Closures: {0}".format(material_cost['closures']))
+        column.label(text="Mix Depth: {0}".format(material_cost['mix_depth']))
+        column.label(text="Images: {0} ({1:.1f} MB)".format(len(material_cost['images']), sum(material_cost['images'].values()) / (1024 * 1024)))
+        layout.operator("rywrangler.optimize_material", icon="MODIFIER")
+
+        # Per layer breakdown, sorted by the most expensive layer first.
+        if layer_costs:
+            layout.separator()
+            column = layout.column(align=True)
+            for layer_name, layer_cost in layer_costs:
+                row = column.row()
+                row.label(text=layer_name)
+                row.label(text="{0} samples, {1} noise".format(layer_cost['image_samples'], layer_cost['noise_evaluations']))
+
+
+class RYWRANGLER_PT_performance(bpy.types.Panel):
+    bl_label = "Performance"
+    bl_idname = "RYWRANGLER_PT_performance"
+    bl_space_type = 'NODE_EDITOR'
+    bl_region_type = 'UI'
+    bl_category = 'RyWrangler'
+    bl_parent_id = "RYWRANGLER_PT_shader_panel"
+    bl_options = {'DEFAULT_CLOSED'}
+
+    def draw(self, context):
+        layout = self.layout
+
+        row = layout.row(align=True)
+        recording_trace = profiling.is_recording_trace()
+        row.operator("rywrangler.toggle_profiling_trace", text="Recording ({0})".format(profiling.get_trace_event_count()) if recording_trace else "Record Trace", icon="REC", depress=recording_trace)
+        row.operator("rywrangler.save_profiling_trace", text="", icon="EXPORT")
+        row.operator("rywrangler.clear_profiling_statistics", text="", icon="TRASH")
+
+        # Rolling timings of each operation, slowest first.
+        statistics = profiling.get_statistics()
+        if not statistics:
+            layout.label(text="No operations timed yet.")
+            return
+
+        column = layout.column(align=True)
+        row = column.row()
+        row.label(text="Operation")
+        row.label(text="p50 / p95 (ms)")
+        for name, sample_count, last_time, p50_time, p95_time in statistics[:PERFORMANCE_ROW_COUNT]:
+            row = column.row()
+            row.label(text=name)
+            row.label(text="{0:.1f} / {1:.1f} ({2})".format(p50_time, p95_time, sample_count))
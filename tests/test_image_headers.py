@@ -0,0 +1,39 @@
+# Tests for source/image_headers.py. Image headers are read without Blender, so these run with plain Python (python -m pytest tests).
+# The add-on package itself registers with Blender when imported, so its source modules are imported through a package that skips the add-on __init__.py.
+
+import os
+import sys
+import types
+import struct
+import importlib
+
+ADDON_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_PACKAGE_NAME = "rywrangler_tests_addon"
+
+if TEST_PACKAGE_NAME not in sys.modules:
+    test_package = types.ModuleType(TEST_PACKAGE_NAME)
+    test_package.__path__ = [ADDON_FOLDER]
+    sys.modules[TEST_PACKAGE_NAME] = test_package
+image_headers = importlib.import_module(TEST_PACKAGE_NAME + ".source.image_headers")
+
+# Image headers and the (width, height, channels, bit depth) they should be read as.
+IMAGE_HEADER_CASES = (
+    ("rgba.png", image_headers.PNG_SIGNATURE + struct.pack('>I4sIIBB', 13, b'IHDR', 640, 480, 16, 6) + bytes(7), (640, 480, 4, 16)),
+    ("grey.jpg", b'\xff\xd8' + b'\xff\xe0' + struct.pack('>H', 4) + bytes(2) + b'\xff\xc0' + struct.pack('>HBHHB', 11, 8, 300, 200, 1), (200, 300, 1, 8)),
+    ("rgb.bmp", b'BM' + bytes(16) + struct.pack('<iiHH', 64, -32, 1, 24), (64, 32, 3, 8)),
+    ("truncated.png", image_headers.PNG_SIGNATURE, None),
+    ("not_a_jpeg.jpg", b'not an image', None),
+    ("unsupported.gif", b'GIF89a', None)
+)
+
+def test_probe_image_headers(tmp_path):
+    '''Image headers are read from file headers, and files that can't be read return None.'''
+    image_paths = []
+    for filename, data, expected_header in IMAGE_HEADER_CASES:
+        (tmp_path / filename).write_bytes(data)
+        image_paths.append(str(tmp_path / filename))
+
+    headers = image_headers.probe_image_headers(image_paths + [str(tmp_path / "missing.png")])
+    for header, (filename, data, expected_header) in zip(headers, IMAGE_HEADER_CASES):
+        assert (tuple(header[1:]) if header else None) == expected_header, filename
+    assert headers[-1] == None
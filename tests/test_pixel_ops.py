@@ -0,0 +1,118 @@
+# Tests for source/pixel_ops.py. Pixel operations don't require Blender, so these run with plain Python (python -m pytest tests).
+# The add-on package itself registers with Blender when imported, so its source modules are imported through a package that skips the add-on __init__.py.
+
+import os
+import sys
+import types
+import importlib
+import numpy
+
+ADDON_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_PACKAGE_NAME = "rywrangler_tests_addon"
+
+if TEST_PACKAGE_NAME not in sys.modules:
+    test_package = types.ModuleType(TEST_PACKAGE_NAME)
+    test_package.__path__ = [ADDON_FOLDER]
+    sys.modules[TEST_PACKAGE_NAME] = test_package
+pixel_ops = importlib.import_module(TEST_PACKAGE_NAME + ".source.pixel_ops")
+
+# Resolution memory bounds are tested at, and the band size operations are limited to. Memory is bounded relative to the buffer size,
+# so small buffers with small bands test the same bound as 8K buffers with full size bands (a full 8K RGBA float buffer is 1 GiB).
+TEST_RESOLUTION = 1024
+TEST_BAND_BYTES = 1024 * 1024
+
+# Resolution image memory bounds are tested at, images are edited in bands through slices of Python floats, which is much slower than editing buffers.
+TEST_IMAGE_RESOLUTION = 256
+
+# Peak extra memory allowed, relative to the size of the pixel buffer, a full size copy would be a ratio of 1.
+MAX_EXTRA_MEMORY_RATIO = 0.25
+
+class FakeImagePixels():
+    '''Stands in for the pixels of a Blender image, which are read and written whole with foreach_get / foreach_set, or in parts through slices of Python floats.'''
+    def __init__(self, values):
+        self.values = values
+
+    def __getitem__(self, key):
+        return tuple(self.values[key].tolist())
+
+    def __setitem__(self, key, values):
+        self.values[key] = values
+
+    def foreach_get(self, values):
+        values[:] = self.values
+
+    def foreach_set(self, values):
+        self.values[:] = values
+
+class FakeImage():
+    '''Stands in for a Blender image.'''
+    def __init__(self, pixels):
+        height, width, self.channels = pixels.shape
+        self.size = (width, height)
+        self.pixels = FakeImagePixels(pixels.ravel())
+
+    def update(self):
+        pass
+
+def get_max_extra_memory(pixels):
+    '''Returns the peak extra memory allowed for operations on the pixel buffer.'''
+    return pixels.nbytes * MAX_EXTRA_MEMORY_RATIO
+
+def test_in_place_operations_have_bounded_peak_memory():
+    '''Invert, swizzle and pack must never allocate a full size copy of the pixel buffer.'''
+    pixels = numpy.zeros((TEST_RESOLUTION, TEST_RESOLUTION, 4), dtype=numpy.float32)
+    operations = {
+        'invert': (pixel_ops.invert_channels, (pixels, False, True), {}),
+        'swizzle': (pixel_ops.swizzle_channels, (pixels, ('GREEN', 'RED', 'BLUE', 'ALPHA')), {'band_bytes': TEST_BAND_BYTES}),
+        'pack': (pixel_ops.pack_channels, ((pixels[..., 0], pixels[..., 1], None, None), (0.0, 0.0, 0.0, 1.0), pixels), {})
+    }
+    for operation_name, (operation, arguments, keyword_arguments) in operations.items():
+        peak_memory = pixel_ops.get_peak_extra_memory(operation, *arguments, **keyword_arguments)
+        assert peak_memory < get_max_extra_memory(pixels), "{0} allocated {1:.1f} MiB".format(operation_name, peak_memory / (1024 * 1024))
+
+def test_image_operations_have_bounded_peak_memory():
+    '''Inverting and swizzling images reads and writes their pixels in bands, rather than copying all of their pixels.'''
+    pixels = numpy.zeros((TEST_IMAGE_RESOLUTION, TEST_IMAGE_RESOLUTION, 4), dtype=numpy.float32)
+    image = FakeImage(pixels)
+    for operation_name, operation, arguments in (('invert', pixel_ops.invert_image, (image, False, True)), ('swizzle', pixel_ops.swizzle_image, (image, ('GREEN', 'RED', 'BLUE', 'ALPHA')))):
+        peak_memory = pixel_ops.get_peak_extra_memory(operation, *arguments, band_bytes=pixels.nbytes // 16)
+        assert peak_memory < get_max_extra_memory(pixels), "{0} allocated {1:.1f} MiB".format(operation_name, peak_memory / (1024 * 1024))
+
+def test_image_bands_match_a_single_band():
+    '''Editing image pixels in bands gives the same result as editing all pixels at once.'''
+    pixels = numpy.random.default_rng(0).random((37, 19, 4), dtype=numpy.float32)
+    band_image = FakeImage(pixels.copy())
+    single_band_image = FakeImage(pixels.copy())
+    pixel_ops.swizzle_image(band_image, ('GREEN', 'RED', 'BLUE', 'ALPHA'), band_bytes=19 * 4 * pixel_ops.SLICE_VALUE_BYTES * 5)
+    pixel_ops.invert_image(band_image, invert_g=True, band_bytes=1)
+    pixel_ops.swizzle_image(single_band_image, ('GREEN', 'RED', 'BLUE', 'ALPHA'), band_bytes=1024 * 1024 * 1024)
+    pixel_ops.invert_image(single_band_image, invert_g=True, band_bytes=1024 * 1024 * 1024)
+    expected_pixels = pixels[..., [1, 0, 2, 3]]
+    expected_pixels[..., 1] = 1.0 - expected_pixels[..., 1]
+    assert numpy.allclose(band_image.pixels.values, expected_pixels.ravel())
+    assert numpy.array_equal(band_image.pixels.values, single_band_image.pixels.values)
+
+def test_swizzle_reorders_channels_across_bands():
+    '''Swizzling in bands smaller than the buffer gives the same result as reordering the whole buffer.'''
+    pixels = numpy.random.default_rng(0).random((37, 19, 4), dtype=numpy.float32)
+    expected_pixels = pixels[..., [1, 0, 2, 3]].copy()
+    pixel_ops.swizzle_channels(pixels, ('GREEN', 'RED', 'BLUE', 'ALPHA'), band_bytes=pixels[0].nbytes * 5)
+    assert numpy.array_equal(pixels, expected_pixels)
+
+def test_resample_has_bounded_peak_memory():
+    '''Resampling only allocates the resampled buffer and temporaries for one band of rows.'''
+    channel = numpy.zeros((TEST_RESOLUTION // 2, TEST_RESOLUTION // 2), dtype=numpy.float32)
+    resampled_bytes = TEST_RESOLUTION * TEST_RESOLUTION * 4
+    peak_memory = pixel_ops.get_peak_extra_memory(pixel_ops.resample_channel, channel, TEST_RESOLUTION, TEST_RESOLUTION, band_bytes=resampled_bytes // 8)
+    assert peak_memory < resampled_bytes * (1 + MAX_EXTRA_MEMORY_RATIO), "resample allocated {0:.1f} MiB".format(peak_memory / (1024 * 1024))
+
+def test_resample_bands_match_a_single_band():
+    '''Resampling in small bands gives the same result as resampling all rows at once, and keeps constant channels constant.'''
+    channel = numpy.random.default_rng(0).random((23, 41), dtype=numpy.float32)
+    single_band = pixel_ops.resample_channel(channel, 64, 30, band_bytes=1024 * 1024 * 1024)
+    small_bands = pixel_ops.resample_channel(channel, 64, 30, band_bytes=1)
+    assert single_band.shape == (64, 30)
+    assert numpy.array_equal(single_band, small_bands)
+
+    constant_channel = numpy.full((16, 16), 0.25, dtype=numpy.float32)
+    assert numpy.allclose(pixel_ops.resample_channel(constant_channel, 40, 7), 0.25)
@@ -0,0 +1,55 @@
+# Tests for source/profiling.py. Spans are timed without Blender, so these run with plain Python (python -m pytest tests).
+# The add-on package itself registers with Blender when imported, so its source modules are imported through a package that skips the add-on __init__.py.
+
+import os
+import json
+import sys
+import types
+import importlib
+
+ADDON_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_PACKAGE_NAME = "rywrangler_tests_addon"
+
+if TEST_PACKAGE_NAME not in sys.modules:
+    test_package = types.ModuleType(TEST_PACKAGE_NAME)
+    test_package.__path__ = [ADDON_FOLDER]
+    sys.modules[TEST_PACKAGE_NAME] = test_package
+profiling = importlib.import_module(TEST_PACKAGE_NAME + ".source.profiling")
+
+def test_get_percentile():
+    '''Percentiles use the nearest rank of the sorted values.'''
+    cases = (
+        ([], 50, 0.0),
+        ([3.0], 95, 3.0),
+        ([1.0, 2.0, 3.0, 4.0], 50, 2.0),
+        ([1.0, 2.0, 3.0, 4.0], 95, 4.0),
+        (list(range(1, 101)), 95, 95),
+        (list(range(1, 101)), 0, 1)
+    )
+    for sorted_values, percentile, expected_value in cases:
+        assert profiling.get_percentile(sorted_values, percentile) == expected_value, (len(sorted_values), percentile)
+
+def test_spans_are_reported_and_traced(tmp_path):
+    '''Spans from context managers and decorated functions are added to the rolling timings, and to saved traces while recording.'''
+    profiling.clear_statistics()
+    profiling.set_trace_recording(True)
+    try:
+        @profiling.profile("test.decorated")
+        def decorated_function(value):
+            return value * 2
+
+        with profiling.profile("test.block"):
+            assert decorated_function(2) == 4
+        assert decorated_function(3) == 6
+    finally:
+        profiling.set_trace_recording(False)
+
+    sample_counts = {name: sample_count for name, sample_count, last, p50, p95 in profiling.get_statistics()}
+    assert sample_counts == {"test.block": 1, "test.decorated": 2}
+
+    trace_path = str(tmp_path / "trace.json")
+    assert profiling.save_trace(trace_path) == 3
+    with open(trace_path, 'r', encoding='utf-8') as trace_file:
+        trace = json.load(trace_file)
+    assert sorted(event['name'] for event in trace['traceEvents']) == ["test.block", "test.decorated", "test.decorated"]
+    profiling.clear_statistics()
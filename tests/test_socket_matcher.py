@@ -0,0 +1,56 @@
+# Tests for source/socket_matcher.py. Socket matching only works on socket features (names and types), so these run with plain Python (python -m pytest tests).
+# The add-on package itself registers with Blender when imported, so its source modules are imported through a package that skips the add-on __init__.py.
+
+import os
+import sys
+import types
+import importlib
+
+ADDON_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_PACKAGE_NAME = "rywrangler_tests_addon"
+
+if TEST_PACKAGE_NAME not in sys.modules:
+    test_package = types.ModuleType(TEST_PACKAGE_NAME)
+    test_package.__path__ = [ADDON_FOLDER]
+    sys.modules[TEST_PACKAGE_NAME] = test_package
+socket_matcher = importlib.import_module(TEST_PACKAGE_NAME + ".source.socket_matcher")
+
+# Inputs of a simplified Principled BSDF.
+PRINCIPLED_INPUTS = (('Base Color', 'RGBA'), ('Roughness', 'VALUE'), ('Metallic', 'VALUE'), ('Alpha', 'VALUE'), ('Normal', 'VECTOR'))
+
+def get_features(sockets):
+    '''Returns the socket features of (name, type) sockets.'''
+    return [socket_matcher.get_socket_feature(index, name, socket_type) for index, (name, socket_type) in enumerate(sockets)]
+
+def get_linked_names(outputs, inputs):
+    '''Returns the (output name, input name) links matched between the sockets.'''
+    links = socket_matcher.match_sockets(get_features(outputs), get_features(inputs))
+    return sorted((outputs[output_index][0], inputs[input_index][0]) for output_index, input_index, score in links)
+
+def test_match_sockets():
+    '''Sockets are linked by name, material channel and type, and sockets that only share a type aren't linked.'''
+    cases = (
+        ((('Fac', 'VALUE'),), PRINCIPLED_INPUTS, [('Fac', 'Roughness')]),
+        ((('Color', 'RGBA'),), PRINCIPLED_INPUTS, [('Color', 'Base Color')]),
+        ((('Color', 'RGBA'), ('Fac', 'VALUE')), PRINCIPLED_INPUTS, [('Color', 'Base Color'), ('Fac', 'Roughness')]),
+        ((('Metallic', 'VALUE'), ('Fac', 'VALUE')), PRINCIPLED_INPUTS, [('Fac', 'Roughness'), ('Metallic', 'Metallic')]),
+        ((('Roughness', 'VALUE'), ('Fac', 'VALUE')), PRINCIPLED_INPUTS, [('Fac', 'Metallic'), ('Roughness', 'Roughness')]),
+        ((('Normal', 'VECTOR'),), PRINCIPLED_INPUTS, [('Normal', 'Normal')]),
+        ((('Vector', 'VECTOR'),), (('Base Color', 'RGBA'), ('Roughness', 'VALUE')), []),
+        ((('Fac', 'VALUE'),), (('Scale', 'VALUE'), ('Base Color', 'RGBA')), []),
+        ((('Name', 'STRING'),), (('Name', 'STRING'),), [])
+    )
+    for outputs, inputs, expected_links in cases:
+        assert get_linked_names(outputs, inputs) == expected_links, outputs
+
+def test_weak_pairs_dont_block_better_pairs(monkeypatch):
+    '''Pairs scoring below the minimum never take a socket from a pair above it to link more sockets.'''
+    scores = {(0, 0): 3.0, (0, 1): 0.5, (1, 0): 0.5, (1, 1): None}
+    monkeypatch.setattr(socket_matcher, "score_socket_pair", lambda output_feature, input_feature: scores[(output_feature.index, input_feature.index)])
+    links = socket_matcher.match_sockets(get_features((('A', 'VALUE'), ('B', 'VALUE'))), get_features((('X', 'VALUE'), ('Y', 'VALUE'))))
+    assert links == [(0, 0, 3.0)]
+
+def test_solve_assignment_minimizes_total_cost():
+    '''The Hungarian method finds the assignment with the lowest total cost.'''
+    costs = [[4.0, 1.0, 3.0], [1.0, 0.0, 5.0]]
+    assert socket_matcher.solve_assignment(costs) == [1, 0]
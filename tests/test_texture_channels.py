@@ -0,0 +1,55 @@
+# Tests for source/texture_channels.py. File names are classified without Blender, so these run with plain Python (python -m pytest tests).
+# The add-on package itself registers with Blender when imported, so its source modules are imported through a package that skips the add-on __init__.py.
+
+import os
+import sys
+import types
+import importlib
+
+ADDON_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_PACKAGE_NAME = "rywrangler_tests_addon"
+
+if TEST_PACKAGE_NAME not in sys.modules:
+    test_package = types.ModuleType(TEST_PACKAGE_NAME)
+    test_package.__path__ = [ADDON_FOLDER]
+    sys.modules[TEST_PACKAGE_NAME] = test_package
+texture_channels = importlib.import_module(TEST_PACKAGE_NAME + ".source.texture_channels")
+
+def test_split_filename_by_components():
+    '''File names are split on camel case and separators into lowercase components, without numbers or the file extension.'''
+    cases = (
+        ("RoughMetal_002_2k_Color.png", ['rough', 'metal', 'k', 'color']),
+        ("brick-wall.normal#1.jpg", ['brick', 'wall', 'normal']),
+        ("Wood_ORM.tif", ['wood', 'orm']),
+        ("Bois_RUGOSITÉ.png", ['bois', 'rugosité'])
+    )
+    for filename, expected_components in cases:
+        assert texture_channels.split_filename_by_components(filename) == expected_components, filename
+
+def test_classify():
+    '''Material channels are identified from tags in file names, classified together as a texture set.'''
+    cases = (
+        # Tags shared by every file in the set ('RoughMetal') identify the set rather than a material channel.
+        (("RoughMetal_002_2k_Color.png", "RoughMetal_002_2k_Normal.png"), ['BASE_COLOR', 'NORMAL']),
+        (("Brick_Diffuse.png", "Brick_Roughness.png", "Brick_AO.jpg", "Brick_Height.exr", "Brick_Opacity.png"),
+            ['BASE_COLOR', 'ROUGHNESS', 'AMBIENT_OCCLUSION', 'HEIGHT', 'ALPHA']),
+        (("T_Brick_C_1.png", "T_Brick_N.png", "T_Brick_ORM.png", "T_Brick.png"),
+            ['BASE_COLOR', 'NORMAL', 'NONE', 'NONE']),
+        (("Brick_01.png",), ['NONE'])
+    )
+    for filenames, expected_channels in cases:
+        classified_channels = [material_channel for material_channel, packed_layout in texture_channels.classify(filenames)]
+        assert classified_channels == expected_channels, filenames
+
+def test_classify_channel_packed_layouts():
+    '''Channel packed images list the material channel packed into each RGBA channel, with smoothness inverted into roughness.'''
+    cases = (
+        ("Brick_ORM.png", (('AMBIENT_OCCLUSION', 'RED', False), ('ROUGHNESS', 'GREEN', False), ('METALLIC', 'BLUE', False))),
+        ("Brick_RMO.png", (('ROUGHNESS', 'RED', False), ('METALLIC', 'GREEN', False), ('AMBIENT_OCCLUSION', 'BLUE', False))),
+        ("Brick_MOXS.png", (('METALLIC', 'RED', False), ('AMBIENT_OCCLUSION', 'GREEN', False), ('ROUGHNESS', 'ALPHA', True))),
+        ("Brick_Color.png", None)
+    )
+    for filename, expected_layout in cases:
+        material_channel, packed_layout = texture_channels.classify([filename])[0]
+        assert packed_layout == expected_layout, filename
+        assert (material_channel == 'CHANNEL_PACKED') == (expected_layout != None), filename
@@ -0,0 +1,53 @@
+# Tests for source/texture_library.py. Texture libraries are indexed without Blender, so these run with plain Python (python -m pytest tests).
+# The add-on package itself registers with Blender when imported, so its source modules are imported through a package that skips the add-on __init__.py.
+
+import os
+import sys
+import types
+import importlib
+
+ADDON_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_PACKAGE_NAME = "rywrangler_tests_addon"
+
+if TEST_PACKAGE_NAME not in sys.modules:
+    test_package = types.ModuleType(TEST_PACKAGE_NAME)
+    test_package.__path__ = [ADDON_FOLDER]
+    sys.modules[TEST_PACKAGE_NAME] = test_package
+texture_library = importlib.import_module(TEST_PACKAGE_NAME + ".source.texture_library")
+
+# Images in the texture set used to test scanning.
+TEXTURE_SET_FILENAMES = ("Brick_Color.png", "Brick_Normal.png", "Brick_ORM.png")
+
+def test_get_texture_set_name():
+    '''Texture sets are named by the file name without the segment identifying its material channel.'''
+    cases = (
+        ("RoughMetal_002_2k_Color.png", "RoughMetal_002_2k"),
+        ("Brick_Normal_GL.png", "Brick_GL"),
+        ("Brick_ORM.png", "Brick"),
+        ("T_Brick_C_1.png", "T_Brick_1"),
+        ("Brick.png", "Brick")
+    )
+    for filename, expected_name in cases:
+        assert texture_library.get_texture_set_name(filename) == expected_name, filename
+
+def test_scan_folder_is_incremental(tmp_path):
+    '''Rescans only re-classify texture sets with new, changed or removed images, and saved indexes load identically.'''
+    for filename in TEXTURE_SET_FILENAMES:
+        (tmp_path / filename).write_bytes(b'')
+    (tmp_path / "notes.txt").write_bytes(b'')
+
+    index = {}
+    assert texture_library.scan_folder(str(tmp_path), index) == len(TEXTURE_SET_FILENAMES)
+    assert texture_library.scan_folder(str(tmp_path), index) == 0
+    channels = {os.path.basename(path): entry['channel'] for path, entry in index.items()}
+    assert channels == {"Brick_Color.png": 'BASE_COLOR', "Brick_Normal.png": 'NORMAL', "Brick_ORM.png": 'CHANNEL_PACKED'}
+
+    # Removing an image re-classifies the remaining images in its texture set.
+    os.remove(tmp_path / "Brick_Normal.png")
+    assert texture_library.scan_folder(str(tmp_path), index) == len(TEXTURE_SET_FILENAMES)
+    assert len(index) == len(TEXTURE_SET_FILENAMES) - 1
+
+    index_path = str(tmp_path / "index" / "texture_library.jsonl")
+    texture_library.save_index(index_path, index)
+    assert texture_library.load_index(index_path) == index
+    assert list(texture_library.get_texture_sets(index_path)) == [os.path.join(str(tmp_path), "Brick")]